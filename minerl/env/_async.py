@@ -0,0 +1,331 @@
+# # Copyright (c) 2020 All Rights Reserved
+# # Author: William H. Guss, Brandon Houghton
+import asyncio
+import logging
+import socket
+import time
+import uuid
+from typing import Any, Dict, List, Tuple
+
+from lxml import etree
+
+from minerl.env import comms
+from minerl.env._multiagent import _MultiAgentEnv, MissionInitTimeline, SOCKTIME, STEP_OPTIONS, TICK_LENGTH
+from minerl.env.malmo import MinecraftInstance, malmo_version
+
+logger = logging.getLogger(__name__)
+
+STEP_ERRORS = (asyncio.TimeoutError, socket.timeout, socket.error, TypeError)
+
+
+async def _async_recv_reply(connection, timeout=SOCKTIME) -> bytes:
+    """Receives the next message, raising ConnectionResetError if the instance closed the connection."""
+    reply = await asyncio.wait_for(connection.recv_message(), timeout=timeout)
+    if reply is None:
+        raise ConnectionResetError("The instance closed the connection.")
+    return reply
+
+
+class AsyncMineRLEnv(_MultiAgentEnv):
+    """A MineRL environment driven by asyncio streams instead of blocking sockets.
+
+    A single event loop can drive many of these environments (and the learner)
+    concurrently, for example::
+
+        envs = [env_spec.make(asynchronous=True) for _ in range(32)]
+        obs = await asyncio.gather(*[env.async_reset() for env in envs])
+        ...
+        results = await asyncio.gather(*[env.async_step(ac) for env, ac in zip(envs, actions)])
+
+    The gym API (reset, step, close) is kept as a synchronous facade which runs
+    the coroutines on a private event loop, so the two styles must not be mixed on
+    one environment: the connections are bound to the loop they were opened on.
+
+    Single agent env specs yield single agent observations, rewards and infos
+    just like the _SingleAgentEnv.
+
+    The exchanges with the instances are shared with the blocking environment (see
+    _MultiAgentEnv._exchange). reset_ahead and step_async / step_wait are not supported.
+
+    THIS CLASS SHOULD NOT BE INSTANTIATED DIRECTLY
+    USE ENV SPEC.
+    """
+
+    def __init__(self, *args, **kwargs):
+        if kwargs.get('reset_ahead'):
+            raise ValueError("AsyncMineRLEnv does not support reset_ahead.")
+        super(AsyncMineRLEnv, self).__init__(*args, **kwargs)
+        self._loop = None
+
+    ########### SYNC FACADE #########
+
+    def reset(self) -> Any:
+        return self._run(self.async_reset())
+
+    def step(self, actions, repeat: int = 1):
+        return self._run(self.async_step(actions, repeat))
+
+    def step_async(self, actions) -> None:
+        raise NotImplementedError("AsyncMineRLEnv is stepped concurrently by awaiting async_step.")
+
+    def step_wait(self):
+        raise NotImplementedError("AsyncMineRLEnv is stepped concurrently by awaiting async_step.")
+
+    def close(self):
+        if self._loop is not None and not self._loop.is_closed():
+            self._run(self.async_close())
+            self._loop.close()
+        else:
+            super().close()
+
+    def _run(self, coroutine):
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coroutine)
+
+    ########### STEP METHOD ###########
+
+    async def async_step(self, actions, repeat: int = 1):
+        """Steps the environment; see _MultiAgentEnv.step."""
+        if self.task.is_single_agent:
+            aname = self.task.agent_names[0]
+            obs, rew, done, info = await self._async_multi_agent_step({aname: actions}, repeat)
+            return obs[aname], rew[aname], done, info[aname]
+        return await self._async_multi_agent_step(actions, repeat)
+
+    async def _async_multi_agent_step(self, actions, repeat: int = 1):
+        multi_reward = None
+        for tick in range(repeat):
+            multi_obs, reward, done, multi_monitor = await self._async_step_tick(
+                actions, decode=tick == repeat - 1)
+            multi_reward = reward if multi_reward is None else {
+                actor_name: multi_reward[actor_name] + reward[actor_name] for actor_name in reward}
+            if done:
+                break
+        return multi_obs, multi_reward, done, multi_monitor
+
+    async def _async_step_tick(self, actions, decode=True):
+        if self.done:
+            raise RuntimeError("Attempted to step an environment server with done=True")
+        assert STEP_OPTIONS == 0 or STEP_OPTIONS == 2
+
+        live_agents = [actor_name for actor_name in self.task.agent_names
+                       if not self.has_finished[actor_name]]
+        replied = set()
+
+        async def recv_step_reply(actor_name):
+            reply = await self._async_recv_step_reply(actor_name, decode and self._decode_observations)
+            replied.add(actor_name)
+            return reply
+
+        try:
+            for actor_name in live_agents:
+                self._connection(actor_name).send_message(self._step_client_message(actor_name, actions[actor_name]))
+            await asyncio.gather(*[self._connection(actor_name).drain() for actor_name in live_agents])
+
+            replies = await asyncio.wait_for(
+                asyncio.gather(*[recv_step_reply(actor_name) for actor_name in live_agents]),
+                timeout=self._step_timeout)
+            replies = dict(zip(live_agents, replies))
+        except STEP_ERRORS as e:
+            if isinstance(e, asyncio.TimeoutError):
+                # The instances which have not replied stalled; see _MultiAgentEnv._fail_over.
+                self._failed_instances.extend(
+                    self.instances[self.task.agent_names.index(actor_name)]
+                    for actor_name in live_agents if actor_name not in replied)
+            return self._failed_step(e)
+
+        multi_obs, multi_reward, everyone_is_done, multi_monitor = self._merge_step_replies(replies)
+
+        # STEP THE SERVER!
+        instance = self.instances[0]
+        try:
+            instance.client_socket.send_message("<StepServer></StepServer>".encode())
+            await instance.client_socket.drain()
+        except STEP_ERRORS:
+            self._failed_server_step(instance)
+
+        if self._is_real_time:
+            t0 = time.time()
+            await asyncio.sleep(max(0, TICK_LENGTH - (t0 - self._last_step_time)))
+            self._last_step_time = time.time()
+
+        return multi_obs, multi_reward, everyone_is_done, multi_monitor
+
+    async def _async_recv_step_reply(self, actor_name, decode=True):
+        connection = self._connection(actor_name)
+        # The step timeout bounds the whole gather of the replies.
+        obs = await _async_recv_reply(connection, timeout=None)
+        reply = await _async_recv_reply(connection, timeout=None)
+        _malmo_json = await _async_recv_reply(connection, timeout=None)
+        return self._process_step_reply(actor_name, obs, reply, _malmo_json, decode)
+
+    def _connection(self, actor_name) -> comms.AsyncConnection:
+        return self.instances[self.task.agent_names.index(actor_name)].client_socket
+
+    ########### RESET METHODS #########
+
+    async def async_reset(self) -> Any:
+        """Resets the environment; see _MultiAgentEnv.reset."""
+        try:
+            if self._hot_spares is not None:
+                self._hot_spares.fill()
+            self.task.reset()
+            self._setup_spaces()
+
+            ep_uid = str(uuid.uuid4())
+            agent_xmls = self._setup_agent_xmls(ep_uid)
+
+            await self._async_setup_instances()
+
+            self.done = False
+            self.has_finished = {agent: False for agent in self.task.agent_names}
+
+            await self._async_start_mission(self.instances, agent_xmls, ep_uid)
+
+            multi_obs = await self._async_peek_obs()
+            if self.task.is_single_agent:
+                return multi_obs[self.task.agent_names[0]]
+            return multi_obs
+        finally:
+            self._seed = None
+
+    async def _async_start_mission(self, instances: List[MinecraftInstance], agent_xmls: List[etree.Element],
+                                   ep_uid: str) -> None:
+        """Starts the Mission/Task, with the slaves' missions sent concurrently; see
+        _MultiAgentEnv._start_mission.
+        """
+        timeline = MissionInitTimeline(self.task.agent_names)
+        self.mission_init_timeline = timeline
+
+        await self._async_send_mission(instances[0], agent_xmls[0], self._get_token(0, ep_uid))  # Master
+        timeline.mark(self.task.agent_names[0], 'mission_started')
+        if self.task.agent_count > 1:
+            mc_server_ip, mc_server_port = await self._async_find_ip_and_port(
+                instances[0], self._get_token(1, ep_uid))
+            self.integratedServerPort = int(mc_server_port)
+            timeline.mark(self.task.agent_names[0], 'server_found')
+
+            async def start_slave(actor_name, slave_instance, slave_xml, role):
+                self._setup_slave_master_connection_info(slave_xml, mc_server_ip, mc_server_port)
+                await self._async_send_mission(slave_instance, slave_xml, self._get_token(role, ep_uid))
+                timeline.mark(actor_name, 'mission_started')
+
+            slaves = list(zip(self.task.agent_names, instances, agent_xmls, range(1, self.task.agent_count + 1)))[1:]
+            await asyncio.gather(*[start_slave(*slave) for slave in slaves])
+
+    async def _async_setup_instances(self) -> None:
+        loop = asyncio.get_running_loop()
+        num_instances_to_start = self.task.agent_count - len(self.instances)
+        num_old_instances = len(self.instances)
+        if num_instances_to_start > 0:
+            # Launching Minecraft blocks on the process output, so keep it off the loop.
+            new_instances = await asyncio.gather(*[
+                loop.run_in_executor(None, self._get_new_instance) for _ in range(num_instances_to_start)])
+            self.instances.extend(new_instances)
+            self.instances = self.instances[:self.task.agent_count]
+
+        if self._refresh_inst_every is not None and self._inst_setup_cntr % self._refresh_inst_every == 0:
+            for i in reversed(range(num_old_instances)):
+                await self._async_clean_connection(self.instances[i])
+                self.instances[i].kill()
+                self.instances[i] = await loop.run_in_executor(
+                    None, lambda i=i: self._get_new_instance(instance_id=self.instances[i].instance_id))
+        self._inst_setup_cntr += 1
+
+        # Clients must be told about the episode end before the server (the first instance).
+        # Healthy connections are kept across episodes; see _MultiAgentEnv._prepare_instances.
+        for instance in reversed(self.instances):
+            if (isinstance(instance.client_socket, comms.AsyncConnection)
+                    and self._TO_MOVE_has_live_connection(instance)):
+                try:
+                    await self._async_quit_current_episode(instance)
+                    continue
+                except (asyncio.TimeoutError, socket.timeout, socket.error) as e:
+                    logger.warning("Connection with {} failed ({}), reconnecting.".format(instance, e))
+            await self._async_clean_connection(instance)
+            await self._async_create_connection(instance)
+            await self._async_quit_current_episode(instance)
+
+    @comms.async_retry
+    async def _async_create_connection(self, instance: MinecraftInstance) -> None:
+        try:
+            logger.debug("Creating socket connection {instance}".format(instance=instance))
+            connection = await asyncio.wait_for(
+                comms.AsyncConnection.open(instance.host, instance.port), timeout=SOCKTIME)
+            logger.debug("Saying hello for client: {instance}".format(instance=instance))
+            connection.send_message(("<MalmoEnv" + malmo_version + "/>").encode())
+            await connection.drain()
+            instance.client_socket = connection
+        except (asyncio.TimeoutError, socket.timeout, socket.error, ConnectionRefusedError) as e:
+            instance.had_to_clean = True
+            logger.error("Failed to reset (socket error), trying again!")
+            logger.error("Cleaning connection! Something must have gone wrong.")
+            await self._async_clean_connection(instance)
+            self._TO_MOVE_handle_frozen_minecraft(instance)
+            raise e
+
+    async def _async_clean_connection(self, instance: MinecraftInstance) -> None:
+        connection = getattr(instance, 'client_socket', None)
+        if connection is None:
+            return
+        try:
+            if isinstance(connection, comms.AsyncConnection):
+                connection.send_message("<Disconnect/>".encode())
+                connection.close()
+                await connection.writer.wait_closed()
+            else:
+                self._TO_MOVE_clean_connection(instance)
+        except (BrokenPipeError, OSError, socket.error):
+            # There is no connection left!
+            pass
+        instance.client_socket = None
+
+    async def _async_exchange(self, exchange):
+        """Drives an exchange over asyncio streams; see _MultiAgentEnv._exchange."""
+        result = None
+        try:
+            while True:
+                request = exchange.send(result)
+                if isinstance(request, tuple):
+                    connection, messages, num_replies = request
+                    for message in messages:
+                        connection.send_message(message)
+                    await connection.drain()
+                    result = [await _async_recv_reply(connection) for _ in range(num_replies)]
+                else:
+                    await asyncio.sleep(request)
+                    result = None
+        except StopIteration as stop:
+            return stop.value
+
+    async def _async_quit_current_episode(self, instance: MinecraftInstance) -> None:
+        await self._async_exchange(self._quit_current_episode_exchange(instance))
+
+    async def _async_send_mission(self, instance: MinecraftInstance, mission_xml_etree: etree.Element,
+                                  token_in: str) -> None:
+        """Sends the XML to the given instance; see _MultiAgentEnv._send_mission."""
+        await self._async_exchange(self._send_mission_exchange(instance, mission_xml_etree, token_in))
+
+    async def _async_find_ip_and_port(self, instance: MinecraftInstance, token: str) -> Tuple[str, str]:
+        """Polls the master client for the server port; see _MultiAgentEnv._TO_MOVE_find_ip_and_port."""
+        return await self._async_exchange(self._find_ip_and_port_exchange(instance, token))
+
+    async def _async_peek_obs(self) -> Dict[str, Any]:
+        return await self._async_exchange(self._peek_obs_exchange())
+
+    #############  CLOSE METHOD ###############
+
+    async def async_close(self):
+        """Closes the connections and kills the instances owned by the environment."""
+        logger.debug("Closing MineRL env...")
+        if self._already_closed:
+            return
+        instances = list(self.instances)
+        if self._hot_spares is not None:
+            instances.extend(await asyncio.get_running_loop().run_in_executor(None, self._hot_spares.close))
+        for instance in instances:
+            await self._async_clean_connection(instance)
+            if instance.running:
+                instance.kill()
+        self._already_closed = True
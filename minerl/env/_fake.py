@@ -35,6 +35,9 @@ class _FakeEnvMixin(object):
     def _setup_instances(self) -> None:
         self.instances = [NotImplemented for _ in range(self.task.agent_count)]
 
+    def _prepare_instances(self, instances):
+        return [NotImplemented for _ in range(self.task.agent_count)]
+
     def _send_mission(self, _, mission_xml_etree: etree.Element, token_in: str) -> None:
         logger.debug(
             "Sending fake XML for {}:".format(token_in)
@@ -44,10 +47,11 @@ class _FakeEnvMixin(object):
         return "1", "1"
 
     def _peek_obs(self) -> Dict[str, Any]:
+        self._clear_pov_frames()
         r, _ = self._get_fake_obs()
         return r
 
-    def step(self, action) -> Tuple[
+    def step(self, action, repeat=1) -> Tuple[
         Dict[str, Dict[str, Any]], Dict[str, float], Dict[str, bool], Dict[str, Dict[str, Any]]]:
         fobs, monitor = self._get_fake_obs()
         done = False
@@ -58,6 +62,14 @@ class _FakeEnvMixin(object):
 
         return fobs, reward, done, monitor
 
+    def _step_async(self, action) -> None:
+        self._pending_step = action
+
+    def _step_wait(self, decode=True) -> Tuple[
+        Dict[str, Dict[str, Any]], Dict[str, float], Dict[str, bool], Dict[str, Dict[str, Any]]]:
+        action, self._pending_step = self._pending_step, None
+        return _FakeEnvMixin.step(self, action)
+
     def _get_fake_obs(self) -> Dict[str, Any]:
 
         obs = {}
@@ -87,12 +99,12 @@ class _FakeMultiAgentEnv(_FakeEnvMixin, _MultiAgentEnv):
 class _FakeSingleAgentEnv(_FakeEnvMixin, _SingleAgentEnv):
     """The fake singleagent environment."""
 
-    def step(self, action):
+    def step(self, action, repeat=1):
         # Gets the resulting s,r,d,i pair from super but
         # but returns s[self.task.agent_names[0]], ...
         aname = self.task.agent_names[0]
         multi_agent_action = {
             aname: action
         }
-        s, reward, done, info = super().step(multi_agent_action)
+        s, reward, done, info = super().step(multi_agent_action, repeat)
         return s[aname], reward[aname], done, info[aname]
@@ -1,5 +1,6 @@
 # # Copyright (c) 2020 All Rights Reserved
 # # Author: William H. Guss, Brandon Houghton
+import contextlib
 import traceback
 from copy import deepcopy
 import json
@@ -11,6 +12,7 @@ from minerl.herobraine.wrapper import EnvWrapper
 import struct
 from minerl.env.malmo import InstanceManager, MinecraftInstance, launch_queue_logger_thread, malmo_version
 import uuid
+import selectors
 import coloredlogs
 import gym
 import socket
@@ -18,22 +20,142 @@ import time
 from lxml import etree
 from minerl.env import comms
 import xmltodict
-from concurrent.futures import ThreadPoolExecutor
+import concurrent.futures
+from concurrent.futures import Future, ThreadPoolExecutor
 import cv2
 
 from minerl.herobraine.env_spec import EnvSpec
 from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
 
 NS = "{http://ProjectMalmo.microsoft.com}"
 STEP_OPTIONS = 0
+STEP_CLIENT_OPEN = ("<StepClient" + str(STEP_OPTIONS) + ">").encode()
+STEP_CLIENT_CLOSE = ("</StepClient" + str(STEP_OPTIONS) + " >").encode()
 
 MAX_WAIT = 600  # Time to wait before raising an exception (high value because some operations we wait on are very slow)
 SOCKTIME = 60.0 * 4  # After this much time a socket exception will be thrown.
 TICK_LENGTH = 0.05
+MAX_DECODE_WORKERS = 4  # Threads decoding the observations of the agents of a multi-agent env.
+# The least time an instance gets to send the rest of a step reply it has started, even past the
+# step deadline (e.g. when its reply was read after another instance stalled).
+MIN_REPLY_TIMEOUT = 0.5
 
 logger = logging.getLogger(__name__)
 
 
+def _recv_reply(connection):
+    """Receives the next message, raising ConnectionResetError if the instance closed the connection."""
+    reply = comms.recv_message(connection)
+    if reply is None:
+        raise ConnectionResetError("The instance closed the connection.")
+    return reply
+
+
+class MissionInitTimeline(object):
+    """When each agent got to each stage of a mission initialization, in seconds since it began.
+
+    The stages are 'mission_started' (the mission was accepted), 'server_found' (the
+    master's integrated server port is known) and 'first_observation' (the first
+    peeked observation was received).
+    """
+
+    def __init__(self, agent_names: List[str]):
+        self.start_time = time.time()
+        self.events = {agent: OrderedDict() for agent in agent_names}  # type: Dict[str, Dict[str, float]]
+
+    def mark(self, actor_name: str, stage: str) -> None:
+        self.events[actor_name][stage] = time.time() - self.start_time
+        logger.debug("{} reached {} after {:.3f}s".format(actor_name, stage, self.events[actor_name][stage]))
+
+    def __repr__(self):
+        return "MissionInitTimeline({})".format(dict(self.events))
+
+
+class _Standby(object):
+    """The next episode, set up ahead of reset on a standby set of instances."""
+
+    def __init__(self, instances: List[MinecraftInstance]):
+        self.instances = instances
+        self.observation_space = None
+        self.action_space = None
+        self.monitor_space = None
+        self.observation_decoder = None
+        self.action_encoder = None
+        self.mission_init_timeline = None  # type: Optional[MissionInitTimeline]
+        self.integratedServerPort = None  # type: Optional[int]
+        self.error = None  # type: Optional[Exception]
+
+
+class _HotSpares(object):
+    """Launched instances kept ready to take the place of instances which fail.
+
+    Spares are launched in the background, and so are the replacements of the
+    instances they take the place of, which become spares in turn.
+
+    Args:
+        count (int): The number of spares to keep.
+        launch (Callable): Gets a new, launched instance; takes an optional instance_id.
+    """
+
+    def __init__(self, count: int, launch: Callable[..., MinecraftInstance]):
+        self.count = count
+        self._launch = launch
+        self._pool = ThreadPoolExecutor(max_workers=count, thread_name_prefix='minerl-spares')
+        self._ready = []  # type: List[MinecraftInstance]
+        self._launching = []  # type: List[Future]
+
+    def fill(self) -> None:
+        """Launches spares in the background until there are count of them."""
+        for _ in range(self.count - len(self._ready) - len(self._launching)):
+            self._launching.append(self._pool.submit(self._launch))
+
+    def take(self, host: Optional[str] = None) -> Optional[MinecraftInstance]:
+        """Takes a ready spare, preferably one on the given host.
+
+        Returns:
+            The spare, or None if none has finished launching.
+        """
+        self._collect()
+        if not self._ready:
+            return None
+        spare = next((spare for spare in self._ready if spare.host == host), self._ready[0])
+        self._ready.remove(spare)
+        return spare
+
+    def rebuild(self, instance: MinecraftInstance) -> None:
+        """Kills a failed instance and relaunches it in the background as a spare."""
+        def relaunch():
+            instance.kill()
+            return self._launch(instance_id=instance.instance_id)
+
+        self._launching.append(self._pool.submit(relaunch))
+
+    def close(self) -> List[MinecraftInstance]:
+        """Waits for the spares being launched.
+
+        Returns:
+            All of the spares, which the caller should kill.
+        """
+        self._pool.shutdown(wait=True)
+        self._collect()
+        spares, self._ready = self._ready, []
+        return spares
+
+    def _collect(self) -> None:
+        for future in [future for future in self._launching if future.done()]:
+            self._launching.remove(future)
+            try:
+                self._ready.append(future.result())
+            except Exception:
+                logger.error("Failed to launch a hot spare instance.")
+                logger.error(traceback.format_exc())
+
+    def __len__(self):
+        self._collect()
+        return len(self._ready)
+
+
 class _MultiAgentEnv(gym.Env):
     """
     The MineRLEnv class, a gym environment which implements stepping, and resetting, for the MineRL
@@ -69,6 +191,10 @@ class _MultiAgentEnv(gym.Env):
                  verbose: bool = False,
                  _xml_mutator_to_be_deprecated: Optional[Callable] = None,
                  refresh_instances_every: Optional[int] = None,
+                 reset_ahead: bool = False,
+                 lazy_observations: bool = False,
+                 hot_spares: int = 0,
+                 step_timeout: Optional[float] = None,
                  ):
         """
         Constructor of MineRLEnv.
@@ -80,15 +206,28 @@ class _MultiAgentEnv(gym.Env):
         :param _xml_mutator_to_be_deprecated: A function which mutates the mission XML when called.
         :param refresh_instances_every: As a band-aid to memory leaks, completely kill and rebuild the instances every
            N setups.
+        :param reset_ahead: Keep a standby set of instances which is given the next episode's mission while the
+           current episode runs, so that reset only has to swap them in. This doubles the number of instances.
+        :param lazy_observations: Return observations and infos as LazyObservations, which decode each entry
+           when it is first read, rather than decoding every observable and monitor on every step.
+        :param hot_spares: Keep this many launched instances ready. When an instance stalls or fails during a step,
+           the next reset moves its agent onto a spare, and the failed instance is rebuilt in the background.
+        :param step_timeout: Seconds to wait on the step replies before the instances which have not replied are
+           considered stalled and the episode is ended. Defaults to SOCKTIME.
         """
         self.task = env_spec
         self.instances = instances if instances is not None else []  # type: List[MinecraftInstance]
 
         # TO DEPRECATE (FOR ENV_SPECS)
-        self._xml_mutator_to_be_deprecated = _xml_mutator_to_be_deprecated or (lambda x: x)
+        self._xml_mutator_to_be_deprecated = _xml_mutator_to_be_deprecated
         self._refresh_inst_every = refresh_instances_every
         self._inst_setup_cntr = 0
         self.render_open = False
+        self._pending_step = None  # The (live agents, send error) of a step_async awaiting its step_wait.
+        self._decode_observations = True
+        self._lazy_observations = lazy_observations
+        self._decode_pool = None  # type: Optional[ThreadPoolExecutor]
+        self.mission_init_timeline = None  # type: Optional[MissionInitTimeline]
 
         # We use the env_spec's initial observation and action space
         # to satify the gym API
@@ -97,7 +236,8 @@ class _MultiAgentEnv(gym.Env):
         self._init_seeding()
         self._init_viewer()
         self._init_interactive()
-        self._init_fault_tolerance(is_fault_tolerant)
+        self._init_fault_tolerance(is_fault_tolerant, hot_spares, step_timeout)
+        self._init_reset_ahead(reset_ahead)
         self._init_logging(verbose)
 
     ############ INIT METHODS ##########
@@ -112,6 +252,7 @@ class _MultiAgentEnv(gym.Env):
         self._last_ac = {}
         self._last_pov = {}
         self._last_obs = {}
+        self._skipped_replies = {}  # The (pov, info) of the agents' observations skipped since their last decode.
         self.viewer_agent = self.task.agent_names[0]
 
     def _init_interactive(self) -> None:
@@ -119,10 +260,21 @@ class _MultiAgentEnv(gym.Env):
         self._is_real_time = False
         self._last_step_time = -1
 
-    def _init_fault_tolerance(self, is_fault_tolerant: bool) -> None:
+    def _init_fault_tolerance(self, is_fault_tolerant: bool, hot_spares: int = 0,
+                              step_timeout: Optional[float] = None) -> None:
         self._is_fault_tolerant = is_fault_tolerant
         self._last_obs = {}
         self._already_closed = False
+        self._step_timeout = SOCKTIME if step_timeout is None else step_timeout
+        self._hot_spares = _HotSpares(hot_spares, self._get_new_instance) if hot_spares else None
+        # The instances which failed during the current step; see _fail_over.
+        self._failed_instances = []  # type: List[MinecraftInstance]
+
+    def _init_reset_ahead(self, reset_ahead: bool) -> None:
+        self._reset_ahead = reset_ahead
+        # A single worker, so that standby episodes are prepared one after the other.
+        self._standby_pool = ThreadPoolExecutor(max_workers=1) if reset_ahead else None
+        self._standby = None  # type: Optional[concurrent.futures.Future]
 
     def _init_logging(self, verbose: bool) -> None:
         if verbose:
@@ -205,33 +357,23 @@ class _MultiAgentEnv(gym.Env):
         """
         Process observation into the proper dict space.
         """
-        if info:
-            info = json.loads(info)
+        # The entries of the info which don't come from its JSON; pov_frames is None unless
+        # the POV is buffered.
+        if actor_name not in self.pov_frames:
+            self.pov_frames[actor_name] = self._observation_decoder.create_frame_buffer()
+        given = {'pov': pov, 'pov_frames': self.pov_frames[actor_name]}
+
+        if self._lazy_observations:
+            obs_dict, monitor_dict = self._observation_decoder.decode_lazy(info, given)
         else:
-            info = {}
-
-        info['pov'] = pov
-
-        bottom_env_spec = self.task
-        while isinstance(bottom_env_spec, EnvWrapper):
-            bottom_env_spec = bottom_env_spec.env_to_wrap
-
-        # Process all of the observations using handlers.
-        obs_dict = {}
-        monitor_dict = {}
-        for h in bottom_env_spec.observables:
-            obs_dict[h.to_string()] = h.from_hero(info)
-
-        # Now we wrap
-        if isinstance(self.task, EnvWrapper):
-            obs_dict = self.task.wrap_observation(obs_dict)
+            info = self._observation_decoder.parse(info)
+            info.update(given)
+            # Process all of the observations and monitors (aux info) using the compiled handlers.
+            obs_dict, monitor_dict = self._observation_decoder(info)
 
         self._last_pov[actor_name] = obs_dict['pov']
         self._last_obs[actor_name] = obs_dict
-
-        # Process all of the monotors (aux info) using THIS env spec.
-        for m in self.task.monitors:
-            monitor_dict[m.to_string()] = m.from_hero(info)
+        self._skipped_replies.pop(actor_name, None)
 
         return obs_dict, monitor_dict
 
@@ -239,144 +381,335 @@ class _MultiAgentEnv(gym.Env):
         """
         Process the actions into a proper command.
         """
-        self._last_ac[actor_name] = action_in
-        action_in = deepcopy(action_in)
+        return self._encode_action(actor_name, action_in).decode()
 
-        # TODO(wguss): Clean up the envSpec wrapper paradigm,
-        # the env shouldn't be doing this IMO.
+    def _encode_action(self, actor_name, action_in) -> bytes:
+        self._last_ac[actor_name] = action_in
+        # The action is only copied when an EnvWrapper has to unwrap it (see EnvWrapper.unwrap_action).
         # TODO (R): Make wrappers compatible with mutliple agents.
-        if isinstance(self.task, EnvWrapper):
-            action_in = self.task.unwrap_action(action_in)
+        return self._action_encoder(action_in)
 
-        bottom_env_spec = self.task
-        while isinstance(bottom_env_spec, EnvWrapper):
-            bottom_env_spec = bottom_env_spec.env_to_wrap
+    def _step_client_message(self, actor_name, action_in) -> bytes:
+        return STEP_CLIENT_OPEN + self._encode_action(actor_name, action_in) + STEP_CLIENT_CLOSE
 
-        act_space = bottom_env_spec.action_space[actor_name] if self.task.agent_count > 1 else (
-            bottom_env_spec.action_space
-        )
+    def _check_action(self, actor_name, action, env_spec):
+        # TODO (R): Move this to env_spec in some reasonable way.
+        return action in env_spec.action_space[actor_name]
 
-        # TODO this will be fixed when moved into env spec
-        # assert self._check_action(actor_name, action_in, bottom_env_spec)
+    def step(self, actions, repeat: int = 1) -> Tuple[
+        Dict[str, Dict[str, Any]], Dict[str, float], bool, Dict[str, Dict[str, Any]]]:
+        """gym api step
 
-        action_str = []
-        for h in bottom_env_spec.actionables:
-            if h.to_string() in action_in:
-                action_str.append(h.to_hero(action_in[h.to_string()]))
+        Args:
+            actions: The actions of every agent.
+            repeat (int, optional): The number of ticks to repeat the actions for. The
+                observations of the intermediate ticks are drained from the instances
+                but not decoded; only the last tick's observation (or that of the tick
+                an agent finished on) is returned, along with the summed rewards.
+                Defaults to 1.
+
+        When the env spec buffers the POV (see POVObservation's buffer_frames), the "pov"
+        observations are views of the agents' frame buffers, which later steps overwrite;
+        copy them to keep them around.
+        """
+        multi_reward = None
+        for tick in range(repeat):
+            self._step_async(actions)
+            multi_obs, reward, done, multi_monitor = self._step_wait(decode=tick == repeat - 1)
+            multi_reward = reward if multi_reward is None else {
+                actor_name: multi_reward[actor_name] + reward[actor_name] for actor_name in reward}
+            if done:
+                break
+        return multi_obs, multi_reward, done, multi_monitor
+
+    @contextlib.contextmanager
+    def discarding_observations(self):
+        """Within this context steps do not decode the observations of agents which
+        have not finished, and return their last decoded observation instead.
+
+        Useful when stepping through ticks whose observations are thrown away, e.g.
+        when replaying a recorded trajectory.
+        """
+        self._decode_observations = False
+        try:
+            yield self
+        finally:
+            self._decode_observations = True
 
-        return "\n".join(action_str)
+    def decode_skipped_observations(self) -> Dict[str, Dict[str, Any]]:
+        """Decodes the observations of the agents whose latest tick was skipped (see
+        discarding_observations), e.g. when a replay stops partway through.
 
-    def _check_action(self, actor_name, action, env_spec):
-        # TODO (R): Move this to env_spec in some reasonable way.
-        return action in env_spec.action_space[actor_name]
+        Returns:
+            The current observation of every agent.
+        """
+        for actor_name, (obs, _malmo_json) in list(self._skipped_replies.items()):
+            self._process_observation(actor_name, obs, str(_malmo_json, "utf-8"))
+        return {actor_name: self._last_obs[actor_name] for actor_name in self.task.agent_names}
+
+    def step_async(self, actions) -> None:
+        """Sends the actions to the instances and returns without waiting on Minecraft.
 
-    def step(self, actions) -> Tuple[
+        Together with step_wait this splits step in two, so that the caller can do
+        other work (e.g. compute the actions of other environments) while the
+        instances tick. Every step_async must be followed by a step_wait.
+
+        Args:
+            actions: The actions, as they would be given to step.
+        """
+        self._step_async(actions)
+
+    def step_wait(self) -> Tuple[
         Dict[str, Dict[str, Any]], Dict[str, float], bool, Dict[str, Dict[str, Any]]]:
-        if not self.done:
-            assert STEP_OPTIONS == 0 or STEP_OPTIONS == 2
-
-            multi_obs = {}
-            multi_reward = {}
-            everyone_is_done = True
-            multi_monitor = {}
-
-            # TODO (R): Randomly iterate over this.
-            # Process multi-agent actions, apply and process multi-agent observations
-            for role, (actor_name, instance) in enumerate(zip(self.task.agent_names, self.instances)):
-                try:  # TODO - we could wrap entire function in try, if sockets don't need to individually clean
-
-                    if not self.has_finished[actor_name]:
-                        malmo_command = self._process_action(actor_name, actions[actor_name])
-                        step_message = "<StepClient" + str(STEP_OPTIONS) + ">" + \
-                                       malmo_command + \
-                                       "</StepClient" + str(STEP_OPTIONS) + " >"
-
-                        # Send Actions.
-                        comms.send_message(instance.client_socket, step_message.encode())
-
-                        # Receive the observation.
-                        obs = comms.recv_message(instance.client_socket)
-
-                        # Receive reward done and sent.
-                        reply = comms.recv_message(instance.client_socket)
-                        reward, done, sent = struct.unpack("!dbb", reply)
-                        # TODO: REFACTOR TO USE REWARD HANDLERS INSTEAD OF MALMO REWARD.
-                        done = (done == 1)
-                        if done:
-                            logger.info("Agent {} has finished".format(actor_name))
-
-                        self.has_finished[actor_name] = self.has_finished[actor_name] or done
-
-                        # Receive info from the environment.
-                        _malmo_json = comms.recv_message(instance.client_socket).decode("utf-8")
-
-                        # Process the observation and done state.
-                        out_obs, monitor = self._process_observation(actor_name, obs, _malmo_json)
-                    else:
-                        # IF THIS PARTICULAR AGENT IS DONE THEN:
-                        reward = 0.0
-                        out_obs = self._last_obs[actor_name]
-                        done = True
-                        monitor = {}
-
-                    # concatenate multi-agent obs, rew, done
-                    multi_obs[actor_name] = out_obs
-                    multi_reward[actor_name] = reward
-                    everyone_is_done = everyone_is_done and done
-                    multi_monitor[actor_name] = monitor
-                except (socket.timeout, socket.error, TypeError) as e:
-                    # If the socket times out some how! We need to catch this and reset the environment.
-                    # TODO this is not implemented
-                    self._clean_connection()
-                    self.done = True
-                    logger.error(
-                        f"Failed to take a step (error {e}). Terminating episode and sending random observation, be aware. "
-                        "To account for this failure case in your code check to see if `'error' in info` where info is "
-                        "the info dictionary returned by the step function."
-                    )
-                    logger.error(traceback.format_exc())
-                    return (
-                        {agent: self.observation_space.sample() for agent in actions},
-                        {agent: 0 for agent in actions},
-                        self.done,
-                        {agent: {"error": "Connection timed out!"} for agent in actions},
-                    )
-
-            # this will currently only consider the env done when all agents report done individually
-            self.done = everyone_is_done
-
-            # STEP THE SERVER!
-            instance = self.instances[0]
-            try:
-                step_message = "<StepServer></StepServer>"
-
-                # Send Actions.
-                comms.send_message(instance.client_socket, step_message.encode())
-
-            except (socket.timeout, socket.error, TypeError) as e:
-                # If the socket times out some how! We need to catch this and reset the environment.
-                self._TO_MOVE_clean_connection()
-                self.done = True
-                logger.error(
-                    "Failed to take a step (timeout or error). Terminating episode and sending random observation, be aware. "
-                    "To account for this failure case in your code check to see if `'error' in info` where info is "
-                    "the info dictionary returned by the step function.")
-                # return self.observation_space.sample(), 0, self.done, {"error": "Connection timed out!"}
-
-            # synchronize with real time
-            if self._is_real_time:
-                t0 = time.time()
-                # Todo: Add catch-up
-                time.sleep(max(0, TICK_LENGTH - (t0 - self._last_step_time)))
-                self._last_step_time = time.time()
-        else:
+        """Waits on the step started by step_async and returns its result, just like step."""
+        return self._step_wait()
+
+    def _step_async(self, actions) -> None:
+        if self.done:
             raise RuntimeError("Attempted to step an environment server with done=True")
+        if self._pending_step is not None:
+            raise RuntimeError("Attempted to step an environment which is already waiting on a step.")
+        assert STEP_OPTIONS == 0 or STEP_OPTIONS == 2
+
+        # Every live agent's action is sent before any reply is awaited so that the
+        # instances step concurrently, then the replies are gathered as they arrive.
+        live_agents = [actor_name for actor_name in self.task.agent_names
+                       if not self.has_finished[actor_name]]
+        error = None
+        try:
+            self._send_step_clients(actions, live_agents)
+        except (socket.timeout, socket.error, TypeError) as e:
+            # Reported by _step_wait, so that failures look the same whichever half they happen in.
+            error = e
+        self._pending_step = (live_agents, error)
+
+    def _step_wait(self, decode=True) -> Tuple[
+        Dict[str, Dict[str, Any]], Dict[str, float], bool, Dict[str, Dict[str, Any]]]:
+        if self._pending_step is None:
+            raise RuntimeError("Attempted to wait on a step which was never started with step_async.")
+        live_agents, error = self._pending_step
+        self._pending_step = None
+
+        # Process multi-agent actions, apply and process multi-agent observations.
+        try:  # TODO - we could wrap entire function in try, if sockets don't need to individually clean
+            if error is not None:
+                raise error
+            replies = self._gather_step_replies(live_agents, decode and self._decode_observations)
+        except (socket.timeout, socket.error, TypeError) as e:
+            # If the socket times out some how! We need to catch this and reset the environment.
+            return self._failed_step(e)
+
+        multi_obs, multi_reward, everyone_is_done, multi_monitor = self._merge_step_replies(replies)
+
+        # STEP THE SERVER!
+        instance = self.instances[0]
+        try:
+            step_message = "<StepServer></StepServer>"
+
+            # Send Actions.
+            comms.send_message(instance.client_socket, step_message.encode())
+
+        except (socket.timeout, socket.error, TypeError) as e:
+            # If the socket times out some how! We need to catch this and reset the environment.
+            self._failed_server_step(instance)
+
+        # synchronize with real time
+        if self._is_real_time:
+            t0 = time.time()
+            # Todo: Add catch-up
+            time.sleep(max(0, TICK_LENGTH - (t0 - self._last_step_time)))
+            self._last_step_time = time.time()
 
         #  WE DON'T CURRENTLY PIPE OUT WHETHER EACH AGENT IS DONE
         # JUST IF EVERY AGENT IS DONE. THIS CAN BE ASCERTAINED BY
         # CALLING env.has_finished['agent_name_here]
         return multi_obs, multi_reward, everyone_is_done, multi_monitor
 
+    def _failed_step(self, error) -> Tuple[
+            Dict[str, Dict[str, Any]], Dict[str, float], bool, Dict[str, Dict[str, Any]]]:
+        """Ends the episode after the step failed with error, failing the instances which
+        broke over (see _fail_over), and makes up the step's result.
+        """
+        self._fail_over()
+        self.done = True
+        logger.error(
+            f"Failed to take a step (error {error}). Terminating episode and sending random observation, be aware. "
+            "To account for this failure case in your code check to see if `'error' in info` where info is "
+            "the info dictionary returned by the step function."
+        )
+        logger.error(traceback.format_exc())
+        return (
+            {agent: self.observation_space.sample() for agent in self.task.agent_names},
+            {agent: 0 for agent in self.task.agent_names},
+            self.done,
+            {agent: {"error": "Connection timed out!"} for agent in self.task.agent_names},
+        )
+
+    def _failed_server_step(self, instance: MinecraftInstance) -> None:
+        """Ends the episode after stepping the server on instance failed."""
+        self._failed_instances.append(instance)
+        self._fail_over()
+        self.done = True
+        logger.error(
+            "Failed to take a step (timeout or error). Terminating episode and sending random observation, be aware. "
+            "To account for this failure case in your code check to see if `'error' in info` where info is "
+            "the info dictionary returned by the step function.")
+
+    def _merge_step_replies(self, replies) -> Tuple[
+            Dict[str, Dict[str, Any]], Dict[str, float], bool, Dict[str, Dict[str, Any]]]:
+        """Merges the step replies of the live agents (see _process_step_reply) with the
+        last observations of the agents which had already finished.
+        """
+        multi_obs = {}
+        multi_reward = {}
+        everyone_is_done = True
+        multi_monitor = {}
+        for actor_name in self.task.agent_names:
+            if actor_name in replies:
+                out_obs, reward, done, monitor = replies[actor_name]
+                if out_obs is None:
+                    # The observation of this tick was skipped.
+                    out_obs = self._last_obs[actor_name]
+            else:
+                # IF THIS PARTICULAR AGENT IS DONE THEN:
+                reward = 0.0
+                out_obs = self._last_obs[actor_name]
+                done = True
+                monitor = {}
+
+            # concatenate multi-agent obs, rew, done
+            multi_obs[actor_name] = out_obs
+            multi_reward[actor_name] = reward
+            everyone_is_done = everyone_is_done and done
+            multi_monitor[actor_name] = monitor
+
+        # this will currently only consider the env done when all agents report done individually
+        self.done = everyone_is_done
+        return multi_obs, multi_reward, everyone_is_done, multi_monitor
+
+    def _send_step_clients(self, actions, actor_names) -> None:
+        """Scatters the <StepClient> messages of the given agents without waiting on any reply.
+        """
+        for actor_name in actor_names:
+            instance = self.instances[self.task.agent_names.index(actor_name)]
+
+            # Send Actions.
+            try:
+                comms.send_message(instance.client_socket, self._step_client_message(actor_name, actions[actor_name]))
+            except (socket.timeout, socket.error):
+                self._failed_instances.append(instance)
+                raise
+
+    def _gather_step_replies(self, actor_names, decode=True) -> Dict[
+            str, Tuple[Optional[Dict[str, Any]], float, bool, Dict[str, Any]]]:
+        """Gathers the step replies of the given agents in whichever order they arrive.
+
+        Each reply is decoded as soon as it has been received, while the remaining
+        instances are still ticking. If decode is False only the replies of agents
+        which finished are decoded and the others have a None observation.
+
+        Returns:
+            A dict from actor name to its (observation, reward, done, monitor).
+
+        Raises:
+            socket.timeout: If an instance has not sent all of its reply within the step
+                timeout. The instances which failed to reply are kept in _failed_instances.
+        """
+        # With several agents, replies are decoded on the decode pool while waiting on the
+        # others (as MineRLVectorEnv does across its envs).
+        pool = self._get_decode_pool() if len(actor_names) > 1 else None
+        deadline = time.monotonic() + self._step_timeout
+        replies = {}
+
+        def recv(actor_name, connection):
+            try:
+                replies[actor_name] = self._recv_step_reply_by(deadline, actor_name, connection, decode, pool)
+            except (socket.timeout, socket.error):
+                self._failed_instances.append(self.instances[self.task.agent_names.index(actor_name)])
+                raise
+
+        with selectors.DefaultSelector() as selector:
+            for actor_name in actor_names:
+                connection = self.instances[self.task.agent_names.index(actor_name)].client_socket
+                if connection.pending():
+                    # The reply has already been read ahead; the socket may never become readable.
+                    recv(actor_name, connection)
+                else:
+                    selector.register(connection, selectors.EVENT_READ, actor_name)
+
+            while selector.get_map():
+                events = selector.select(timeout=max(0.0, deadline - time.monotonic()))
+                if not events:
+                    stalled = [key.data for key in selector.get_map().values()]
+                    self._failed_instances.extend(
+                        self.instances[self.task.agent_names.index(actor_name)] for actor_name in stalled)
+                    raise socket.timeout("Timed out waiting for the step replies of {}.".format(stalled))
+                for key, _ in events:
+                    selector.unregister(key.fileobj)
+                    recv(key.data, key.fileobj)
+
+        for actor_name, (out_obs, reward, done, monitor) in replies.items():
+            if isinstance(out_obs, Future):
+                out_obs, monitor = out_obs.result()
+                replies[actor_name] = (out_obs, reward, done, monitor)
+        return replies
+
+    def _get_decode_pool(self) -> ThreadPoolExecutor:
+        if self._decode_pool is None:
+            self._decode_pool = ThreadPoolExecutor(
+                max_workers=min(self.task.agent_count, MAX_DECODE_WORKERS), thread_name_prefix='minerl-decode')
+        return self._decode_pool
+
+    def _recv_step_reply(self, actor_name, connection, decode=True, pool=None) -> Tuple[
+            Optional[Dict[str, Any]], float, bool, Dict[str, Any]]:
+        """Receives the step reply of an agent. If a pool is given, the observation is
+        decoded on it and returned as a future of the (observation, monitor) pair.
+        """
+        # Receive the observation.
+        obs = _recv_reply(connection)
+
+        # Receive reward done and sent.
+        reply = _recv_reply(connection)
+
+        # Receive info from the environment.
+        _malmo_json = _recv_reply(connection)
+        return self._process_step_reply(actor_name, obs, reply, _malmo_json, decode, pool)
+
+    def _recv_step_reply_by(self, deadline, actor_name, connection, decode=True, pool=None) -> Tuple[
+            Optional[Dict[str, Any]], float, bool, Dict[str, Any]]:
+        """Receives the step reply of an agent (see _recv_step_reply), raising socket.timeout
+        if the instance stalls partway through it past the (time.monotonic) deadline, or
+        MIN_REPLY_TIMEOUT if that is later.
+        """
+        timeout = connection.gettimeout()
+        connection.settimeout(max(deadline - time.monotonic(), MIN_REPLY_TIMEOUT))
+        try:
+            return self._recv_step_reply(actor_name, connection, decode, pool)
+        finally:
+            connection.settimeout(timeout)
+
+    def _process_step_reply(self, actor_name, obs, reply, _malmo_json, decode=True, pool=None) -> Tuple[
+            Optional[Dict[str, Any]], float, bool, Dict[str, Any]]:
+        """Processes the (observation, reward and done, info) messages of a step reply; see _recv_step_reply."""
+        reward, done, sent = struct.unpack("!dbb", reply)
+        # TODO: REFACTOR TO USE REWARD HANDLERS INSTEAD OF MALMO REWARD.
+        done = (done == 1)
+        if done:
+            logger.info("Agent {} has finished".format(actor_name))
+
+        self.has_finished[actor_name] = self.has_finished[actor_name] or done
+
+        if not (decode or done):
+            self._skipped_replies[actor_name] = (obs, _malmo_json)
+            return None, reward, done, {}
+        _malmo_json = str(_malmo_json, "utf-8")
+
+        # Process the observation and done state.
+        if pool is not None:
+            return pool.submit(self._process_observation, actor_name, obs, _malmo_json), reward, done, None
+        out_obs, monitor = self._process_observation(actor_name, obs, _malmo_json)
+        return out_obs, reward, done, monitor
+
     def noop_action(self):
         """Gets the no-op action for the environment.
 
@@ -421,6 +754,21 @@ class _MultiAgentEnv(gym.Env):
             The first observation of the environment. 
         """
         try:
+            if self._hot_spares is not None:
+                self._hot_spares.fill()
+
+            standby_instances = []
+            if self._standby is not None:
+                # The standby episode was set up without the seed; it is only good for unseeded resets.
+                standby = self._standby.result()
+                self._standby = None
+                if self._seed is None and standby.error is None:
+                    return self._swap_in_standby(standby)
+                if standby.error is not None:
+                    logger.error("Failed to set up the standby episode ({}), resetting in place.".format(
+                        standby.error))
+                standby_instances = standby.instances
+
             # First reset the env spec and its handlers
             self.task.reset()
 
@@ -437,24 +785,18 @@ class _MultiAgentEnv(gym.Env):
 
             # Episodic state variables
             self.done = False
+            self._pending_step = None
             self.has_finished = {agent: False for agent in self.task.agent_names}
 
-            # Start the Mission/Task, by sending the master mission XML over 
-            # the pipe to these instances, and  update the agent xmls to get
-            # the port/ip of the master agent send the remaining XMLS.
-
-            self._send_mission(self.instances[0], agent_xmls[0], self._get_token(0, ep_uid))  # Master
-            if self.task.agent_count > 1:
-                mc_server_ip, mc_server_port = self._TO_MOVE_find_ip_and_port(self.instances[0],
-                                                                              self._get_token(1, ep_uid))
-                # update slave instnaces xmls with the server port and IP and setup their missions.
-                for slave_instance, slave_xml, role in list(zip(
-                        self.instances, agent_xmls, range(1, self.task.agent_count + 1)))[1:]:
-                    self._setup_slave_master_connection_info(slave_xml, mc_server_ip, mc_server_port)
-                    self._send_mission(slave_instance, slave_xml, self._get_token(role, ep_uid))
+            # Start the Mission/Task.
+            self._start_mission(self.instances, agent_xmls, ep_uid)
 
             # Finally, peek all of the observations.
-            return self._peek_obs()
+            multi_obs = self._peek_obs()
+
+            if self._reset_ahead:
+                self._standby = self._standby_pool.submit(self._prepare_standby, standby_instances)
+            return multi_obs
 
         finally:
 
@@ -464,10 +806,120 @@ class _MultiAgentEnv(gym.Env):
             # the episode in a cascading fashion
             self._seed = None
 
+    def _start_mission(self, instances: List[MinecraftInstance], agent_xmls: List[etree.Element],
+                       ep_uid: str, episode=None) -> None:
+        """Starts the Mission/Task, by sending the master mission XML over the pipe to
+        the instances, and updating the agent xmls to get the port/ip of the master
+        agent before sending the remaining XMLS to all of the slaves at once.
+
+        The time (in seconds since this call) at which each agent got to each stage is
+        kept in the mission_init_timeline, and the master's server port in the
+        integratedServerPort, of episode: the env, or the _Standby being set up.
+        """
+        episode = self if episode is None else episode
+        timeline = MissionInitTimeline(self.task.agent_names)
+        episode.mission_init_timeline = timeline
+
+        self._send_mission(instances[0], agent_xmls[0], self._get_token(0, ep_uid))  # Master
+        timeline.mark(self.task.agent_names[0], 'mission_started')
+        if self.task.agent_count > 1:
+            mc_server_ip, mc_server_port = self._TO_MOVE_find_ip_and_port(instances[0],
+                                                                          self._get_token(1, ep_uid))
+            episode.integratedServerPort = int(mc_server_port)
+            timeline.mark(self.task.agent_names[0], 'server_found')
+
+            # update slave instnaces xmls with the server port and IP and setup their missions.
+            def start_slave(actor_name, slave_instance, slave_xml, role):
+                self._setup_slave_master_connection_info(slave_xml, mc_server_ip, mc_server_port)
+                self._send_mission(slave_instance, slave_xml, self._get_token(role, ep_uid))
+                timeline.mark(actor_name, 'mission_started')
+
+            slaves = list(zip(self.task.agent_names, instances, agent_xmls, range(1, self.task.agent_count + 1)))[1:]
+            with ThreadPoolExecutor(max_workers=len(slaves)) as tpe:
+                for future in [tpe.submit(start_slave, *slave) for slave in slaves]:
+                    future.result()
+
+    def _prepare_standby(self, instances: List[MinecraftInstance]) -> '_Standby':
+        """Sets up the next episode on the given instances (launching missing ones), up to
+        the point where only its first observation has to be peeked.
+
+        Runs on the reset-ahead thread while the current episode is stepped on the main
+        thread, which only uses the compiled decoder and encoder of its own episode.
+        """
+        standby = _Standby(instances)
+        try:
+            self.task.reset()
+            standby.observation_space = self.task.observation_space
+            standby.action_space = self.task.action_space
+            standby.monitor_space = self.task.monitor_space
+            standby.observation_decoder = self.task.compile_observation_decoder()
+            standby.action_encoder = self.task.compile_action_encoder()
+
+            ep_uid = str(uuid.uuid4())
+            agent_xmls = self._setup_agent_xmls(ep_uid)
+            standby.instances = self._prepare_instances(instances)
+            self._start_mission(standby.instances, agent_xmls, ep_uid, standby)
+        except Exception as e:
+            logger.error(traceback.format_exc())
+            standby.error = e
+        return standby
+
+    def _swap_in_standby(self, standby: '_Standby') -> Dict[str, Any]:
+        """Makes the standby episode the current one and sets the next one up on the old instances."""
+        old_instances = self.instances
+        self.instances = standby.instances
+        self.observation_space = standby.observation_space
+        self.action_space = standby.action_space
+        self.monitor_space = standby.monitor_space
+        self._observation_decoder = standby.observation_decoder
+        self._action_encoder = standby.action_encoder
+        self.mission_init_timeline = standby.mission_init_timeline
+        if standby.integratedServerPort is not None:
+            self.integratedServerPort = standby.integratedServerPort
+        self.pov_frames = {}
+
+        self.done = False
+        self._pending_step = None
+        self.has_finished = {agent: False for agent in self.task.agent_names}
+        try:
+            return self._peek_obs()
+        finally:
+            self._standby = self._standby_pool.submit(self._prepare_standby, old_instances)
+
+    def _fail_over(self) -> None:
+        """Disconnects the instances which failed during the step, and moves their agents
+        onto hot spares for the next reset while they are rebuilt in the background.
+
+        Without a ready spare a failed instance stays in place, and the next reset
+        reconnects to it (relaunching it if it is frozen).
+        """
+        failed, self._failed_instances = self._failed_instances, []
+        for instance in failed:
+            self._TO_MOVE_clean_connection(instance)
+            if self._hot_spares is None or instance not in self.instances:
+                continue
+            spare = self._hot_spares.take(instance.host)
+            if spare is None:
+                continue
+            logger.warning("Failing over from {} to the hot spare {}.".format(instance, spare))
+            self.instances[self.instances.index(instance)] = spare
+            self._hot_spares.rebuild(instance)
+
     def _setup_spaces(self) -> None:
+        # The spaces are rebuilt together with the handlers they describe, so while they
+        # stay the same objects across resets, so can the decoder and encoder.
+        if (getattr(self, 'observation_space', None) is self.task.observation_space
+                and getattr(self, 'action_space', None) is self.task.action_space
+                and getattr(self, 'monitor_space', None) is self.task.monitor_space):
+            return
         self.observation_space = self.task.observation_space
         self.action_space = self.task.action_space
         self.monitor_space = self.task.monitor_space
+        self._observation_decoder = self.task.compile_observation_decoder()
+        self._action_encoder = self.task.compile_action_encoder()
+        # The frame buffers of the agents, when the POV is decoded into them (see
+        # POVObservation.buffer_frames); each keeps the agent's last frames as a stack.
+        self.pov_frames = {}
 
     def _setup_agent_xmls(self, ep_uid: str) -> List[etree.Element]:
         """Generates the XML for an episode.
@@ -477,12 +929,12 @@ class _MultiAgentEnv(gym.Env):
         Returns:
             str: The XML for an episode.
         """
-        xml_in = self.task.to_xml()
         agent_xmls = []
 
-        base_xml = etree.fromstring(xml_in)
+        base_xml = self.task.to_xml_etree()
         for role in range(self.task.agent_count):
-            agent_xml = deepcopy(base_xml)
+            # The last agent can take the mission tree itself.
+            agent_xml = deepcopy(base_xml) if role < self.task.agent_count - 1 else base_xml
             agent_xml_etree = etree.fromstring(
                 """<MissionInit xmlns="http://ProjectMalmo.microsoft.com"
                    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
@@ -519,8 +971,9 @@ class _MultiAgentEnv(gym.Env):
                 ss.insert(0, hi)
 
             # inject mission dict into the xml
-            xml_dict = self._xml_mutator_to_be_deprecated(xmltodict.parse(etree.tostring(agent_xml_etree)))
-            agent_xml_etree = etree.fromstring(xmltodict.unparse(xml_dict).encode())
+            if self._xml_mutator_to_be_deprecated is not None:
+                xml_dict = self._xml_mutator_to_be_deprecated(xmltodict.parse(etree.tostring(agent_xml_etree)))
+                agent_xml_etree = etree.fromstring(xmltodict.unparse(xml_dict).encode())
 
             agent_xmls.append(agent_xml_etree)
 
@@ -529,29 +982,46 @@ class _MultiAgentEnv(gym.Env):
     def _setup_instances(self) -> None:
         """Sets up the instances for the environment 
         """
-        num_instances_to_start = self.task.agent_count - len(self.instances)
-        num_old_instances = len(self.instances)
+        self.instances = self._prepare_instances(self.instances)
+
+    def _prepare_instances(self, instances: List[MinecraftInstance]) -> List[MinecraftInstance]:
+        """Starts missing instances, quits their episodes and makes socket connections.
+
+        Returns:
+            The instances, ready to recieve a mission.
+        """
+        instances = list(instances)
+        num_instances_to_start = self.task.agent_count - len(instances)
+        num_old_instances = len(instances)
         instance_futures = []
         if num_instances_to_start > 0:
             with ThreadPoolExecutor(max_workers=num_instances_to_start) as tpe:
                 for _ in range(num_instances_to_start):
                     instance_futures.append(tpe.submit(self._get_new_instance))
-            self.instances.extend([f.result() for f in instance_futures])
-            self.instances = self.instances[:self.task.agent_count]
-        # self.instances = [self._get_new_instance(port=12000)]
+            instances.extend([f.result() for f in instance_futures])
+            instances = instances[:self.task.agent_count]
+        # instances = [self._get_new_instance(port=12000)]
 
         # Refresh old instances every N setups
         if self._refresh_inst_every is not None and self._inst_setup_cntr % self._refresh_inst_every == 0:
             for i in reversed(range(num_old_instances)):
-                self.instances[i].kill()
-                self.instances[i] = self._get_new_instance(instance_id=self.instances[i].instance_id)
+                self._TO_MOVE_clean_connection(instances[i])
+                instances[i].kill()
+                instances[i] = self._get_new_instance(instance_id=instances[i].instance_id)
         self._inst_setup_cntr += 1
 
-        # Now let's clean and establish new socket connections.
+        # Now let's quit the current episodes, keeping healthy socket connections and
+        # establishing new ones where needed.
         # Note: it is important that all clients are informed of the episode end BEFORE the
         #  server. Since the first client is the one that communicates to the server, we
         #  inform it last by iterating backwards.
-        for instance in reversed(self.instances):
+        for instance in reversed(instances):
+            if self._TO_MOVE_has_live_connection(instance):
+                try:
+                    self._TO_MOVE_quit_current_episode(instance)
+                    continue
+                except (socket.timeout, socket.error) as e:
+                    logger.warning("Connection with {} failed ({}), reconnecting.".format(instance, e))
             self._TO_MOVE_clean_connection(instance)
             self._TO_MOVE_create_connection(instance)
             # The socket could be failed here. This method
@@ -559,7 +1029,8 @@ class _MultiAgentEnv(gym.Env):
             # TODO: Properly rewrite fault tolerance.
             self._TO_MOVE_quit_current_episode(instance)
 
-        # Now we should have clean instances with clean sockets ready to recieve a mission.
+        # Now we should have clean instances with live sockets ready to recieve a mission.
+        return instances
 
     def _setup_slave_master_connection_info(self,
                                             slave_xml: etree.Element,
@@ -581,9 +1052,43 @@ class _MultiAgentEnv(gym.Env):
         Raises:
             socket.timeout: If the mission cannot be sent.
         """
+        self._exchange(self._send_mission_exchange(instance, mission_xml_etree, token_in))
+
+    ############# MALMO EXCHANGES ##################
+    # The exchanges with the instances are written once, as generators which yield either
+    # (connection, messages, number of replies), to send the messages and then be sent the
+    # replies, or a number of seconds to sleep for. _exchange drives them over blocking
+    # connections and AsyncMineRLEnv._async_exchange over asyncio streams.
+    ################################################
+
+    @staticmethod
+    def _exchange(exchange):
+        """Drives an exchange over blocking connections.
+
+        Returns:
+            What the exchange returns.
+        """
+        result = None
+        try:
+            while True:
+                request = exchange.send(result)
+                if isinstance(request, tuple):
+                    connection, messages, num_replies = request
+                    for message in messages:
+                        comms.send_message(connection, message)
+                    result = [_recv_reply(connection) for _ in range(num_replies)]
+                else:
+                    time.sleep(request)
+                    result = None
+        except StopIteration as stop:
+            return stop.value
+
+    def _send_mission_exchange(self, instance: MinecraftInstance, mission_xml_etree: etree.Element, token_in: str):
         # init all instance missions
         ok = 0
         num_retries = 0
+        backoff = comms.Backoff(initial=0.05)
+        start_time = time.time()
         logger.debug("Sending mission init: {instance}".format(instance=instance))
         while ok != 1:
             # roundtrip through etree to escape symbols correctly
@@ -599,46 +1104,71 @@ class _MultiAgentEnv(gym.Env):
             if self._seed is not None:
                 token += ":{}".format(self._seed)
             token = token.encode()
-            comms.send_message(instance.client_socket, mission_xml)
-            comms.send_message(instance.client_socket, token)
-
-            reply = comms.recv_message(instance.client_socket)
+            reply, = yield instance.client_socket, [mission_xml, token], 1
             ok, = struct.unpack("!I", reply)
             if ok != 1:
                 num_retries += 1
-                # TODO: This is odd, MAX_WAIT is usually a number of seconds but here
-                #  it's a number of retries. Probably needs to be fixed.
-                if num_retries > MAX_WAIT:
+                if time.time() - start_time > MAX_WAIT:
                     raise socket.timeout()
-                logger.debug("Recieved a MALMOBUSY from {}; trying again.".format(instance))
-                time.sleep(1)
+                logger.debug("Recieved a MALMOBUSY from {}; trying again ({}).".format(instance, num_retries))
+                yield backoff.next_delay()
 
-    def _peek_obs(self):
+    def _find_ip_and_port_exchange(self, instance: MinecraftInstance, token: str):
+        # calling Find on the master client to get the server port
+        # try until you get something valid
+        port = 0
+        backoff = comms.Backoff(maximum=0.5)
+        start_time = time.time()
+
+        logger.info("Attempting to find_ip: {instance}".format(instance=instance))
+        while port == 0 and time.time() - start_time <= MAX_WAIT:
+            reply, = yield instance.client_socket, [("<Find>" + token + "</Find>").encode()], 1
+            port, = struct.unpack('!I', reply)
+            if port == 0:
+                yield backoff.next_delay()
+        if port == 0:
+            raise Exception("Failed to find master server port!")
+        logger.warning("MineRL agent is public, connect on port {} with Minecraft 1.11".format(port))
+
+        # go ahead and set port for all non-controller clients
+        return instance.host, str(port)
+
+    def _quit_current_episode_exchange(self, instance: MinecraftInstance):
+        logger.info("Attempting to quit: {instance}".format(instance=instance))
+        reply, = yield instance.client_socket, ["<Quit/>".encode()], 1
+        ok, = struct.unpack('!I', reply)
+        # TODO: Get this to work properly
+
+    def _peek_obs_exchange(self):
+        self._clear_pov_frames()
         multi_obs = {}
         if not self.done:
             logger.debug("Peeking the clients.")
             peek_message = "<Peek/>"
             multi_done = True
+            # Every agent is asked at once, so that waiting on one does not hold up the others.
+            for instance in self.instances:
+                yield instance.client_socket, [peek_message.encode()], 0
             for actor_name, instance in zip(self.task.agent_names, self.instances):
                 start_time = time.time()
-                comms.send_message(instance.client_socket, peek_message.encode())
-                obs = comms.recv_message(instance.client_socket)
-                info = comms.recv_message(instance.client_socket).decode('utf-8')
+                obs, info, reply = yield instance.client_socket, [], 3
+                info = str(info, 'utf-8')
 
-                reply = comms.recv_message(instance.client_socket)
                 done, = struct.unpack('!b', reply)
                 self.has_finished[actor_name] = self.has_finished[actor_name] or done
                 multi_done = multi_done and done == 1
-                if obs is None or len(obs) == 0:
+                if len(obs) == 0:
                     if time.time() - start_time > MAX_WAIT:
                         instance.client_socket.close()
                         instance.client_socket = None
                         raise MissionInitException(
                             'too long waiting for first observation')
-                    time.sleep(0.1)
+                    yield 0.1
                     # FIXME - shouldn't we error or retry here?
 
                 multi_obs[actor_name], _ = self._process_observation(actor_name, obs, info)
+                if self.mission_init_timeline is not None:
+                    self.mission_init_timeline.mark(actor_name, 'first_observation')
             self.done = multi_done
             if self.done:
                 raise RuntimeError(
@@ -646,6 +1176,15 @@ class _MultiAgentEnv(gym.Env):
                     "`done` was true on first frame.")
         return multi_obs
 
+    def _clear_pov_frames(self) -> None:
+        # Frame stacks don't span episodes.
+        for frames in self.pov_frames.values():
+            if frames is not None:
+                frames.clear()
+
+    def _peek_obs(self):
+        return self._exchange(self._peek_obs_exchange())
+
     #############  CLOSE METHOD ###############
     def close(self):
         """gym api close"""
@@ -657,7 +1196,19 @@ class _MultiAgentEnv(gym.Env):
         if self._already_closed:
             return
 
-        for instance in self.instances:
+        instances = list(self.instances)
+        if self._standby is not None:
+            # Waits for the standby episode to be set up, so that its instances can be killed too.
+            instances.extend(self._standby.result().instances)
+            self._standby = None
+        if self._standby_pool is not None:
+            self._standby_pool.shutdown(wait=True)
+        if self._decode_pool is not None:
+            self._decode_pool.shutdown(wait=True)
+        if self._hot_spares is not None:
+            instances.extend(self._hot_spares.close())
+
+        for instance in instances:
             self._TO_MOVE_clean_connection(instance)
 
             if instance.running:
@@ -712,7 +1263,16 @@ class _MultiAgentEnv(gym.Env):
             # There is no connection left!
             pass
 
-            instance.client_socket = None
+        instance.client_socket = None
+
+    @staticmethod
+    def _TO_MOVE_has_live_connection(instance: MinecraftInstance) -> bool:
+        """Whether the instance's connection can be kept for the next episode.
+
+        Connections are kept across episodes, and only recreated once they fail.
+        """
+        connection = getattr(instance, 'client_socket', None)
+        return connection is not None and connection.is_alive()
 
     def _TO_MOVE_handle_frozen_minecraft(self, instance):
         if instance.had_to_clean:
@@ -737,7 +1297,7 @@ class _MultiAgentEnv(gym.Env):
             logger.debug("Saying hello for client: {instance}".format(instance=instance))
             self._TO_MOVE_hello(sock)
 
-            instance.client_socket = sock
+            instance.client_socket = comms.Connection(sock)
         except (socket.timeout, socket.error, ConnectionRefusedError) as e:
             instance.had_to_clean = True
             logger.error("Failed to reset (socket error), trying again!")
@@ -747,43 +1307,10 @@ class _MultiAgentEnv(gym.Env):
             raise e
 
     def _TO_MOVE_quit_current_episode(self, instance: MinecraftInstance) -> None:
-        has_quit = False
-
-        logger.info("Attempting to quit: {instance}".format(instance=instance))
-        # while not has_quit:
-        comms.send_message(instance.client_socket, "<Quit/>".encode())
-        reply = comms.recv_message(instance.client_socket)
-        ok, = struct.unpack('!I', reply)
-        has_quit = not (ok == 0)
-        # TODO: Get this to work properly
-
-        # time.sleep(0.1) 
+        self._exchange(self._quit_current_episode_exchange(instance))
 
     def _TO_MOVE_find_ip_and_port(self, instance: MinecraftInstance, token: str) -> Tuple[str, str]:
-        # calling Find on the master client to get the server port
-        sock = instance.client_socket
-
-        # try until you get something valid
-        port = 0
-        tries = 0
-        start_time = time.time()
-
-        logger.info("Attempting to find_ip: {instance}".format(instance=instance))
-        while port == 0 and time.time() - start_time <= MAX_WAIT:
-            comms.send_message(
-                sock, ("<Find>" + token + "</Find>").encode()
-            )
-            reply = comms.recv_message(sock)
-            port, = struct.unpack('!I', reply)
-            tries += 1
-            time.sleep(0.1)
-        if port == 0:
-            raise Exception("Failed to find master server port!")
-        self.integratedServerPort = port  # should/can this even be cached?
-        logger.warning("MineRL agent is public, connect on port {} with Minecraft 1.11".format(port))
-
-        # go ahead and set port for all non-controller clients
-        return instance.host, str(port)
+        return self._exchange(self._find_ip_and_port_exchange(instance, token))
 
     @staticmethod
     def _TO_MOVE_hello(sock):
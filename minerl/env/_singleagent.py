@@ -22,16 +22,27 @@ class _SingleAgentEnv(_MultiAgentEnv):
         multi_obs = super().reset()
         return multi_obs[self.task.agent_names[0]]
 
-    def step(self, single_agent_action: Dict[str, Any]) -> Tuple[
+    def step(self, single_agent_action: Dict[str, Any], repeat: int = 1) -> Tuple[
         Dict[str, Any], float, bool, Dict[str, Any]]:
         aname = self.task.agent_names[0]
         multi_agent_action = {
             aname: single_agent_action
         }
-        obs, rew, done, info = super().step(multi_agent_action)
+        obs, rew, done, info = super().step(multi_agent_action, repeat)
 
         return obs[aname], rew[aname], done, info[aname]
 
+    def step_async(self, single_agent_action: Dict[str, Any]) -> None:
+        self._step_async({self.task.agent_names[0]: single_agent_action})
+
+    def step_wait(self) -> Tuple[Dict[str, Any], float, bool, Dict[str, Any]]:
+        aname = self.task.agent_names[0]
+        obs, rew, done, info = self._step_wait()
+        return obs[aname], rew[aname], done, info[aname]
+
+    def decode_skipped_observations(self) -> Dict[str, Any]:
+        return super().decode_skipped_observations()[self.task.agent_names[0]]
+
     def render(self, mode='human'):
         return super().render(mode)[self.task.agent_names[0]]
 
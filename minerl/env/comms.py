@@ -17,6 +17,8 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 # ------------------------------------------------------------------------------------------------
 
+import asyncio
+import select
 import struct
 import socket
 import functools
@@ -53,31 +55,307 @@ def retry(func):
     return wrapper
 
 
+def async_retry(func):
+    """retry for coroutines, which backs off (see Backoff) between the attempts rather
+    than blocking the event loop."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        backoff = Backoff(maximum=retry_timeout)
+        for i in range(retry_count):
+            try:
+                return await func(*args, **kwargs)
+            except (asyncio.TimeoutError, socket.timeout, socket.error, RuntimeError) as e:
+                if i == retry_count - 1:
+                    raise
+                logger.debug("Pause before retry on " + str(e))
+                await asyncio.sleep(backoff.next_delay())
+
+    return wrapper
+
+
+class Backoff(object):
+    """Exponentially growing sleeps for polling an instance until it is ready.
+
+    Starts short so that a ready instance is noticed quickly, and backs off so that
+    a slow one (e.g. still generating its world) is not flooded with requests.
+    """
+
+    def __init__(self, initial=0.01, maximum=1.0, factor=2.0):
+        self.delay = initial
+        self.maximum = maximum
+        self.factor = factor
+
+    def next_delay(self):
+        """The time to sleep before the next poll, e.g. to await asyncio.sleep on it."""
+        delay = self.delay
+        self.delay = min(self.delay * self.factor, self.maximum)
+        return delay
+
+    def sleep(self):
+        time.sleep(self.next_delay())
+
+
+HEADER = struct.Struct('!I')
+
+# Bytes pulled off the socket per recv_into when reading ahead of the current frame.
+READ_AHEAD = 64 * 1024
+PAYLOAD_ALIGNMENT = 4096
+# asyncio stream buffer limit; POV frames are several megabytes.
+STREAM_LIMIT = 8 * 1024 * 1024
+
+
 def send_message(sock, data):
-    length = len(data)
-    sock.sendall(struct.pack('!I', length))
-    sock.sendall(data)
+    if isinstance(sock, (Connection, AsyncConnection)):
+        return sock.send_message(data)
+    _send_frame(sock, HEADER.pack(len(data)), data)
 
 
 def recv_message(sock):
+    if isinstance(sock, Connection):
+        return sock.recv_message()
     lengthbuf = recvall(sock, 4)
     if not lengthbuf:
         return None
-    length, = struct.unpack('!I', lengthbuf)
+    length, = HEADER.unpack(lengthbuf)
     return recvall(sock, length)
 
 
 def recvall(sock, count):
-    buf = b''
+    buf = bytearray(count)
+    view = memoryview(buf)
     while count:
-        newbuf = sock.recv(count)
-        if not newbuf:
+        nbytes = sock.recv_into(view, count)
+        if not nbytes:
             return None
-        buf += newbuf
-        count -= len(newbuf)
+        view = view[nbytes:]
+        count -= nbytes
     return buf
 
 
+def _send_frame(sock, header, data):
+    """Writes the length header and the payload with a single gather write where the
+    platform supports it (sendmsg is not available on Windows).
+    """
+    if not hasattr(sock, 'sendmsg'):
+        sock.sendall(header + bytes(data))
+        return
+
+    sent = sock.sendmsg([header, data])
+    if sent < len(header):
+        sock.sendall(header[sent:])
+        sent = len(header)
+    if sent < len(header) + len(data):
+        sock.sendall(memoryview(data)[sent - len(header):])
+
+
+def _is_exported(buf):
+    """Whether a memoryview or numpy array still references buf.
+
+    bytearrays refuse to resize while their buffer is exported, which makes
+    this a cheap way to know if a previously returned payload is still in use.
+    """
+    try:
+        buf.append(0)
+    except BufferError:
+        return True
+    del buf[-1]
+    return False
+
+
+class Connection(object):
+    """A buffered, framed connection to a MalmoEnv server.
+
+    Frames are a 4 byte big-endian length followed by the payload. Replies are
+    read ahead into a fixed buffer with recv_into, and payloads are assembled in
+    reusable preallocated bytearrays which are handed out as memoryview slices.
+    A payload buffer is only reused once nothing references the previous
+    memoryview, so observations built on top of it with np.frombuffer stay valid
+    for as long as the caller keeps them around.
+
+    Args:
+        sock (socket.socket): A connected socket.
+        read_ahead (int, optional): Size of the read ahead buffer. Defaults to READ_AHEAD.
+    """
+
+    MAX_PAYLOAD_BUFFERS = 4
+
+    def __init__(self, sock, read_ahead=READ_AHEAD):
+        self.sock = sock
+        self._rbuf = bytearray(read_ahead)
+        self._rview = memoryview(self._rbuf)
+        self._rstart = 0
+        self._rend = 0
+        self._payload_buffers = []
+
+    def send_message(self, data):
+        _send_frame(self.sock, HEADER.pack(len(data)), data)
+
+    def recv_message(self):
+        """Receives the next frame.
+
+        Returns:
+            memoryview: The payload, or None if the connection was closed.
+        """
+        if not self._fill(HEADER.size):
+            return None
+        length, = HEADER.unpack_from(self._rbuf, self._rstart)
+        self._rstart += HEADER.size
+
+        payload = self._payload_buffer(length)
+        view = memoryview(payload)[:length]
+
+        # First drain what has already been read ahead, then read the remainder
+        # of the payload straight into the payload buffer.
+        buffered = min(length, self._rend - self._rstart)
+        view[:buffered] = self._rview[self._rstart:self._rstart + buffered]
+        self._rstart += buffered
+        received = buffered
+        while received < length:
+            nbytes = self.sock.recv_into(view[received:], length - received)
+            if not nbytes:
+                return None
+            received += nbytes
+        return view
+
+    def pending(self):
+        """The number of bytes already read ahead from the socket but not yet consumed."""
+        return self._rend - self._rstart
+
+    def is_alive(self):
+        """Whether the connection can be reused for the next exchange.
+
+        A cheap, non-blocking check: the socket is open, and nothing is waiting to be
+        read, which would mean either that the peer has closed the connection or that
+        a stray reply would put the framing out of step.
+        """
+        if self.sock.fileno() < 0 or self.pending():
+            return False
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def _fill(self, count):
+        """Reads from the socket until at least count bytes are buffered."""
+        if self._rend - self._rstart >= count:
+            return True
+        if self._rstart:
+            # Compact what is left to the front of the read ahead buffer.
+            remaining = self._rend - self._rstart
+            self._rview[:remaining] = self._rview[self._rstart:self._rend]
+            self._rstart, self._rend = 0, remaining
+        while self._rend - self._rstart < count:
+            nbytes = self.sock.recv_into(self._rview[self._rend:])
+            if not nbytes:
+                return False
+            self._rend += nbytes
+        return True
+
+    def _payload_buffer(self, length):
+        # Best fit, so that small replies don't claim the buffers sized for frames.
+        free = [buf for buf in self._payload_buffers if len(buf) >= length and not _is_exported(buf)]
+        if free:
+            return min(free, key=len)
+
+        # Forget buffers that are still referenced elsewhere; their owners keep them alive.
+        if len(self._payload_buffers) >= self.MAX_PAYLOAD_BUFFERS:
+            self._payload_buffers = [b for b in self._payload_buffers if not _is_exported(b)]
+            if len(self._payload_buffers) >= self.MAX_PAYLOAD_BUFFERS:
+                self._payload_buffers.pop(0)
+        # Round up so that slowly growing payloads (e.g. the info JSON) don't reallocate every step.
+        buf = bytearray(-(-length // PAYLOAD_ALIGNMENT) * PAYLOAD_ALIGNMENT)
+        self._payload_buffers.append(buf)
+        return buf
+
+    def settimeout(self, timeout):
+        self.sock.settimeout(timeout)
+
+    def gettimeout(self):
+        return self.sock.gettimeout()
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def shutdown(self, how):
+        self.sock.shutdown(how)
+
+    def close(self):
+        self._payload_buffers = []
+        self.sock.close()
+
+
+class AsyncConnection(object):
+    """The asyncio streams counterpart of Connection.
+
+    send_message only queues the frame on the transport; await drain() to apply
+    backpressure. Every coroutine must run on the event loop the connection was
+    opened on.
+
+    Args:
+        reader (asyncio.StreamReader): The stream reader of the connection.
+        writer (asyncio.StreamWriter): The stream writer of the connection.
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def open(cls, host, port, limit=STREAM_LIMIT):
+        reader, writer = await asyncio.open_connection(host, port, limit=limit)
+        return cls(reader, writer)
+
+    def send_message(self, data):
+        self.writer.writelines([HEADER.pack(len(data)), data])
+
+    async def drain(self):
+        await self.writer.drain()
+
+    async def recv_message(self):
+        """Receives the next frame.
+
+        Returns:
+            bytes: The payload, or None if the connection was closed.
+        """
+        try:
+            length, = HEADER.unpack(await self.reader.readexactly(HEADER.size))
+            return await self.reader.readexactly(length)
+        except asyncio.IncompleteReadError:
+            return None
+
+    def pending(self):
+        """The number of bytes the reader has buffered but which were not yet consumed."""
+        # StreamReader has no public way to peek at its buffer.
+        return len(self.reader._buffer)
+
+    def is_alive(self):
+        """Whether the connection can be reused; see Connection.is_alive.
+
+        As there, a connection with anything waiting to be read, buffered by the reader or
+        still on the socket, is out of step (or closed by the peer) and is not reused.
+        """
+        if self.writer.is_closing() or self.reader.at_eof() or self.reader.exception() is not None:
+            return False
+        if self.pending():
+            return False
+        sock = self.writer.get_extra_info('socket')
+        if sock is None:
+            return True
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def shutdown(self, how):
+        if self.writer.can_write_eof():
+            self.writer.write_eof()
+
+    def close(self):
+        self.writer.close()
+
+
 class QueueLogger(logging.StreamHandler):
     def __init__(self, queue):
         self._queue = queue
@@ -1,8 +1,10 @@
+import contextlib
 import gym
 import json
 import numpy as np
 from copy import deepcopy
-from minerl.herobraine.hero import mc, handlers
+from minerl.env._multiagent import _MultiAgentEnv
+from minerl.herobraine.hero import mc, handlers, spaces
 from collections import defaultdict, deque
 
 
@@ -47,15 +49,29 @@ class ReplayWrapper(gym.Wrapper):
         ob = self.env.reset()
         ob = self.extra_steps_on_reset(ob)
         if self.replay_on_reset:
+            discarded = False
             while len(self.actions) > 0:
                 action, next_action = self.get_action_pair()
                 if not self.is_on_trajectory(action):
                     break
                 ac = self.replay2env(action, next_action)
-                ob, _, done, _ = self.env.step(ac)
+                discarded = next_action is not None
+                with self._discarding_observations(discarded):
+                    ob, _, done, _ = self.env.step(ac)
                 assert not done, "Replay put environment in done state"
+            if discarded and isinstance(self.unwrapped, _MultiAgentEnv):
+                # The replay left the trajectory after a step whose observation was skipped.
+                ob = self.unwrapped.decode_skipped_observations()
         return ob
 
+    def _discarding_observations(self, discard):
+        # Only the observation after the last replayed action is returned, so the
+        # ones before it need not be decoded (is_on_trajectory implementations are
+        # expected to track the state they compare against themselves).
+        if discard and isinstance(self.unwrapped, _MultiAgentEnv):
+            return self.unwrapped.discarding_observations()
+        return contextlib.ExitStack()  # (A no-op context; contextlib.nullcontext needs Python 3.7.)
+
     def get_action_pair(self):
         replay_action = self.actions.popleft()
         next_action = self.actions[0] if len(self.actions) > 0 else None
@@ -316,8 +332,12 @@ def subtract_stats(ob, base_ob):
     Subtract stats in base_ob from ob
     """
 
-    for k, v in base_ob["inventory"].items():
-        ob["inventory"][k] = max(0, ob["inventory"][k] - v)
+    if isinstance(ob["inventory"], spaces.InventoryCounts):
+        ob["inventory"] = spaces.InventoryCounts(
+            np.maximum(0, ob["inventory"].counts - base_ob["inventory"].counts), ob["inventory"].item_index)
+    else:
+        for k, v in base_ob["inventory"].items():
+            ob["inventory"][k] = max(0, ob["inventory"][k] - v)
 
     for coord in ("xpos", "ypos", "zpos"):
         ob["location_stats"][coord] -= base_ob["location_stats"]["xpos"]
@@ -0,0 +1,89 @@
+import asyncio
+import socket
+import types
+
+import pytest
+
+from minerl.env import comms
+from minerl.env.test_stepping import FakeMalmoPeer
+from minerl.herobraine.env_specs.navigate_specs import Navigate
+
+
+def make_async_env(agent_count, **peer_kwargs):
+    env = Navigate(dense=True, extreme=False, agent_count=agent_count).make(asynchronous=True)
+    env._loop = asyncio.new_event_loop()
+    env.instances, peers = [], []
+    for _ in range(env.task.agent_count):
+        ours, theirs = socket.socketpair()
+        reader, writer = env._loop.run_until_complete(asyncio.open_connection(sock=ours))
+        env.instances.append(types.SimpleNamespace(client_socket=comms.AsyncConnection(reader, writer)))
+        peers.append(FakeMalmoPeer(theirs, **peer_kwargs))
+        peers[-1].start()
+    env.done = False
+    env.has_finished = {agent: False for agent in env.task.agent_names}
+    return env, peers
+
+
+def test_async_step_matches_the_sync_step():
+    env, peers = make_async_env(2, done_after=2)
+    obs, reward, done, info = env.step(env.action_space.no_op())
+    assert list(obs) == env.task.agent_names
+    assert all(r == 1.0 for r in reward.values())
+    assert not done
+    assert obs['agent_0']['pov'].shape == (64, 64, 3)
+
+    obs, reward, done, info = env._loop.run_until_complete(env.async_step(env.action_space.no_op()))
+    assert done
+    assert [m[:11] for m in peers[0].messages[:2]] == [b'<StepClient', b'<StepServer']
+    env._loop.close()
+
+
+def test_async_step_single_agent_unwraps():
+    env, peers = make_async_env(None)
+    obs, reward, done, info = env.step(env.action_space.no_op())
+    assert obs['pov'].shape == (64, 64, 3)
+    assert reward == 1.0
+    env._loop.close()
+
+
+def test_async_step_repeats_and_rejects_the_blocking_split():
+    env, peers = make_async_env(None)
+    env.step(env.action_space.no_op())
+    obs, reward, done, info = env.step(env.action_space.no_op(), repeat=3)
+    assert reward == 3.0 and obs['pov'].shape == (64, 64, 3)
+    assert sum(m.startswith(b'<StepClient') for m in peers[0].messages) == 4
+    with pytest.raises(NotImplementedError):
+        env.step_async(env.action_space.no_op())
+    with pytest.raises(ValueError):
+        Navigate(dense=True, extreme=False).make(asynchronous=True, reset_ahead=True)
+    env._loop.close()
+
+
+def test_async_step_ends_the_episode_when_an_instance_hangs_up():
+    env, peers = make_async_env(2)
+    peers[1].sock.shutdown(socket.SHUT_RDWR)
+    peers[1].join()
+
+    obs, reward, done, info = env.step(env.action_space.no_op())
+    assert done and info['agent_1'] == {"error": "Connection timed out!"}
+    env._loop.close()
+
+
+def test_async_connections_are_retried_while_the_instance_boots(monkeypatch):
+    env, _ = make_async_env(1)
+    env._TO_MOVE_handle_frozen_minecraft = lambda instance: None
+    ours, theirs = socket.socketpair()
+    attempts = []
+
+    async def open_connection(host, port):
+        attempts.append((host, port))
+        if len(attempts) == 1:
+            raise ConnectionRefusedError("The instance is still booting.")
+        return comms.AsyncConnection(*await asyncio.open_connection(sock=ours))
+    monkeypatch.setattr(comms.AsyncConnection, 'open', open_connection)
+
+    instance = types.SimpleNamespace(host='127.0.0.1', port=9000, client_socket=None)
+    env._loop.run_until_complete(env._async_create_connection(instance))
+    assert len(attempts) == 2 and isinstance(instance.client_socket, comms.AsyncConnection)
+    assert bytes(comms.recv_message(theirs)).startswith(b'<MalmoEnv')
+    env._loop.close()
@@ -0,0 +1,118 @@
+import asyncio
+import socket
+import threading
+
+import numpy as np
+
+from minerl.env import comms
+
+
+def _pair():
+    a, b = socket.socketpair()
+    return comms.Connection(a, read_ahead=16), b
+
+
+def test_roundtrip_small_and_large_frames():
+    conn, peer = _pair()
+    frame = np.arange(64 * 64 * 3, dtype=np.uint8).tobytes()
+    sender = threading.Thread(target=lambda: [
+        comms.send_message(peer, frame),
+        comms.send_message(peer, b'\x01\x02'),
+        comms.send_message(peer, b'{"a": 1}'),
+    ])
+    sender.start()
+
+    obs = conn.recv_message()
+    reply = conn.recv_message()
+    info = conn.recv_message()
+    sender.join()
+
+    assert bytes(obs) == frame
+    assert bytes(reply) == b'\x01\x02'
+    assert str(info, 'utf-8') == '{"a": 1}'
+    conn.close()
+    peer.close()
+
+
+def test_payload_buffers_are_reused_only_when_released():
+    conn, peer = _pair()
+    for _ in range(3):
+        comms.send_message(peer, b'x' * 100)
+
+    first = conn.recv_message()
+    first_buf = first.obj
+    pov = np.frombuffer(first, dtype=np.uint8)
+    del first
+    second = conn.recv_message()
+    # The first payload is still referenced by `pov`, so it must not be overwritten.
+    assert second.obj is not first_buf
+
+    del pov
+    second_buf = second.obj
+    del second
+    third = conn.recv_message()
+    assert third.obj is first_buf or third.obj is second_buf
+    conn.close()
+    peer.close()
+
+
+def test_recv_message_returns_none_on_close():
+    conn, peer = _pair()
+    comms.send_message(conn, b'hello')
+    assert bytes(comms.recv_message(peer)) == b'hello'
+    peer.close()
+    assert conn.recv_message() is None
+    conn.close()
+
+
+def test_is_alive_until_closed_or_out_of_step():
+    conn, peer = _pair()
+    assert conn.is_alive()
+    comms.send_message(peer, b'stray reply')
+    assert not conn.is_alive()
+    conn.recv_message()
+    assert conn.is_alive()
+
+    peer.close()
+    assert not conn.is_alive()
+    conn.close()
+    assert not conn.is_alive()
+
+
+def test_received_pov_frames_are_read_only_and_outlive_the_next_recv():
+    from minerl.herobraine.hero.handlers.agent.observations.pov import POVObservation
+    conn, peer = _pair()
+    handler = POVObservation((8, 4))
+    first, second = np.full((4, 8, 3), 1, dtype=np.uint8), np.full((4, 8, 3), 2, dtype=np.uint8)
+    comms.send_message(peer, first.tobytes())
+    comms.send_message(peer, second.tobytes())
+
+    pov = handler.from_hero({'pov': conn.recv_message()})
+    assert not pov.flags.writeable
+    assert (handler.from_hero({'pov': conn.recv_message()}) == 2).all()
+    assert (pov == 1).all()
+    conn.close()
+    peer.close()
+
+
+def test_async_connection_is_not_alive_with_unread_replies():
+    loop = asyncio.new_event_loop()
+    ours, peer = socket.socketpair()
+    try:
+        conn = comms.AsyncConnection(*loop.run_until_complete(asyncio.open_connection(sock=ours)))
+        assert conn.is_alive()
+
+        comms.send_message(peer, b'stray reply')
+        assert not conn.is_alive()
+        # Once the reader has buffered it, the reply is still unread.
+        loop.run_until_complete(asyncio.sleep(0.05))
+        assert conn.pending() and not conn.is_alive()
+        assert bytes(loop.run_until_complete(conn.recv_message())) == b'stray reply'
+        assert conn.is_alive()
+
+        peer.close()
+        loop.run_until_complete(asyncio.sleep(0.05))
+        assert not conn.is_alive()
+        conn.close()
+    finally:
+        loop.close()
@@ -0,0 +1,89 @@
+import socket
+import struct
+import threading
+import types
+import uuid
+
+from minerl.env import comms
+from minerl.env.test_stepping import _fake_malmo_data
+from minerl.herobraine.env_specs.navigate_specs import Navigate
+
+
+class FakeMissionPeer(threading.Thread):
+    """Answers mission inits, <Find> and <Peek/> like a MalmoEnv server, after a few MALMOBUSYs."""
+
+    def __init__(self, sock, busy=0, port_after=0):
+        super().__init__(daemon=True)
+        self.sock = sock
+        self.busy = busy
+        self.port_after = port_after
+        self.pov, self.info = _fake_malmo_data()
+
+    def run(self):
+        finds = 0
+        while True:
+            msg = comms.recv_message(self.sock)
+            if msg is None:
+                return
+            msg = bytes(msg)
+            if msg.startswith(b'<Find>'):
+                finds += 1
+                comms.send_message(self.sock, struct.pack('!I', 25565 if finds > self.port_after else 0))
+            elif msg.startswith(b'<Peek/>'):
+                comms.send_message(self.sock, self.pov)
+                comms.send_message(self.sock, self.info)
+                comms.send_message(self.sock, struct.pack('!b', 0))
+            elif not msg.startswith(b'<'):
+                # The token following a mission XML.
+                comms.send_message(self.sock, struct.pack('!I', 0 if self.busy > 0 else 1))
+                self.busy -= 1
+
+
+def test_mission_init_reports_a_timeline_for_every_agent():
+    env = Navigate(dense=True, extreme=False, agent_count=3).make()
+    env.instances = []
+    for i in range(3):
+        ours, theirs = socket.socketpair()
+        env.instances.append(types.SimpleNamespace(client_socket=comms.Connection(ours), host='127.0.0.1'))
+        FakeMissionPeer(theirs, busy=2 if i == 0 else 0, port_after=2).start()
+    env.done = False
+    env.has_finished = {agent: False for agent in env.task.agent_names}
+
+    ep_uid = str(uuid.uuid4())
+    env._start_mission(env.instances, env._setup_agent_xmls(ep_uid), ep_uid)
+    obs = env._peek_obs()
+
+    assert list(obs) == env.task.agent_names
+    events = env.mission_init_timeline.events
+    assert list(events['agent_0']) == ['mission_started', 'server_found', 'first_observation']
+    for agent in ['agent_1', 'agent_2']:
+        assert list(events[agent]) == ['mission_started', 'first_observation']
+        assert events[agent]['mission_started'] >= events['agent_0']['server_found']
+    assert env.integratedServerPort == 25565
+
+
+def test_async_mission_init_backs_off_and_reports_a_timeline():
+    import asyncio
+    env = Navigate(dense=True, extreme=False, agent_count=3).make(asynchronous=True)
+    loop = asyncio.new_event_loop()
+    env.instances = []
+    for i in range(3):
+        ours, theirs = socket.socketpair()
+        reader, writer = loop.run_until_complete(asyncio.open_connection(sock=ours))
+        env.instances.append(
+            types.SimpleNamespace(client_socket=comms.AsyncConnection(reader, writer), host='127.0.0.1'))
+        FakeMissionPeer(theirs, busy=2 if i == 0 else 0, port_after=2).start()
+    env.done = False
+    env.has_finished = {agent: False for agent in env.task.agent_names}
+
+    ep_uid = str(uuid.uuid4())
+    loop.run_until_complete(env._async_start_mission(env.instances, env._setup_agent_xmls(ep_uid), ep_uid))
+    obs = loop.run_until_complete(env._async_peek_obs())
+
+    assert list(obs) == env.task.agent_names
+    events = env.mission_init_timeline.events
+    assert list(events['agent_0']) == ['mission_started', 'server_found', 'first_observation']
+    # Two MALMOBUSYs and two unknown ports are retried after 0.05 + 0.1 and 0.01 + 0.02 seconds.
+    assert events['agent_0']['server_found'] < 1.0
+    assert env.integratedServerPort == 25565
+    loop.close()
@@ -0,0 +1,57 @@
+import json
+
+from minerl.env.replay_wrapper import ReplayWrapper
+from minerl.env.test_stepping import make_env
+
+
+class _StopsAtTick(ReplayWrapper):
+    """Replays no-ops and leaves the trajectory once it reaches the given tick."""
+
+    def __init__(self, env, replay_file, stop_at):
+        super().__init__(env, replay_file, replay_on_reset=True)
+        self.stop_at = stop_at
+
+    def is_on_trajectory(self, replay_action):
+        return replay_action["tick"] != self.stop_at
+
+    def replay2env(self, replay_action, next_action):
+        return self.env.action_space.no_op()
+
+
+def _replay_env(tmp_path, stop_at, ticks=4):
+    replay_file = tmp_path / "replay.jsonl"
+    replay_file.write_text("".join(json.dumps({"tick": tick}) + "\n" for tick in range(ticks)))
+    env, peers = make_env(1)
+    # Instead of starting a mission, reset decodes the reply to a no-op.
+    env.reset = lambda: env.step(env.action_space.no_op())[0]
+
+    decoded = []
+    process_observation = env._process_observation
+
+    def _process_observation(actor_name, pov, info):
+        decoded.append(process_observation(actor_name, pov, info))
+        return decoded[-1]
+    env._process_observation = _process_observation
+    return _StopsAtTick(env, str(replay_file), stop_at), env, peers, decoded
+
+
+def test_replay_on_reset_returns_the_current_observation_when_it_leaves_the_trajectory(tmp_path):
+    wrapper, env, peers, decoded = _replay_env(tmp_path, stop_at=2)
+    ob = wrapper.reset()
+
+    # Ticks 0 and 1 were replayed without decoding; the reply of tick 1 is decoded on leaving.
+    assert sum(m.startswith(b'<StepClient') for m in peers[0].messages) == 3
+    assert len(decoded) == 2
+    agent = env.task.agent_names[0]
+    assert ob[agent] is decoded[-1][0]
+    assert ob[agent] is env._last_obs[agent]
+
+
+def test_replay_on_reset_only_decodes_the_last_replayed_step(tmp_path):
+    wrapper, env, peers, decoded = _replay_env(tmp_path, stop_at=None)
+    ob = wrapper.reset()
+
+    assert sum(m.startswith(b'<StepClient') for m in peers[0].messages) == 5
+    assert len(decoded) == 2
+    assert ob[env.task.agent_names[0]] is decoded[-1][0]
+    assert not env._skipped_replies
@@ -0,0 +1,44 @@
+import pytest
+
+from minerl.herobraine.env_specs.navigate_specs import Navigate
+
+
+def test_reset_swaps_in_the_standby_episode():
+    env = Navigate(dense=True, extreme=False).make(fake=True, reset_ahead=True)
+    swaps = []
+    swap_in_standby = env._swap_in_standby
+    env._swap_in_standby = lambda standby: swaps.append(standby) or swap_in_standby(standby)
+
+    env.reset()
+    assert env._standby is not None and not swaps
+
+    env.step(env.action_space.no_op())
+    obs = env.reset()
+    assert obs['pov'].shape == (64, 64, 3)
+    assert len(swaps) == 1 and env._observation_decoder is swaps[0].observation_decoder
+    assert env._standby is not None
+
+
+def test_seeded_reset_does_not_use_the_standby_episode():
+    env = Navigate(dense=True, extreme=False).make(fake=True, reset_ahead=True)
+    env.reset()
+    standby = env._standby
+    env._swap_in_standby = lambda standby: pytest.fail("swapped in a standby episode set up without the seed")
+
+    env.seed(42)
+    env.reset()
+    assert env._standby is not standby
+    assert env._standby.result().error is None
+
+
+def test_standby_episode_keeps_its_mission_init_state_until_swapped_in():
+    env = Navigate(dense=True, extreme=False).make(fake=True, reset_ahead=True)
+    env.reset()
+    timeline = env.mission_init_timeline
+    standby = env._standby.result()
+    assert env.mission_init_timeline is timeline
+    assert standby.mission_init_timeline is not None and standby.mission_init_timeline is not timeline
+
+    env.step(env.action_space.no_op())
+    env.reset()
+    assert env.mission_init_timeline is standby.mission_init_timeline
@@ -0,0 +1,244 @@
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+import pytest
+
+from minerl.env import comms
+from minerl.herobraine.env_specs.human_survival_specs import HumanSurvival
+from minerl.herobraine.env_specs.navigate_specs import Navigate
+
+
+def _fake_malmo_data():
+    data = np.load(
+        os.path.join(os.path.abspath(os.path.dirname(__file__)), 'info.npz'),
+        allow_pickle=True)['arr_0'].tolist()
+    pov = data.pop('pov')
+    return pov[::-1, :, :].tobytes(), json.dumps(data).encode()
+
+
+class FakeMalmoPeer(threading.Thread):
+    """Answers <StepClient> messages on one end of a socket pair like a MalmoEnv server."""
+
+    def __init__(self, sock, reward=1.0, done_after=None):
+        super().__init__(daemon=True)
+        self.sock = sock
+        self.reward = reward
+        self.done_after = done_after
+        self.pov, self.info = _fake_malmo_data()
+        self.messages = []
+        self.stalled = False  # Stops replying, like a frozen instance.
+        self.stalled_mid_reply = False  # Freezes after sending the frame of the next reply.
+
+    def run(self):
+        steps = 0
+        while True:
+            msg = comms.recv_message(self.sock)
+            if msg is None:
+                return
+            msg = bytes(msg)
+            self.messages.append(msg)
+            if self.stalled:
+                continue
+            if msg.startswith(b'<StepClient'):
+                steps += 1
+                done = self.done_after is not None and steps >= self.done_after
+                comms.send_message(self.sock, self.pov)
+                if self.stalled_mid_reply:
+                    self.stalled = True
+                    continue
+                comms.send_message(self.sock, struct.pack('!dbb', self.reward, done, 0))
+                comms.send_message(self.sock, self.info)
+            elif msg == b'<Quit/>':
+                comms.send_message(self.sock, struct.pack('!I', 1))
+
+
+def make_env(agent_count, env_kwargs=None, spec=None, **peer_kwargs):
+    spec = Navigate(dense=True, extreme=False, agent_count=agent_count) if spec is None else spec
+    env = spec.make(**(env_kwargs or {}))
+    env.instances, peers = [], []
+    for _ in range(env.task.agent_count):
+        ours, theirs = socket.socketpair()
+        env.instances.append(types.SimpleNamespace(client_socket=comms.Connection(ours)))
+        peers.append(FakeMalmoPeer(theirs, **peer_kwargs))
+        peers[-1].start()
+    env.done = False
+    env.has_finished = {agent: False for agent in env.task.agent_names}
+    return env, peers
+
+
+def test_step_scatters_to_every_agent_before_stepping_the_server():
+    env, peers = make_env(3)
+    obs, reward, done, info = env.step(env.action_space.no_op())
+
+    assert list(obs) == env.task.agent_names
+    assert all(r == 1.0 for r in reward.values())
+    assert not done
+    for agent_obs in obs.values():
+        assert agent_obs['pov'].shape == (64, 64, 3)
+
+    env.step(env.action_space.no_op())
+    assert [m[:11] for m in peers[0].messages[:2]] == [b'<StepClient', b'<StepServer']
+    assert all(p.messages[0].startswith(b'<StepClient') for p in peers)
+
+
+def test_finished_agents_are_not_stepped():
+    env, peers = make_env(2)
+    env.step(env.action_space.no_op())
+    env.has_finished['agent_1'] = True
+
+    obs, reward, done, info = env.step(env.action_space.no_op())
+    assert reward['agent_1'] == 0.0 and info['agent_1'] == {}
+    assert obs['agent_1'] is env._last_obs['agent_1']
+    assert not done
+    assert sum(m.startswith(b'<StepClient') for m in peers[1].messages) == 1
+
+
+def test_agents_decode_their_own_full_stats_on_the_decode_pool():
+    env, peers = make_env(2, spec=HumanSurvival(agent_count=2, resolution=(64, 64)))
+    for agent, peer in enumerate(peers):
+        info = json.loads(peer.info)
+        info['life_stats'] = dict.fromkeys(['air', 'food', 'is_alive', 'life', 'saturation', 'score', 'xp'], 1)
+        info['location_stats'] = dict.fromkeys([
+            'biome_id', 'biome_rainfall', 'biome_temperature', 'can_see_sky', 'is_raining', 'light_level',
+            'pitch', 'sea_level', 'sky_light_level', 'sun_brightness', 'xpos', 'yaw', 'ypos', 'zpos'], 0)
+        info['isGuiOpen'] = False
+        info['mine_block'] = {'dirt': agent + 1, 'stone': 10 * (agent + 1)}
+        peer.info = json.dumps(info).encode()
+    full_stats, = [h for h in env.task.observables if h.to_string() == 'full_stats']
+    columns = [full_stats.extractor.column(('mine_block', name)) for name in ('dirt', 'stone')]
+
+    # Switch threads as often as possible, so that the decodes of the agents interleave.
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for _ in range(100):
+            obs, _, _, _ = env.step(env.action_space.no_op())
+            for agent, actor_name in enumerate(env.task.agent_names):
+                assert obs[actor_name]['full_stats'][columns].tolist() == [agent + 1, 10 * (agent + 1)]
+                assert obs[actor_name]['mine_block']['dirt'] == agent + 1
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+
+def test_step_async_then_step_wait_interleaves_envs():
+    envs = [make_env(1)[0], make_env(2)[0]]
+    for env in envs:
+        env.step_async(env.action_space.no_op())
+    results = [env.step_wait() for env in envs]
+
+    for env, (obs, reward, done, info) in zip(envs, results):
+        assert list(obs) == env.task.agent_names
+        assert not done
+    with pytest.raises(RuntimeError):
+        envs[0].step_wait()
+
+
+def test_repeat_only_decodes_the_last_tick():
+    env, peers = make_env(2)
+    env.step(env.action_space.no_op())
+    decoded = []
+    process_observation = env._process_observation
+    env._process_observation = lambda *args: decoded.append(args[0]) or process_observation(*args)
+
+    obs, reward, done, info = env.step(env.action_space.no_op(), repeat=4)
+    assert reward == {'agent_0': 4.0, 'agent_1': 4.0}
+    assert sorted(decoded) == ['agent_0', 'agent_1']
+    assert obs['agent_0']['pov'].shape == (64, 64, 3)
+    assert sum(m.startswith(b'<StepClient') for m in peers[0].messages) == 5
+
+
+def test_repeat_stops_and_decodes_when_finished():
+    env, peers = make_env(None, done_after=3)
+    env.step(env.action_space.no_op())
+    obs, reward, done, info = env.step(env.action_space.no_op(), repeat=4)
+    assert done and reward == 2.0
+    assert obs['pov'].shape == (64, 64, 3)
+
+
+def test_lazy_observations_decode_entries_when_read():
+    import pickle
+    from minerl.herobraine.env_spec import LazyObservation
+    eager_obs, _, _, eager_info = make_env(None)[0].step(Navigate(dense=True, extreme=False).action_space.no_op())
+    env, peers = make_env(None, env_kwargs=dict(lazy_observations=True))
+    obs, reward, done, info = env.step(env.action_space.no_op())
+
+    assert isinstance(obs, LazyObservation) and isinstance(info, LazyObservation)
+    assert obs.is_decoded('pov') and not obs.is_decoded('compass')
+    assert obs._hero_dict._parsed is None
+    assert list(obs) == list(eager_obs) and list(info) == list(eager_info)
+
+    assert obs['compass']['angle'] == eager_obs['compass']['angle']
+    assert not any(info.is_decoded(key) for key in info)
+    assert (obs in env.observation_space) == (eager_obs in env.observation_space)
+
+    pickled = pickle.loads(pickle.dumps(obs))
+    assert type(pickled) is dict and np.array_equal(pickled['pov'], eager_obs['pov'])
+
+
+def test_healthy_connections_are_kept_across_episodes():
+    env, peers = make_env(2)
+    env._refresh_inst_every = None
+    env.step(env.action_space.no_op())
+    connections = [instance.client_socket for instance in env.instances]
+    created = []
+    env._TO_MOVE_create_connection = created.append
+
+    env._prepare_instances(env.instances)
+    assert created == []
+    assert [instance.client_socket for instance in env.instances] == connections
+    assert all(p.messages[-1] == b'<Quit/>' for p in peers)
+
+    # Only the connection the peer closed is made again.
+    peers[1].sock.shutdown(socket.SHUT_RDWR)
+    peers[1].join()
+    ours, theirs = socket.socketpair()
+    FakeMalmoPeer(theirs).start()
+    env._TO_MOVE_create_connection = lambda instance: created.append(instance) or setattr(
+        instance, 'client_socket', comms.Connection(ours))
+    env._prepare_instances(env.instances)
+    assert created == [env.instances[1]]
+    assert env.instances[0].client_socket is connections[0]
+
+
+def test_stalled_instances_fail_over_to_hot_spares():
+    from concurrent.futures import wait
+    env, peers = make_env(2, env_kwargs=dict(hot_spares=1, step_timeout=0.5))
+    killed, launched = [], []
+    for i, instance in enumerate(env.instances):
+        instance.host, instance.instance_id, instance.kill = 'localhost', i, lambda i=i: killed.append(i)
+    env._hot_spares._launch = lambda instance_id=None: launched.append(instance_id) or types.SimpleNamespace(
+        host='localhost', instance_id=instance_id, client_socket=None)
+    env._hot_spares.fill()
+    wait(env._hot_spares._launching)
+    env.step(env.action_space.no_op())
+
+    stalled = env.instances[1]
+    peers[1].stalled = True
+    obs, reward, done, info = env.step(env.action_space.no_op())
+    assert done and info['agent_1'] == {"error": "Connection timed out!"}
+    assert env.instances[0].client_socket is not None
+    assert env.instances[1] is not stalled and stalled.client_socket is None
+
+    # The stalled instance is rebuilt as the next spare.
+    wait(env._hot_spares._launching)
+    assert killed == [1] and launched == [None, 1] and len(env._hot_spares) == 1
+
+
+def test_instances_stalling_mid_reply_fail_at_the_step_deadline():
+    env, peers = make_env(2, env_kwargs=dict(step_timeout=0.5))
+    env.step(env.action_space.no_op())
+
+    stalled = env.instances[1]
+    peers[1].stalled_mid_reply = True
+    start = time.monotonic()
+    obs, reward, done, info = env.step(env.action_space.no_op())
+    assert time.monotonic() - start < 5
+    assert done and info['agent_1'] == {"error": "Connection timed out!"}
+    assert stalled.client_socket is None and env._failed_instances == []
@@ -0,0 +1,243 @@
+import multiprocessing
+import socket
+import struct
+import threading
+import time
+import types
+
+import numpy as np
+import pytest
+
+from minerl.env import comms, vector
+from minerl.env.test_stepping import FakeMalmoPeer
+from minerl.env.vector import MineRLSubprocVectorEnv, MineRLVectorEnv
+from minerl.herobraine.env_specs.navigate_specs import Navigate
+from minerl.herobraine.wrappers.preprocessing import Preprocessed, PreprocessingStage, Resize
+
+
+def attach_fake_peers(vec_env, peer_kwargs):
+    peers = []
+    for env, kwargs in zip(vec_env.envs, peer_kwargs):
+        ours, theirs = socket.socketpair()
+        env.instances = [types.SimpleNamespace(client_socket=comms.Connection(ours), running=False)]
+        env.done = False
+        env.has_finished = {agent: False for agent in env.task.agent_names}
+        env.reset = lambda env=env: env.observation_space.no_op()
+        peers.append(FakeMalmoPeer(theirs, **kwargs))
+        peers[-1].start()
+    return peers
+
+
+def make_vector_env(num_envs, peer_kwargs):
+    vec_env = MineRLVectorEnv(Navigate(dense=True, extreme=False), num_envs)
+    return vec_env, attach_fake_peers(vec_env, peer_kwargs)
+
+
+def test_vector_step_batches_observations():
+    vec_env, peers = make_vector_env(3, [dict(reward=1.0), dict(reward=2.0), dict(reward=3.0)])
+    obs, reward, done, info = vec_env.step(vec_env.action_space.no_op(batch_shape=(3,)))
+
+    assert obs['pov'].shape == (3, 64, 64, 3)
+    assert obs['inventory']['dirt'].shape == (3,)
+    np.testing.assert_array_equal(reward, [1.0, 2.0, 3.0])
+    assert not done.any()
+    assert all(p.messages[0].startswith(b'<StepClient') for p in peers)
+
+
+def test_vector_step_auto_resets_finished_envs():
+    vec_env, peers = make_vector_env(2, [dict(), dict(done_after=1)])
+    obs, reward, done, info = vec_env.step([vec_env.action_space.no_op()] * 2)
+
+    np.testing.assert_array_equal(done, [False, True])
+    assert 'terminal_observation' in info[1] and 'terminal_observation' not in info[0]
+    assert not obs['pov'][1].any() and obs['pov'][0].any()
+    assert not vec_env.envs[0].done
+
+
+def _fill_row(shm, layout, row):
+    obs = vector._shared_views(shm.buf, layout)
+    obs['pov'][row] = 7
+    obs['inventory']['dirt'][row] = 3
+
+
+requires_shared_memory = pytest.mark.skipif(
+    vector.SharedMemory is None, reason="multiprocessing.shared_memory needs Python 3.8+")
+
+
+@requires_shared_memory
+def test_shared_observation_buffers_are_written_across_processes():
+    template = Navigate(dense=True, extreme=False).observation_space.no_op(batch_shape=(2,))
+    layout, size = vector._shared_layout(template)
+    shm = vector.SharedMemory(create=True, size=size)
+    try:
+        obs = vector._shared_views(shm.buf, layout)
+        assert obs['pov'].shape == (2, 64, 64, 3) and obs['pov'].dtype == np.uint8
+        obs['pov'][:] = 0
+
+        process = multiprocessing.get_context('fork').Process(target=_fill_row, args=(shm, layout, 1))
+        process.start()
+        process.join()
+
+        assert not obs['pov'][0].any() and (obs['pov'][1] == 7).all()
+        assert obs['inventory']['dirt'][1] == 3
+        del obs
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def test_vector_envs_reset_their_own_spec():
+    vec_env, _ = make_vector_env(2, [dict(), dict()])
+    assert vec_env.envs[0].task is not vec_env.envs[1].task
+    assert vec_env.envs[0].task.observables is not vec_env.envs[1].task.observables
+
+
+def test_vector_step_decodes_frames_into_the_batch():
+    vec_env, _ = make_vector_env(2, [dict(), dict()])
+    vec_env.copy = False
+    obs, _, _, _ = vec_env.step([vec_env.action_space.no_op()] * 2)
+
+    for i, env in enumerate(vec_env.envs):
+        pov = env._last_obs[env.task.agent_names[0]]['pov']
+        assert np.shares_memory(pov, obs['pov'][i]) and pov.any()
+    assert vec_env.observation_space.no_op()['pov'].shape == (2, 64, 64, 3)
+    assert obs in vec_env.observation_space
+    assert vec_env.observation_space.sample() in vec_env.observation_space
+
+
+def test_vector_step_retries_a_failed_reset_of_one_env():
+    vec_env, _ = make_vector_env(2, [dict(), dict(done_after=1)])
+    env = vec_env.envs[1]
+    resets = []
+
+    def reset():
+        resets.append(env)
+        if len(resets) == 1:
+            raise ConnectionError("Could not start the mission.")
+        return env.observation_space.no_op()
+    env.reset = reset
+
+    obs, reward, done, info = vec_env.step([vec_env.action_space.no_op()] * 2)
+    np.testing.assert_array_equal(done, [False, True])
+    assert 'error' in info[1] and 'terminal_observation' in info[1] and 'error' not in info[0]
+    assert obs['pov'][0].any()
+
+    obs, reward, done, info = vec_env.step([vec_env.action_space.no_op()] * 2)
+    assert len(resets) == 2
+    np.testing.assert_array_equal(done, [False, True])
+    assert 'error' not in info[1] and not obs['pov'][1].any()
+
+
+class _FakeWorkerVectorEnv(MineRLVectorEnv):
+    """The MineRLVectorEnv of a subprocess worker, stepping fake instances which finish after two steps."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        attach_fake_peers(self, [dict(done_after=2)] * self.num_envs)
+
+
+@requires_shared_memory
+def test_subproc_vector_env_steps_and_resets_through_the_workers(monkeypatch):
+    # The forked workers make the patched vector env.
+    monkeypatch.setattr(vector, 'MineRLVectorEnv', _FakeWorkerVectorEnv)
+    vec_env = MineRLSubprocVectorEnv(Navigate(dense=True, extreme=False), 3, num_workers=2, start_method='fork')
+    try:
+        obs = vec_env.reset()
+        assert obs['pov'].shape == (3, 64, 64, 3) and not obs['pov'].any()
+
+        obs, reward, done, info = vec_env.step(vec_env.action_space.no_op(batch_shape=(3,)))
+        np.testing.assert_array_equal(reward, [1.0, 1.0, 1.0])
+        assert not done.any() and len(info) == 3
+        assert all(obs['pov'][i].any() for i in range(3))
+
+        obs, reward, done, info = vec_env.step([vec_env.action_space.no_op()] * 3)
+        assert done.all()
+        assert all(i['terminal_observation']['pov'].any() for i in info)
+        assert not obs['pov'].any()
+    finally:
+        vec_env.close()
+
+
+def test_vector_step_fails_over_a_stalled_env_only():
+    from concurrent.futures import wait
+    vec_env = MineRLVectorEnv(Navigate(dense=True, extreme=False), 2, hot_spares=1, step_timeout=0.5)
+    peers = attach_fake_peers(vec_env, [dict(), dict()])
+    killed = []
+    for i, env in enumerate(vec_env.envs):
+        instance = env.instances[0]
+        instance.host, instance.instance_id, instance.kill = 'localhost', i, lambda i=i: killed.append(i)
+        env._hot_spares._launch = lambda instance_id=None: types.SimpleNamespace(
+            host='localhost', instance_id=instance_id, client_socket=None)
+        env._hot_spares.fill()
+        wait(env._hot_spares._launching)
+    vec_env.step([vec_env.action_space.no_op()] * 2)
+
+    stalled = vec_env.envs[1].instances[0]
+    peers[1].stalled = True
+    start = time.monotonic()
+    obs, reward, done, info = vec_env.step([vec_env.action_space.no_op()] * 2)
+    assert time.monotonic() - start < 5
+    np.testing.assert_array_equal(done, [False, True])
+    assert 'error' in info[1] and 'error' not in info[0] and obs['pov'][0].any()
+    assert vec_env.envs[1].instances[0] is not stalled and stalled.client_socket is None
+    assert vec_env.envs[0].instances[0].client_socket is not None
+
+    # Only the stalled instance is rebuilt.
+    wait(vec_env.envs[1]._hot_spares._launching)
+    assert killed == [1] and len(vec_env.envs[1]._hot_spares) == 1
+
+
+def test_vector_step_writes_preprocessed_frames_into_the_batch():
+    vec_env = MineRLVectorEnv(Preprocessed(Navigate(dense=True, extreme=False), Resize(32, 32)), 2)
+    attach_fake_peers(vec_env, [dict(), dict()])
+    assert vec_env._pov_rows == [None, None]
+
+    obs, _, _, _ = vec_env.step([vec_env.action_space.no_op()] * 2)
+    assert obs['pov'].shape == (2, 32, 32, 3) and obs['pov'][0].any() and obs['pov'][1].any()
+
+
+class _RecordPreprocessing(PreprocessingStage):
+    """Records the thread and time every frame is preprocessed at."""
+
+    def __init__(self):
+        self.calls = []
+
+    def output_space(self, space):
+        return space
+
+    def __call__(self, frame):
+        self.calls.append((threading.current_thread().name, time.monotonic()))
+        return frame
+
+
+def test_vector_step_preprocesses_while_waiting_on_other_envs():
+    vec_env = MineRLVectorEnv(Preprocessed(Navigate(dense=True, extreme=False), _RecordPreprocessing()), 2)
+    peers = attach_fake_peers(vec_env, [dict(), dict()])
+    peers[1].stalled = True
+    replied_at = []
+
+    def reply_late():
+        time.sleep(0.5)
+        replied_at.append(time.monotonic())
+        comms.send_message(peers[1].sock, peers[1].pov)
+        comms.send_message(peers[1].sock, struct.pack('!dbb', 1.0, 0, 0))
+        comms.send_message(peers[1].sock, peers[1].info)
+    threading.Thread(target=reply_late, daemon=True).start()
+    obs, reward, done, info = vec_env.step([vec_env.action_space.no_op()] * 2)
+
+    # The first env was preprocessed on the decode pool before the second one replied.
+    thread_name, preprocessed_at = vec_env.envs[0].task.preprocessing.stages[0].calls[-1]
+    assert thread_name.startswith('minerl-decode') and preprocessed_at < replied_at[0]
+    assert not done.any() and obs['pov'][0].any() and obs['pov'][1].any()
+
+
+def test_vector_step_fails_an_env_stalling_mid_reply_at_its_deadline():
+    vec_env = MineRLVectorEnv(Navigate(dense=True, extreme=False), 2, step_timeout=0.5)
+    peers = attach_fake_peers(vec_env, [dict(), dict()])
+    peers[1].stalled_mid_reply = True
+
+    start = time.monotonic()
+    obs, reward, done, info = vec_env.step([vec_env.action_space.no_op()] * 2)
+    assert time.monotonic() - start < 5
+    np.testing.assert_array_equal(done, [False, True])
+    assert 'error' in info[1] and 'error' not in info[0] and obs['pov'][0].any()
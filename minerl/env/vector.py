@@ -0,0 +1,484 @@
+# # Copyright (c) 2020 All Rights Reserved
+# # Author: William H. Guss, Brandon Houghton
+import logging
+import multiprocessing
+import selectors
+import socket
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from typing import Any, Dict, List, Tuple
+
+import gym
+import numpy as np
+
+try:
+    from multiprocessing.shared_memory import SharedMemory
+except ImportError:
+    # Python < 3.8, where only MineRLVectorEnv is available.
+    SharedMemory = None
+
+from minerl.env import comms
+from minerl.env._multiagent import MAX_DECODE_WORKERS, SOCKTIME
+from minerl.herobraine.env_spec import EnvSpec
+from minerl.herobraine.wrapper import EnvWrapper
+from minerl.herobraine.hero.spaces import InventoryCounts, MineRLSpace
+
+logger = logging.getLogger(__name__)
+
+
+class MineRLVectorEnv(gym.Env):
+    """Steps N single agent MineRL environments in lockstep from one selector loop.
+
+    Every step scatters the actions to all of the instances before any reply is
+    awaited, then decodes (and preprocesses, see minerl.herobraine.wrappers.Preprocessed)
+    the replies on a pool in whichever order they arrive, while the other instances are
+    still awaited, into preallocated batch buffers shaped like
+    ``single_observation_space.no_op((N,))``, e.g. ``obs['pov']`` is an ``(N, H, W, 3)``
+    array. Rewards and dones are returned as ``(N,)`` arrays.
+
+    Environments which finish are reset on worker threads once their final replies
+    have been decoded.
+    An instance which does not reply within its env's ``step_timeout`` fails over
+    like in a single env (see ``hot_spares``), and only its env is reset.
+    As with gym's vector environments, the observation returned for a finished
+    environment is the first observation of its next episode and the final one is
+    kept in ``info[i]['terminal_observation']``. If the reset fails, only that
+    environment reports ``'error' in info[i]`` with a random observation, and it is
+    reset again on the next step.
+
+    Args:
+        env_spec (EnvSpec): A single agent env spec to instantiate N times.
+        num_envs (int): The number of environments.
+        copy (bool, optional): Whether to return copies of the batch buffers rather
+            than the buffers themselves, which are overwritten on the next step.
+            Defaults to True.
+        observation_buffers (optional): Preallocated batch buffers with the layout of
+            ``single_observation_space.no_op((N,))`` to decode into, e.g. views of shared
+            memory. Defaults to freshly allocated ones.
+    """
+
+    def __init__(self, env_spec: EnvSpec, num_envs: int, copy=True, observation_buffers=None, **env_kwargs):
+        assert env_spec.is_single_agent, "MineRLVectorEnv only supports single agent environments."
+        self.env_spec = env_spec
+        self.num_envs = num_envs
+        self.copy = copy
+        # Every env resets (and so rebuilds the handlers of) its own copy of the spec
+        # on the reset pool.
+        self.envs = [deepcopy(env_spec).make(**env_kwargs) for _ in range(num_envs)]
+
+        self.single_observation_space = env_spec.observation_space
+        self.single_action_space = env_spec.action_space
+        self.observation_space = BatchSpace(self.single_observation_space, num_envs)
+        self.action_space = self.single_action_space
+
+        self._obs_buffers = (
+            self.single_observation_space.no_op(batch_shape=(num_envs,)) if observation_buffers is None
+            else observation_buffers)
+        # The POV handlers decode the frames of the steps straight into the rows of the
+        # batch (see POVObservation.from_hero), unless the spec buffers them itself or
+        # a wrapper changes their shape (e.g. Preprocessed).
+        decode_into_rows = 'pov' in self._obs_buffers and _frames_fit_batch(env_spec)
+        self._pov_rows = [
+            _BatchRow(self._obs_buffers['pov'], i)
+            if decode_into_rows and env._observation_decoder.create_frame_buffer() is None else None
+            for i, env in enumerate(self.envs)]
+        self._rewards = np.zeros((num_envs,), dtype=np.float64)
+        self._dones = np.zeros((num_envs,), dtype=np.bool_)
+        self._needs_reset = set()
+        self._reset_pool = ThreadPoolExecutor(max_workers=num_envs)
+        self._decode_pool = ThreadPoolExecutor(
+            max_workers=min(num_envs, MAX_DECODE_WORKERS), thread_name_prefix='minerl-decode')
+
+    def reset(self) -> Dict[str, np.ndarray]:
+        for i, obs in enumerate(self._reset_pool.map(lambda env: env.reset(), self.envs)):
+            _write_batch(self._obs_buffers, i, obs)
+        self._needs_reset.clear()
+        return self._batch(self._obs_buffers)
+
+    def step(self, actions) -> Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray, List[Dict[str, Any]]]:
+        """Steps every environment once.
+
+        Args:
+            actions: Either a sequence of N single agent actions or a batched action
+                (e.g. ``action_space.no_op((N,))``) whose leaves have a leading N axis.
+
+        Returns:
+            The batched observations, an (N,) array of rewards, an (N,) array of
+            dones and a list of N info dicts.
+        """
+        infos = [{} for _ in range(self.num_envs)]
+        self._rewards[:] = 0.0
+        self._dones[:] = False
+        resets = {}
+        decodes = {}  # The futures of the (observation, monitor) of the envs which replied.
+
+        deadlines = {}
+        with selectors.DefaultSelector() as selector:
+            for i, env in enumerate(self.envs):
+                if i in self._needs_reset:
+                    self._dones[i] = True
+                    resets[i] = self._reset_pool.submit(env.reset)
+                    continue
+                aname = env.task.agent_names[0]
+                action = actions[i] if isinstance(actions, (list, tuple)) else _index_batch(actions, i)
+                try:
+                    env._send_step_clients({aname: action}, [aname])
+                except (socket.timeout, socket.error, TypeError):
+                    self._fail(i, infos, resets)
+                    continue
+                connection = env.instances[0].client_socket
+                deadlines[i] = time.monotonic() + env._step_timeout
+                if connection.pending():
+                    # The reply has already been read ahead; the socket may never become readable.
+                    self._recv(i, deadlines[i], infos, resets, decodes)
+                else:
+                    selector.register(connection, selectors.EVENT_READ, i)
+
+            while selector.get_map():
+                waiting = [key.data for key in selector.get_map().values()]
+                events = selector.select(timeout=max(0.0, min(deadlines[i] for i in waiting) - time.monotonic()))
+                for key, _ in events:
+                    selector.unregister(key.fileobj)
+                    self._recv(key.data, deadlines[key.data], infos, resets, decodes)
+                if not events:
+                    # The instances which missed their step deadline have stalled.
+                    now = time.monotonic()
+                    for key in list(selector.get_map().values()):
+                        if deadlines[key.data] <= now:
+                            selector.unregister(key.fileobj)
+                            self._fail(key.data, infos, resets)
+
+        for i, decode in decodes.items():
+            self._finish_decode(i, decode, infos, resets)
+        for i, reset in resets.items():
+            self._finish_reset(i, reset, infos)
+
+        return self._batch(self._obs_buffers), self._batch(self._rewards), self._batch(self._dones), infos
+
+    def close(self):
+        for env in self.envs:
+            env.close()
+        self._reset_pool.shutdown(wait=False)
+        self._decode_pool.shutdown(wait=False)
+
+    def _recv(self, i, deadline, infos, resets, decodes) -> None:
+        env = self.envs[i]
+        aname = env.task.agent_names[0]
+        connection = env.instances[0].client_socket
+        if self._pov_rows[i] is not None:
+            env.pov_frames[aname] = self._pov_rows[i]
+        try:
+            decodes[i], reward, done, _ = env._recv_step_reply_by(
+                deadline, aname, connection, pool=self._decode_pool)
+            # STEP THE SERVER!
+            comms.send_message(connection, "<StepServer></StepServer>".encode())
+        except (socket.timeout, socket.error, TypeError):
+            decodes.pop(i, None)
+            self._fail(i, infos, resets)
+            return
+
+        env.done = done
+        self._rewards[i] = reward
+        self._dones[i] = done
+
+    def _finish_decode(self, i, decode, infos, resets) -> None:
+        out_obs, monitor = decode.result()
+        if self._dones[i]:
+            # A copy, since the monitors may be a read-only LazyObservation.
+            infos[i] = dict(monitor, terminal_observation=deepcopy(out_obs))
+            resets[i] = self._reset_pool.submit(self.envs[i].reset)
+        else:
+            infos[i] = monitor
+            _write_batch(self._obs_buffers, i, out_obs)
+
+    def _fail(self, i, infos, resets) -> None:
+        env = self.envs[i]
+        if env.instances[0] not in env._failed_instances:
+            env._failed_instances.append(env.instances[0])
+        # Disconnects the instance and, with a hot spare, moves the env onto it for the reset.
+        env._fail_over()
+        env.done = True
+        logger.error(
+            "Failed to step environment {} (timeout or error). Resetting it, be aware. "
+            "To account for this failure case in your code check to see if `'error' in info[i]`.".format(i))
+        logger.error(traceback.format_exc())
+        self._dones[i] = True
+        infos[i] = {"error": "Connection timed out!"}
+        resets[i] = self._reset_pool.submit(env.reset)
+
+    def _finish_reset(self, i, reset, infos) -> None:
+        try:
+            obs = reset.result()
+        except Exception as e:
+            logger.error(
+                "Failed to reset environment {} ({}). Sending a random observation and resetting it "
+                "again on the next step, be aware.".format(i, e))
+            logger.error(traceback.format_exc())
+            self._needs_reset.add(i)
+            infos[i] = dict(infos[i], error="Failed to reset!")
+            obs = self.single_observation_space.sample()
+        else:
+            self._needs_reset.discard(i)
+        _write_batch(self._obs_buffers, i, obs)
+
+    def _batch(self, buffers):
+        return deepcopy(buffers) if self.copy else buffers
+
+
+class MineRLSubprocVectorEnv(gym.Env):
+    """Steps N single agent MineRL environments spread over worker processes.
+
+    Observation decoding is GIL bound, so a single process cannot keep up with many
+    instances. Here each worker owns a MineRLVectorEnv over a contiguous slice of the
+    environments and decodes straight into one shared memory block laid out from
+    ``single_observation_space.no_op((N,))``. The parent only exchanges actions,
+    rewards, dones and infos with the workers over pipes and hands out numpy views
+    of the shared block.
+
+    Args:
+        env_spec (EnvSpec): A single agent env spec to instantiate N times.
+        num_envs (int): The number of environments.
+        num_workers (int, optional): The number of worker processes. Defaults to num_envs.
+        copy (bool, optional): Whether to return copies of the observation views rather
+            than the views themselves, which are overwritten on the next step.
+            Defaults to True.
+        start_method (str, optional): The multiprocessing start method. Defaults to
+            the platform default.
+    """
+
+    def __init__(self, env_spec: EnvSpec, num_envs: int, num_workers=None, copy=True, start_method=None,
+                 **env_kwargs):
+        assert env_spec.is_single_agent, "MineRLSubprocVectorEnv only supports single agent environments."
+        if SharedMemory is None:
+            raise RuntimeError("MineRLSubprocVectorEnv requires multiprocessing.shared_memory (Python 3.8+).")
+        num_workers = num_envs if num_workers is None else min(num_workers, num_envs)
+        self.env_spec = env_spec
+        self.num_envs = num_envs
+        self.copy = copy
+        self.single_observation_space = env_spec.observation_space
+        self.single_action_space = env_spec.action_space
+        self.observation_space = BatchSpace(self.single_observation_space, num_envs)
+        self.action_space = self.single_action_space
+
+        layout, size = _shared_layout(self.single_observation_space.no_op(batch_shape=(num_envs,)))
+        self._shm = SharedMemory(create=True, size=max(size, 1))
+        self._obs_buffers = _shared_views(self._shm.buf, layout)
+
+        bounds = np.linspace(0, num_envs, num_workers + 1).astype(int)
+        self._slices = [(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+        ctx = multiprocessing.get_context(start_method)
+        self._remotes, self._processes = [], []
+        for start, stop in self._slices:
+            remote, worker_remote = ctx.Pipe()
+            process = ctx.Process(
+                target=_worker,
+                args=(worker_remote, remote, env_spec, env_kwargs, self._shm, layout, start, stop),
+                daemon=True)
+            process.start()
+            worker_remote.close()
+            self._remotes.append(remote)
+            self._processes.append(process)
+        self._closed = False
+
+    def reset(self) -> Dict[str, np.ndarray]:
+        for remote in self._remotes:
+            remote.send(('reset', None))
+        for remote in self._remotes:
+            _recv_result(remote)
+        return self._batch(self._obs_buffers)
+
+    def step(self, actions) -> Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray, List[Dict[str, Any]]]:
+        """Steps every environment once; see MineRLVectorEnv.step."""
+        for remote, (start, stop) in zip(self._remotes, self._slices):
+            if isinstance(actions, (list, tuple)):
+                sub_actions = list(actions[start:stop])
+            else:
+                sub_actions = [_index_batch(actions, i) for i in range(start, stop)]
+            remote.send(('step', sub_actions))
+
+        rewards, dones, infos = [], [], []
+        for remote in self._remotes:
+            reward, done, info = _recv_result(remote)
+            rewards.append(reward)
+            dones.append(done)
+            infos.extend(info)
+        return self._batch(self._obs_buffers), np.concatenate(rewards), np.concatenate(dones), infos
+
+    def close(self):
+        if self._closed:
+            return
+        for remote in self._remotes:
+            try:
+                remote.send(('close', None))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join(timeout=SOCKTIME)
+            if process.is_alive():
+                process.terminate()
+        for remote in self._remotes:
+            remote.close()
+        self._obs_buffers = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # Views handed out with copy=False are still alive; the mapping goes with them.
+            pass
+        self._shm.unlink()
+        self._closed = True
+
+    def _batch(self, buffers):
+        return deepcopy(buffers) if self.copy else buffers
+
+
+class BatchSpace(gym.Space):
+    """The space of the observations of num_envs environments, batched like
+    ``single_space.no_op((num_envs,))``.
+
+    Args:
+        single_space (MineRLSpace): The observation space of one environment.
+        num_envs (int): The number of environments.
+    """
+
+    def __init__(self, single_space: MineRLSpace, num_envs: int):
+        self.single_space = single_space
+        self.num_envs = num_envs
+        super().__init__()
+
+    def no_op(self, batch_shape=()):
+        return self.single_space.no_op(batch_shape=tuple(batch_shape) + (self.num_envs,))
+
+    def sample(self):
+        batch = self.no_op()
+        for i in range(self.num_envs):
+            _write_batch(batch, i, self.single_space.sample())
+        return batch
+
+    def seed(self, seed=None):
+        return self.single_space.seed(seed)
+
+    def contains(self, x):
+        return all(self.single_space.contains(_index_batch(x, i)) for i in range(self.num_envs))
+
+    def __repr__(self):
+        return "BatchSpace({}, {})".format(self.single_space, self.num_envs)
+
+
+class _BatchRow(object):
+    """Stands in for the frame buffer of an env (see POVFrameBuffer), so that its frames
+    are decoded into row i of the batch."""
+
+    def __init__(self, buffer, i):
+        self._row = buffer[i]
+
+    def next_frame(self) -> np.ndarray:
+        return self._row
+
+    def clear(self):
+        pass
+
+
+def _frames_fit_batch(env_spec: EnvSpec) -> bool:
+    """Whether the frames of the bottom env spec have the shape and dtype of the POV
+    observations of env_spec, so that they can be decoded into its batch rows."""
+    bottom_env_spec = env_spec
+    while isinstance(bottom_env_spec, EnvWrapper):
+        bottom_env_spec = bottom_env_spec.env_to_wrap
+    frames = bottom_env_spec.observation_space.spaces.get('pov')
+    pov = env_spec.observation_space.spaces['pov']
+    return frames is not None and frames.shape == pov.shape and frames.dtype == pov.dtype
+
+
+def _worker(remote, parent_remote, env_spec, env_kwargs, shm, layout, start, stop) -> None:
+    parent_remote.close()
+    buffers = _slice_batch(_shared_views(shm.buf, layout), slice(start, stop))
+    vec_env = None
+    try:
+        vec_env = MineRLVectorEnv(env_spec, stop - start, copy=False, observation_buffers=buffers, **env_kwargs)
+        while True:
+            command, data = remote.recv()
+            if command == 'reset':
+                vec_env.reset()
+                remote.send(('ok', None))
+            elif command == 'step':
+                _, reward, done, info = vec_env.step(data)
+                remote.send(('ok', (reward, done, info)))
+            elif command == 'close':
+                break
+    except (EOFError, KeyboardInterrupt):
+        pass
+    except Exception as e:
+        logger.error(traceback.format_exc())
+        remote.send(('error', e))
+    finally:
+        if vec_env is not None:
+            vec_env.close()
+        buffers = None
+        remote.close()
+
+
+def _recv_result(remote):
+    status, result = remote.recv()
+    if status == 'error':
+        raise result
+    return result
+
+
+def _shared_layout(template, offset=0, alignment=64):
+    """Lays the (nested) batch buffers in template out end to end in one block.
+
+    Returns:
+        The layout, mirroring template with (offset, shape, dtype) leaves, and the
+        size of the block.
+    """
+    if isinstance(template, dict):
+        layout = {}
+        for key, value in template.items():
+            layout[key], offset = _shared_layout(value, offset, alignment)
+        return layout, offset
+    if isinstance(template, InventoryCounts):
+        counts, offset = _shared_layout(template.counts, offset, alignment)
+        return InventoryCounts(counts, template.item_index), offset
+    offset = -(-offset // alignment) * alignment
+    return (offset, template.shape, template.dtype), offset + template.nbytes
+
+
+def _shared_views(buf, layout):
+    """Builds numpy views of buf for a layout made by _shared_layout."""
+    if isinstance(layout, dict):
+        return {key: _shared_views(buf, value) for key, value in layout.items()}
+    if isinstance(layout, InventoryCounts):
+        return InventoryCounts(_shared_views(buf, layout.counts), layout.item_index)
+    offset, shape, dtype = layout
+    return np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+
+
+def _slice_batch(buffers, index):
+    if isinstance(buffers, dict):
+        return {key: _slice_batch(value, index) for key, value in buffers.items()}
+    if isinstance(buffers, InventoryCounts):
+        return InventoryCounts(buffers.counts[index], buffers.item_index)
+    return buffers[index]
+
+
+def _write_batch(buffers, i, value) -> None:
+    """Writes a single observation into row i of the (nested) batch buffers."""
+    if isinstance(buffers, dict):
+        for key, buffer in buffers.items():
+            _write_batch(buffer, i, value[key])
+    elif isinstance(buffers, InventoryCounts):
+        buffers.counts[i] = value.counts
+    elif not (isinstance(value, np.ndarray) and np.may_share_memory(buffers[i], value)):
+        # (Frames are decoded straight into their row; see _BatchRow.)
+        buffers[i] = value
+
+
+def _index_batch(batch, i):
+    """Selects the i-th single action (or observation) out of a (nested) batch."""
+    if isinstance(batch, dict):
+        return {key: _index_batch(value, i) for key, value in batch.items()}
+    if isinstance(batch, InventoryCounts):
+        return InventoryCounts(batch.counts[i], batch.item_index)
+    return batch[i]
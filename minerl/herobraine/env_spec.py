@@ -2,15 +2,21 @@
 # Author: William H. Guss, Brandon Houghton
 
 from abc import abstractmethod
+import collections.abc
+import copy
+import functools
+import json
 import types
 from minerl.herobraine.hero.handlers.translation import TranslationHandler
 import typing
 from minerl.herobraine.hero.spaces import Dict
-from minerl.herobraine.hero.handler import Handler
+from minerl.herobraine.hero.handler import Handler, xml_templates
 from typing import List
 
 import jinja2
+import jinja2.meta
 import gym
+import numpy as np
 from lxml import etree
 import os
 import abc
@@ -26,6 +32,15 @@ class EnvSpec(abc.ABC):
     U_FAKE_MULTI_AGENT_ENTRYPOINT = 'minerl.env._fake:_FakeMultiAgentEnv'
     U_SINGLE_AGENT_ENTRYPOINT = 'minerl.env._singleagent:_SingleAgentEnv'
     U_FAKE_SINGLE_AGENT_ENTRYPOINT = 'minerl.env._fake:_FakeSingleAgentEnv'
+    U_ASYNC_ENTRYPOINT = 'minerl.env._async:AsyncMineRLEnv'
+
+    # The factory methods whose handlers are rebuilt on every reset, e.g. because they are
+    # randomized per episode. The handlers of all other factories, and the spaces built from
+    # them, are created once and stay the same objects across episodes.
+    EPISODIC_FACTORIES = ('create_agent_start',)
+
+    # The factories which the observation, action and monitor spaces are built from.
+    _SPACE_FACTORIES = ('create_observables', 'create_actionables', 'create_monitors')
 
     def __init__(self, name, max_episode_steps=None, reward_threshold=None, agent_count=None, **kwargs):
         self.name = name
@@ -40,30 +55,40 @@ class EnvSpec(abc.ABC):
     def reset(self):
         # Note: currently only agent_start needs to be per-agent. To make more attributes per-agent,
         # remember to modify minerl/herobraine/hero/mission.xml.j2 as well.
-        self.observables = self.create_observables()
-        self.actionables = self.create_actionables()
-        self.rewardables = self.create_rewardables()
-        self.agent_handlers = self.create_agent_handlers()
-        self.monitors = self.create_monitors()
-
-        self.server_initial_conditions = self.create_server_initial_conditions()
-        self.server_world_generators = self.create_server_world_generators()
-        self.server_decorators = self.create_server_decorators()
-        self.server_quit_producers = self.create_server_quit_producers()
+        first_reset = not hasattr(self, '_observation_space')
+        episodic = set(self.EPISODIC_FACTORIES)
+
+        def rebuild(factory):
+            return first_reset or factory in episodic
+
+        for attr_name in (
+                'observables', 'actionables', 'rewardables', 'agent_handlers', 'monitors',
+                'server_initial_conditions', 'server_world_generators', 'server_decorators',
+                'server_quit_producers'):
+            factory = 'create_' + attr_name
+            if rebuild(factory):
+                setattr(self, attr_name, getattr(self, factory)())
+            else:
+                # Stable handlers may keep per-episode state, which they used to lose by being recreated.
+                for handler in getattr(self, attr_name):
+                    if hasattr(handler, 'reset'):
+                        handler.reset()
 
         # after create_server_world_generators(), because it will see python generated map
         # to pick a good location
-        self.agent_start = []
-        for self.current_agent in range(self.agent_count):
-            self.agent_start.append(self.create_agent_start())
+        if rebuild('create_agent_start'):
+            self.agent_start = []
+            for self.current_agent in range(self.agent_count):
+                self.agent_start.append(self.create_agent_start())
 
-        # check that the observables (list) have no duplicate to_strings
-        assert len([o.to_string() for o in self.observables]) == len(set([o.to_string() for o in self.observables]))
-        assert len([a.to_string() for a in self.actionables]) == len(set([a.to_string() for a in self.actionables]))
+        if first_reset or episodic.intersection(self._SPACE_FACTORIES):
+            # check that the observables (list) have no duplicate to_strings
+            assert len([o.to_string() for o in self.observables]) == len(set([o.to_string() for o in self.observables]))
+            assert len([a.to_string() for a in self.actionables]) == len(set([a.to_string() for a in self.actionables]))
 
-        self._observation_space = self.create_observation_space()
-        self._action_space = self.create_action_space()
-        self._monitor_space = self.create_monitor_space()
+            self._observation_space = self.create_observation_space()
+            self._action_space = self.create_action_space()
+            self._monitor_space = self.create_monitor_space()
 
     ########################
     ### API METHODS #######
@@ -204,18 +229,36 @@ class EnvSpec(abc.ABC):
             }) for agent in self.agent_names
         }))
 
+    def compile_observation_decoder(self) -> 'ObservationDecoder':
+        """Compiles the observables and monitors of the env spec into an ObservationDecoder.
+
+        The decoder is bound to the current handlers, so it must be recompiled after reset.
+        """
+        return ObservationDecoder(self.observables, self.monitors)
+
+    def compile_action_encoder(self) -> 'ActionEncoder':
+        """Compiles the actionables of the env spec into an ActionEncoder.
+
+        The encoder is bound to the current handlers, so it must be recompiled after reset.
+        """
+        return ActionEncoder(self.actionables)
+
     @abstractmethod
     def get_docstring(self):
         return NotImplemented
 
-    def make(self, fake=False, **additonal_kwargs):
+    def make(self, fake=False, asynchronous=False, **additonal_kwargs):
         """Turns the env_spec into a MineRLEnv
 
         Args:
             fake (bool, optional): Whether or not the env created should be fake.
             Defaults to False.
+            asynchronous (bool, optional): Whether the env created should be an
+            AsyncMineRLEnv exposing async_reset/async_step coroutines. Defaults to False.
         """
-        entry_point = self._entry_point(fake)
+        if asynchronous and fake:
+            raise ValueError("Fake environments have no asynchronous variant.")
+        entry_point = EnvSpec.U_ASYNC_ENTRYPOINT if asynchronous else self._entry_point(fake)
         module = importlib.import_module(entry_point.split(':')[0])
         class_ = getattr(module, entry_point.split(':')[-1])
         return class_(**self._env_kwargs(), **additonal_kwargs)
@@ -257,24 +300,21 @@ class EnvSpec(abc.ABC):
     def to_xml(self) -> str:
         """Gets the XML by templating mission.xml.j2 using Jinja
         """
-        with open(MISSION_TEMPLATE, "rt") as fh:
-            # TODO: Pull this out into a method.
-            var_dict = {}
-            for attr_name in dir(self):
-                if 'to_xml' not in attr_name:
-                    var_dict[attr_name] = getattr(self, attr_name)
-
-            env = jinja2.Environment(undefined=jinja2.StrictUndefined)
-            template = env.from_string(fh.read())
-            xml = template.render(var_dict)
-
-        # Now do one more pretty printing
-
-        xml = etree.tostring(etree.fromstring(xml.encode('utf-8')), pretty_print=True).decode('utf-8')
+        xml = etree.tostring(self.to_xml_etree(), pretty_print=True).decode('utf-8')
         # TODO: Perhaps some logging is necessary
         # print(xml)
         return xml
 
+    def to_xml_etree(self) -> etree.Element:
+        """Templates mission.xml.j2 using Jinja and parses the result.
+
+        The template is compiled once per spec class and only the attributes it refers
+        to are looked up, rather than every attribute of the spec.
+        """
+        template, variables = _compile_mission_template(type(self))
+        xml = template.render({name: getattr(self, name) for name in variables})
+        return etree.fromstring(xml.encode('utf-8'))
+
     def get_consolidated_xml(self, handlers: List[Handler]) -> List[str]:
         """Consolidates duplicate XML representations from the handlers.
 
@@ -283,20 +323,251 @@ class EnvSpec(abc.ABC):
         if the there are any top level elements that are duplicated and pick the first of them
         to retain. We then convert the remaining etrees back into strings and join them with new lines.
 
+        Handlers are recreated on every reset but mostly render the same XML, so the
+        consolidation is cached on the rendered strings.
+
         Args:
             handlers (List[Handler]): A list of handlers to consolidate.
 
         Returns:
             str: The XML
         """
-        handler_xml_strs = [handler.xml() for handler in handlers]
+        handler_xml_strs = tuple(xml_templates.render_all(handlers))
 
         if not handler_xml_strs:
             return ''
 
-        # TODO: RAISE VALID XML ERROR. FOR EASE OF USE
-        trees = [etree.fromstring(xml) for xml in handler_xml_strs if xml != '']
-        consolidated_trees = {tree.tag: tree for tree in trees}.values()
+        return list(_consolidate_xml(handler_xml_strs))
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_mission_template(spec_class: type) -> typing.Tuple[jinja2.Template, typing.FrozenSet[str]]:
+    """Compiles the mission template for an env spec class.
+
+    Returns:
+        The template and the names of the spec attributes it renders.
+    """
+    with open(MISSION_TEMPLATE, "rt") as fh:
+        source = fh.read()
+    env = jinja2.Environment(undefined=jinja2.StrictUndefined)
+    variables = frozenset(jinja2.meta.find_undeclared_variables(env.parse(source)))
+    return env.from_string(source), variables
+
+
+# Randomized handlers (e.g. agent_start) render new XML every reset, so this is bounded.
+@functools.lru_cache(maxsize=256)
+def _consolidate_xml(handler_xml_strs: typing.Tuple[str, ...]) -> typing.Tuple[str, ...]:
+    # TODO: RAISE VALID XML ERROR. FOR EASE OF USE
+    trees = [etree.fromstring(xml) for xml in handler_xml_strs if xml != '']
+    consolidated_trees = {tree.tag: tree for tree in trees}.values()
+
+    return tuple(etree.tostring(t, pretty_print=True).decode('utf-8')
+                 for t in consolidated_trees)
+
+
+class ObservationDecoder(object):
+    """Turns the info of a step into the observation and monitor dicts.
+
+    The handler lookups (and the walk down the EnvWrapper chain) are done once when
+    the decoder is compiled, rather than on every step. Nested JSON documents in
+    the info (e.g. the equipped items) are decoded once by parse rather than by
+    every handler reading them.
+
+    Args:
+        observables: The observation handlers of the bottom env spec.
+        monitors: The monitor handlers.
+        wrap_observation (optional): Applied to the observation dict once decoded.
+    """
+
+    def __init__(self, observables: List[TranslationHandler], monitors: List[TranslationHandler],
+                 wrap_observation: typing.Optional[typing.Callable] = None):
+        self._observables = [(h.to_string(), h.compile_from_hero()) for h in observables]
+        self._monitors = [(m.to_string(), m.compile_from_hero()) for m in monitors]
+        self._lazy_observables = dict(self._observables)
+        self._lazy_monitors = dict(self._monitors)
+        self._wrap_observation = wrap_observation
+        self._frame_buffer_handlers = [h for h in observables if hasattr(h, 'frame_buffer')]
+        # Shorter paths first, so that nested documents are decoded outside in.
+        self._json_paths = sorted(
+            set(path for h in list(observables) + list(monitors) for path in h.hero_json_paths()), key=len)
+
+    def create_frame_buffer(self):
+        """Creates the POV frame buffer of one agent, or None if the POV is not buffered.
+
+        The env passes it to the decoder as info['pov_frames'] along with the frame.
+        """
+        for h in self._frame_buffer_handlers:
+            frames = h.frame_buffer()
+            if frames is not None:
+                return frames
+        return None
+
+    def parse(self, info: typing.Union[str, bytes, None]) -> typing.Dict[str, typing.Any]:
+        """Parses the info JSON of a step along with the nested documents the handlers read."""
+        info = json.loads(info) if info else {}
+        for path in self._json_paths:
+            head = info
+            for key in path[:-1]:
+                head = head.get(key) if isinstance(head, dict) else None
+            if isinstance(head, dict) and isinstance(head.get(path[-1]), (str, bytes)):
+                try:
+                    head[path[-1]] = json.loads(head[path[-1]])
+                except ValueError:
+                    # Left for the handler to fail on, as it would have.
+                    pass
+        return info
+
+    def __call__(self, info: typing.Dict[str, typing.Any]) -> typing.Tuple[
+            typing.Dict[str, typing.Any], typing.Dict[str, typing.Any]]:
+        obs_dict = {name: from_hero(info) for name, from_hero in self._observables}
+        if self._wrap_observation is not None:
+            obs_dict = self._wrap_observation(obs_dict)
+        monitor_dict = {name: from_hero(info) for name, from_hero in self._monitors}
+        return obs_dict, monitor_dict
+
+    def decode_lazy(self, info: typing.Union[str, bytes, None], given: typing.Dict[str, typing.Any]) -> typing.Tuple[
+            'LazyObservation', 'LazyObservation']:
+        """Like parse followed by a call, except that nothing is decoded until it is read.
+
+        Args:
+            info: The info JSON of the step.
+            given: Entries of the info which don't come from the JSON, e.g. the POV frame.
+
+        Returns:
+            The observation and monitor LazyObservations, which share the parsed info. If
+            there is a wrap_observation, the observation is decoded to wrap it.
+        """
+        hero_dict = _LazyHeroDict(info, self.parse, given)
+        obs = LazyObservation(hero_dict, self._lazy_observables)
+        if self._wrap_observation is not None:
+            obs = self._wrap_observation(obs.materialize())
+        return obs, LazyObservation(hero_dict, self._lazy_monitors)
+
+
+class _LazyHeroDict(collections.abc.Mapping):
+    """The info of a step, whose JSON is only parsed once a key which was not given is read."""
+
+    __slots__ = ('_info', '_parse', '_given', '_parsed')
+
+    def __init__(self, info, parse, given):
+        self._info = info
+        self._parse = parse
+        self._given = given
+        self._parsed = None
+
+    def _dict(self) -> typing.Dict[str, typing.Any]:
+        if self._parsed is None:
+            parsed = self._parse(self._info)
+            parsed.update(self._given)
+            self._parsed, self._info = parsed, None
+        return self._parsed
+
+    def __getitem__(self, key):
+        if key in self._given:
+            return self._given[key]
+        return self._dict()[key]
+
+    def __iter__(self):
+        return iter(self._dict())
+
+    def __len__(self):
+        return len(self._dict())
+
 
-        return [etree.tostring(t, pretty_print=True).decode('utf-8')
-                for t in consolidated_trees]
+class LazyObservation(collections.abc.Mapping):
+    """An observation (or monitor) dict whose entries are decoded by their handlers when
+    they are first read, and then kept.
+
+    Pickling or copying it decodes every entry and gives a plain dict.
+    """
+
+    __slots__ = ('_hero_dict', '_decoders', '_values')
+
+    def __init__(self, hero_dict: typing.Mapping[str, typing.Any],
+                 decoders: typing.Dict[str, typing.Callable[[typing.Mapping[str, typing.Any]], typing.Any]]):
+        self._hero_dict = hero_dict
+        self._decoders = decoders
+        self._values = {}
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        value = self._values[key] = self._decoders[key](self._hero_dict)
+        return value
+
+    def __iter__(self):
+        return iter(self._decoders)
+
+    def __len__(self):
+        return len(self._decoders)
+
+    def is_decoded(self, key) -> bool:
+        return key in self._values
+
+    def materialize(self) -> typing.Dict[str, typing.Any]:
+        """Decodes every entry into a plain dict."""
+        return {key: self[key] for key in self._decoders}
+
+    def __reduce__(self):
+        return dict, (self.materialize(),)
+
+    def __copy__(self):
+        return self.materialize()
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(self.materialize(), memo)
+
+    def __repr__(self):
+        return "LazyObservation({})".format(", ".join(
+            "{}={}".format(key, "<decoded>" if key in self._values else "<lazy>") for key in self._decoders))
+
+
+class ActionEncoder(object):
+    """Turns an action into the command payload of a <StepClient> message.
+
+    Args:
+        actionables: The action handlers of the bottom env spec.
+        unwrap_action (optional): Applied to dict actions before they are encoded.
+    """
+
+    def __init__(self, actionables: List[TranslationHandler], unwrap_action: typing.Optional[typing.Callable] = None):
+        self._actionables = [(h.to_string(), h.compile_to_hero()) for h in actionables]
+        self._unwrap_action = unwrap_action
+
+        # The layout of encode_array: a flat slice per actionable.
+        self._array_layout = []
+        offset = 0
+        for h in actionables:
+            size = int(np.prod(h.space.shape)) if isinstance(h.space, spaces.Box) else 1
+            self._array_layout.append((h.to_string(), offset, size, h.space))
+            offset += size
+        self.array_size = offset
+
+    def __call__(self, action: typing.Dict[str, typing.Any]) -> bytes:
+        if self._unwrap_action is not None:
+            action = self._unwrap_action(action)
+        return b"\n".join([to_hero(action[name]) for name, to_hero in self._actionables if name in action])
+
+    def encode_array(self, x: np.ndarray) -> bytes:
+        """Encodes an action given as a flat array of array_size numbers.
+
+        The array holds every actionable of the bottom env spec in order: the flattened
+        values of Box spaces, the value of Discrete spaces and the index of Enum spaces.
+        It is never unwrapped.
+        """
+        action = self.array_to_action(x)
+        return b"\n".join([to_hero(action[name]) for name, to_hero in self._actionables])
+
+    def array_to_action(self, x: np.ndarray) -> typing.Dict[str, typing.Any]:
+        """Converts a flat array action (see encode_array) into a dict action of the bottom env spec."""
+        action = {}
+        for name, offset, size, space in self._array_layout:
+            if isinstance(space, spaces.Box):
+                action[name] = np.asarray(x[offset:offset + size], dtype=space.dtype).reshape(space.shape)
+            elif isinstance(space, spaces.Enum):
+                action[name] = space.values[int(x[offset])]
+            else:
+                action[name] = int(x[offset])
+        return action
@@ -2,40 +2,99 @@
 # Author: William H. Guss, Brandon Houghton
 
 import collections
+import importlib
 
 import gym
 
-from minerl.herobraine.env_spec import EnvSpec
-from minerl.herobraine.env_specs.treechop_specs import Treechop
-from minerl.herobraine.env_specs.equip_weapon_specs import EquipWeapon
-from minerl.herobraine.env_specs.human_survival_specs import HumanSurvival
-from minerl.herobraine.env_specs.navigate_specs import Navigate
-from minerl.herobraine.env_specs.obtain_specs import ObtainDiamondShovelEnvSpec
-from minerl.herobraine.wrappers import Obfuscated, Vectorized
-from minerl.herobraine.env_specs import basalt_specs
-import os
-
+# Env specs are only constructed when they are first used (by gym.make or by accessing
+# the MINERL_* attributes of this module), since constructing all of them, and importing
+# the modules they are defined in, dominates the time it takes to import minerl.
+#
+# Each entry maps the module attribute to the gym id and the spec factory, given as
+# (module, class, kwargs).
+#
 # Must load non-obfuscated envs first!
 # Publish.py depends on this order for black-listing streams
-MINERL_TREECHOP_V0 = Treechop()
+_SPEC_FACTORIES = collections.OrderedDict([
+    ('MINERL_TREECHOP_V0', ('MineRLTreechop-v0', (
+        'minerl.herobraine.env_specs.treechop_specs', 'Treechop', {}))),
+
+    ('MINERL_NAVIGATE_V0', ('MineRLNavigate-v0', (
+        'minerl.herobraine.env_specs.navigate_specs', 'Navigate', dict(dense=False, extreme=False)))),
+    ('MINERL_NAVIGATE_EXTREME_V0', ('MineRLNavigateExtreme-v0', (
+        'minerl.herobraine.env_specs.navigate_specs', 'Navigate', dict(dense=False, extreme=True)))),
+    ('MINERL_NAVIGATE_DENSE_V0', ('MineRLNavigateDense-v0', (
+        'minerl.herobraine.env_specs.navigate_specs', 'Navigate', dict(dense=True, extreme=False)))),
+    ('MINERL_NAVIGATE_DENSE_EXTREME_V0', ('MineRLNavigateExtremeDense-v0', (
+        'minerl.herobraine.env_specs.navigate_specs', 'Navigate', dict(dense=True, extreme=True)))),
+
+    ('MINERL_OBTAIN_DIAMOND_SHOVEL_V0', ('MineRLObtainDiamondShovel-v0', (
+        'minerl.herobraine.env_specs.obtain_specs', 'ObtainDiamondShovelEnvSpec', {}))),
+
+    ('MINERL_EQUIP_WEAPON_V0', ('MineRLEquipWeapon-v0', (
+        'minerl.herobraine.env_specs.equip_weapon_specs', 'EquipWeapon', {}))),
+    ('MINERL_HUMAN_SURVIVAL_V0', ('MineRLHumanSurvival-v0', (
+        'minerl.herobraine.env_specs.human_survival_specs', 'HumanSurvival', {}))),
+
+    ('MINERL_BASALT_FIND_CAVES_ENV_SPEC', ('MineRLBasaltFindCave-v0', (
+        'minerl.herobraine.env_specs.basalt_specs', 'FindCaveEnvSpec', {}))),
+    ('MINERL_BASALT_MAKE_WATERFALL_ENV_SPEC', ('MineRLBasaltMakeWaterfall-v0', (
+        'minerl.herobraine.env_specs.basalt_specs', 'MakeWaterfallEnvSpec', {}))),
+    ('MINERL_BASALT_PEN_ANIMALS_VILLAGE_ENV_SPEC', ('MineRLBasaltCreateVillageAnimalPen-v0', (
+        'minerl.herobraine.env_specs.basalt_specs', 'PenAnimalsVillageEnvSpec', {}))),
+    ('MINERL_BASALT_VILLAGE_HOUSE_ENV_SPEC', ('MineRLBasaltBuildVillageHouse-v0', (
+        'minerl.herobraine.env_specs.basalt_specs', 'VillageMakeHouseEnvSpec', {}))),
+])
+
+_specs = {}
+
+
+def get_spec(attr_name: str):
+    """Gets the env spec registered under a MINERL_* attribute, constructing it on first use."""
+    if attr_name not in _specs:
+        env_id, (module_name, class_name, kwargs) = _SPEC_FACTORIES[attr_name]
+        spec = getattr(importlib.import_module(module_name), class_name)(**kwargs)
+        assert spec.name == env_id, "{} is registered as {}".format(spec.name, env_id)
+        _specs[attr_name] = spec
+    return _specs[attr_name]
+
+
+class _LazyEntryPoint(object):
+    """The gym entry point of an env spec which is only constructed on the first gym.make.
+
+    The registration of the gym id only records the id and this entry point. The spec's
+    max_episode_steps and reward_threshold are filled into the registration when the
+    spec is constructed, which gym.make does before it applies the TimeLimit.
+    """
+
+    def __init__(self, attr_name: str):
+        self.attr_name = attr_name
+
+    def __call__(self, **kwargs):
+        spec = get_spec(self.attr_name)
+        gym_spec = gym.envs.registry.spec(spec.name)
+        gym_spec.max_episode_steps = spec.max_episode_steps
+        gym_spec.reward_threshold = spec.reward_threshold
+
+        entry_point = spec._entry_point(False)
+        module = importlib.import_module(entry_point.split(':')[0])
+        make_env = getattr(module, entry_point.split(':')[-1])
+        return make_env(**spec._env_kwargs(), **kwargs)
 
-MINERL_NAVIGATE_V0 = Navigate(dense=False, extreme=False)
-MINERL_NAVIGATE_EXTREME_V0 = Navigate(dense=False, extreme=True)
-MINERL_NAVIGATE_DENSE_V0 = Navigate(dense=True, extreme=False)
-MINERL_NAVIGATE_DENSE_EXTREME_V0 = Navigate(dense=True, extreme=True)
+    def __deepcopy__(self, memo):
+        # gym.make deep copies the registration into env.spec; the env spec is shared.
+        return self
 
-MINERL_OBTAIN_DIAMOND_SHOVEL_V0 = ObtainDiamondShovelEnvSpec()
 
-MINERL_EQUIP_WEAPON_V0 = EquipWeapon()
-MINERL_HUMAN_SURVIVAL_V0 = HumanSurvival()
+def __getattr__(name):
+    if name in _SPEC_FACTORIES:
+        return get_spec(name)
+    if name == 'ENVS':
+        return [get_spec(attr_name) for attr_name in _SPEC_FACTORIES]
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
-MINERL_BASALT_FIND_CAVES_ENV_SPEC = basalt_specs.FindCaveEnvSpec()
-MINERL_BASALT_MAKE_WATERFALL_ENV_SPEC = basalt_specs.MakeWaterfallEnvSpec()
-MINERL_BASALT_PEN_ANIMALS_VILLAGE_ENV_SPEC = basalt_specs.PenAnimalsVillageEnvSpec()
-MINERL_BASALT_VILLAGE_HOUSE_ENV_SPEC = basalt_specs.VillageMakeHouseEnvSpec()
 
 # Register the envs.
-ENVS = [env for env in locals().values() if isinstance(env, EnvSpec)]
-for env in ENVS:
-    if env.name not in gym.envs.registry.env_specs:
-        env.register()
+for _attr_name, (_env_id, _) in _SPEC_FACTORIES.items():
+    if _env_id not in gym.envs.registry.env_specs:
+        gym.register(id=_env_id, entry_point=_LazyEntryPoint(_attr_name))
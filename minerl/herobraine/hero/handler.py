@@ -9,6 +9,7 @@ from xml.etree.ElementTree import Element
 
 import gym
 import jinja2
+import jinja2.meta
 
 
 class Handler(ABC):
@@ -49,19 +50,7 @@ class Handler(ABC):
         Returns:
             str: the XML representation of the handler.
         """
-        var_dict = {}
-        for attr_name in dir(self):
-            if 'xml' not in attr_name:
-                var_dict[attr_name] = getattr(self, attr_name)
-        try:
-            env = jinja2.Environment(undefined=jinja2.StrictUndefined, autoescape=True)
-            template = env.from_string(self.xml_template())
-            return template.render(var_dict)
-        except jinja2.UndefinedError as e:
-            # print the exception with traceback
-            message = e.message + "\nOccurred in {}".format(self)
-            raise jinja2.UndefinedError(message=message)
-            pass
+        return xml_templates.render(self)
 
     def __or__(self, other):
         """
@@ -81,3 +70,48 @@ class Handler(ABC):
 
     def __repr__(self):
         return super().__repr__() + ":" + self.to_string()
+
+
+class XMLTemplateRegistry(object):
+    """A process-wide cache of compiled handler XML templates.
+
+    Each distinct xml_template() of a handler class is compiled once, together with
+    the names of the attributes it reads, so rendering only looks those up instead of
+    every attribute in dir(handler).
+    """
+
+    def __init__(self):
+        self._env = jinja2.Environment(undefined=jinja2.StrictUndefined, autoescape=True)
+        self._templates = {}  # type: Dict[Tuple[type, str], Tuple[jinja2.Template, Tuple[str, ...]]]
+
+    def compile(self, handler: Handler) -> Tuple[jinja2.Template, Tuple[str, ...]]:
+        """Gets the compiled template of a handler and the attributes it reads."""
+        source = handler.xml_template()
+        key = (type(handler), source)
+        compiled = self._templates.get(key)
+        if compiled is None:
+            variables = jinja2.meta.find_undeclared_variables(self._env.parse(source))
+            # Attributes with 'xml' in their name were never exposed to templates.
+            variables = tuple(sorted(v for v in variables if 'xml' not in v))
+            compiled = self._templates[key] = (self._env.from_string(source), variables)
+        return compiled
+
+    def render(self, handler: Handler) -> str:
+        template, variables = self.compile(handler)
+        var_dict = {}
+        for attr_name in variables:
+            # Missing attributes are left undefined so the template raises on them.
+            if hasattr(handler, attr_name):
+                var_dict[attr_name] = getattr(handler, attr_name)
+        try:
+            return template.render(var_dict)
+        except jinja2.UndefinedError as e:
+            message = e.message + "\nOccurred in {}".format(handler)
+            raise jinja2.UndefinedError(message=message)
+
+    def render_all(self, handlers: List[Handler]) -> List[str]:
+        """Renders the XML of every handler in a list."""
+        return [self.render(handler) for handler in handlers]
+
+
+xml_templates = XMLTemplateRegistry()
@@ -5,9 +5,15 @@ from typing import Any
 
 import numpy as np
 from minerl.herobraine.hero import spaces
+from minerl.herobraine.hero.mc import ItemRegistry
 from minerl.herobraine.hero.handlers.translation import TranslationHandler
 
 
+# The types whose str() is the same for equal values, so they can share an encoded command.
+_INT_TYPES = frozenset([int, np.int8, np.int16, np.int32, np.int64, np.uint8, np.uint16, np.uint32, np.uint64])
+_STR_TYPES = frozenset([str, np.str_])
+
+
 class Action(TranslationHandler):
     """
     An action handler based on commands
@@ -51,6 +57,38 @@ class Action(TranslationHandler):
 
         return cmd
 
+    def compile_to_hero(self):
+        """
+        Precomputes the encoded command of every value of discrete spaces, so that
+        stepping with one is a single lookup. Other values are formatted as to_hero does.
+        """
+        if type(self).to_hero is not Action.to_hero:
+            return super().compile_to_hero()
+
+        prefix = (self.command + " ").encode()
+        if isinstance(self.space, spaces.Enum):
+            values, exact_types = self.space.values, _STR_TYPES
+        elif isinstance(self.space, spaces.DiscreteRange):
+            values, exact_types = range(self.space.begin, self.space.end), _INT_TYPES
+        elif isinstance(self.space, spaces.Discrete):
+            values, exact_types = range(self.space.n), _INT_TYPES
+        else:
+            values, exact_types = [], ()
+        table = {value: prefix + str(value).encode() for value in values}
+
+        def to_hero(x):
+            if type(x) in exact_types:
+                cmd = table.get(x)
+                if cmd is not None:
+                    return cmd
+            if isinstance(x, np.ndarray):
+                return prefix + " ".join([str(y) for y in x.flatten().tolist()]).encode()
+            elif hasattr(x, "__iter__") and not isinstance(x, str):
+                return prefix + " ".join([str(y) for y in x]).encode()
+            return prefix + str(x).encode()
+
+        return to_hero
+
     def __or__(self, other):
         if not self.command == other.command:
             raise ValueError("Command must be the same between {} and {}".format(self.command, other.command))
@@ -80,6 +118,8 @@ class ItemListAction(Action):
         self._command = command
         self._items = items
         self._univ_items = ['minecraft:' + item for item in items]
+        self._item_index = ItemRegistry(self._items)
+        self._univ_item_index = ItemRegistry(self._univ_items)
         if _other not in self._items or _default not in self._items:
             print(self._items)
             print(_default)
@@ -132,11 +172,11 @@ class ItemListAction(Action):
             return False
 
         # Check that all items are in self._items
-        if not all(x in self._items for x in other._items):
+        if not all(x in self._item_index for x in other._items):
             return False
 
         # Check that all items are in other._items
-        if not all(x in other._items for x in self._items):
+        if not all(x in other._item_index for x in self._items):
             return False
 
         return True
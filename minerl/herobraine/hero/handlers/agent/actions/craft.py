@@ -41,7 +41,8 @@ class CraftAction(ItemListAction):
     def from_universal(self, obs):
         if 'diff' in obs and 'crafted' in obs['diff'] and len(obs['diff']['crafted']) > 0:
             try:
-                x = self._univ_items.index(obs['diff']['crafted'][0]['item'])
+                if obs['diff']['crafted'][0]['item'] not in self._univ_item_index:
+                    raise ValueError()
                 return obs['diff']['crafted'][0]['item'].split('minecraft:')[-1]
             except ValueError:
                 return self._default
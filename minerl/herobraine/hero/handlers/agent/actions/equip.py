@@ -31,7 +31,9 @@ class EquipAction(ItemListAction):
         try:
             if obs['slots']['gui']['type'] == 'class net.minecraft.inventory.ContainerPlayer':
                 hotbar_index = int(obs['hotbar'])
-                item = self._univ_items.index(obs['slots']['gui']['slots'][-10 + hotbar_index]['name'])
+                item = self._univ_item_index.get_item_id(obs['slots']['gui']['slots'][-10 + hotbar_index]['name'])
+                if item < 0:
+                    raise ValueError()
                 if item != self.previous:
                     self.previous = item
                     return obs['slots']['gui']['slots'][-10 + hotbar_index]['name'].split('minecraft:')[-1]
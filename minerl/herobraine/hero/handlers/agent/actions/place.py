@@ -41,7 +41,7 @@ class PlaceBlock(ItemListAction):
                     if int(action) == -99 and self._prev_inv is not None:
 
                         item_name = self._prev_inv[int(-10 + obs['hotbar'])]['name'].split("minecraft:")[-1]
-                        if item_name not in self._items:
+                        if item_name not in self._item_index:
                             raise ValueError()
                         else:
                             return item_name
@@ -25,7 +25,8 @@ class SmeltItemNearby(CraftAction):
     def from_universal(self, obs):
         if 'diff' in obs and 'smelted' in obs['diff'] and len(obs['diff']['smelted']) > 0:
             try:
-                x = self._univ_items.index(obs['diff']['smelted'][0]['item'])
+                if obs['diff']['smelted'][0]['item'] not in self._univ_item_index:
+                    raise ValueError()
                 return obs['diff']['smelted'][0]['item'].split('minecraft:')[-1]
             except ValueError:
                 return self._default
@@ -10,7 +10,7 @@ from typing import List
 
 import jinja2
 
-from minerl.herobraine.hero.mc import EQUIPMENT_SLOTS
+from minerl.herobraine.hero.mc import EQUIPMENT_SLOTS, ItemRegistry
 from minerl.herobraine.hero import spaces
 from minerl.herobraine.hero.handlers.translation import TranslationHandler, TranslationHandlerGroup
 import numpy as np
@@ -18,6 +18,15 @@ import numpy as np
 __all__ = ['EquippedItemObservation']
 
 
+def _loads(x):
+    # The nested documents may already have been decoded by the ObservationDecoder.
+    return x if isinstance(x, dict) else json.loads(x)
+
+
+def _equipped_json_paths(keys):
+    return [('equipped_items',) + tuple(keys[:i + 1]) for i in range(len(keys))]
+
+
 class EquippedItemObservation(TranslationHandlerGroup):
     """
     Enables the observation of equipped items in the main, offhand,
@@ -116,6 +125,7 @@ class _TypeObservation(TranslationHandler):
         of all of the spaces for each individual command.
         """
         self._items = sorted(items)
+        self._item_index = ItemRegistry(self._items)
         self._keys = keys
         self._univ_items = ['minecraft:' + item for item in items]
         self._default = _default
@@ -133,13 +143,16 @@ class _TypeObservation(TranslationHandler):
     def to_string(self):
         return 'type'
 
+    def hero_json_paths(self):
+        return _equipped_json_paths(self._keys)
+
     def from_hero(self, obs_dict):
         try:
             head = obs_dict['equipped_items']
             for key in self._keys:
-                head = json.loads(head[key])
+                head = _loads(head[key])
             item = head['type']
-            return (self._other if item not in self._items else item)
+            return (self._other if item not in self._item_index else item)
         except KeyError:
             return self._default
 
@@ -153,7 +166,7 @@ class _TypeObservation(TranslationHandler):
 
                 item_name = (
                     obs['slots']['gui']['slots'][offset + hotbar_index]['name'].split("minecraft:")[-1])
-                if not item_name in self._items:
+                if not item_name in self._item_index:
                     raise ValueError()
                 if item_name == 'air':
                     raise KeyError()
@@ -202,11 +215,14 @@ class _DamageObservation(TranslationHandler):
     def to_string(self):
         return self.type_str
 
+    def hero_json_paths(self):
+        return _equipped_json_paths(self._keys)
+
     def from_hero(self, info):
         try:
             head = info['equipped_items']
             for key in self._keys:
-                head = json.loads(head[key])
+                head = _loads(head[key])
             return np.array(head[self.type_str])
         except KeyError:
             return np.array(self._default, dtype=self.space.dtype)
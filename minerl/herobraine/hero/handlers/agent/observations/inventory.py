@@ -26,11 +26,7 @@ class FlatInventoryObservation(TranslationHandler):
 
     def __init__(self, item_list, _other='other'):
         item_list = sorted(item_list)
-        super().__init__(spaces.Dict(spaces={
-            k: spaces.Box(low=0, high=2304,
-                          shape=(), dtype=np.int32, normalizer_scale='log')
-            for k in item_list
-        }))
+        super().__init__(spaces.Inventory(item_list))
         self.num_items = len(item_list)
         self.items = item_list
 
@@ -45,7 +41,8 @@ class FlatInventoryObservation(TranslationHandler):
         :param obs:
         :return:
         """
-        item_dict = self.space.no_op()
+        inventory = self.space.no_op()
+        counts, item_index = inventory.counts, self.space.item_index
         # TODO: RE-ADDRESS THIS DUCK TYPED INVENTORY DATA FORMAT WHEN MOVING TO STRONG TYPING
         for stack in info['inventory']:
             if 'type' in stack and 'quantity' in stack:
@@ -53,20 +50,21 @@ class FlatInventoryObservation(TranslationHandler):
                 if type_name == 'log2':
                     type_name = 'log'
 
-                # This sets the nubmer of air to correspond to the number of empty slots :)
-                try:
-                    if type_name == "air":
-                        item_dict[type_name] += 1
-                    else:
-                        item_dict[type_name] += stack["quantity"]
-                except KeyError:
-                    # We only care to observe what was specified in the space.
+                # We only care to observe what was specified in the space.
+                item_id = item_index.get_item_id(type_name)
+                if item_id < 0:
                     continue
+                # This sets the nubmer of air to correspond to the number of empty slots :)
+                if type_name == "air":
+                    counts[item_id] += 1
+                else:
+                    counts[item_id] += stack["quantity"]
 
-        return item_dict
+        return inventory
 
     def from_universal(self, obs):
-        item_dict = self.space.no_op()
+        inventory = self.space.no_op()
+        counts, item_index = inventory.counts, self.space.item_index
 
         try:
             if obs['slots']['gui']['type'] == 'class net.minecraft.inventory.ContainerPlayer' or \
@@ -88,19 +86,22 @@ class FlatInventoryObservation(TranslationHandler):
                 try:
                     name = mc.strip_item_prefix(stack['name'])
                     name = 'log' if name == 'log2' else name
+                    item_id = item_index.get_item_id(name)
+                    if item_id < 0:
+                        continue
                     if name == "air":
-                        item_dict[name] += 1
+                        counts[item_id] += 1
                     else:
-                        item_dict[name] += stack['count']
+                        counts[item_id] += stack['count']
                 except (KeyError, ValueError):
                     continue
 
         except KeyError as e:
             self.logger.warning("KeyError found in universal observation! Yielding empty inventory.")
             self.logger.error(e)
-            return item_dict
+            return inventory
 
-        return item_dict
+        return inventory
 
     def __or__(self, other):
         """
@@ -50,6 +50,10 @@ class LifeStatsObservation(KeymapTranslationHandler):
         hero_dict = hero_dict['life_stats']
         return super().from_hero(hero_dict)
 
+    def compile_from_hero(self):
+        walk = self.compile_walk(self.hero_keys)
+        return lambda hero_dict: walk(hero_dict['life_stats'])
+
 
 class _IsAliveObservation(LifeStatsObservation):
     """
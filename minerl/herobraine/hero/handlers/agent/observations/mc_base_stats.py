@@ -2,19 +2,22 @@
 # Author: William H. Guss, Brandon Houghton
 
 import jinja2
-from typing import List
+from typing import List, Sequence
 
 from minerl.herobraine.hero.handlers.translation import KeymapTranslationHandler, TranslationHandlerGroup
 import minerl.herobraine.hero.mc as mc
 from minerl.herobraine.hero import spaces
 import numpy as np
 
-__all__ = ['ObserveFromFullStats']
+__all__ = ['ObserveFromFullStats', 'FullStatsExtractor']
 
 
 class ObserveFromFullStats(TranslationHandlerGroup):
     """
     Includes the use_item statistics for every item in MC that can be used
+
+    With stat_key=None every stat in mc.ALL_STAT_KEYS is observed as one flat int64
+    array under "full_stats", in the column order of FullStatsExtractor.stat_keys.
     """
 
     def xml_template(self) -> str:
@@ -26,15 +29,124 @@ class ObserveFromFullStats(TranslationHandlerGroup):
     def __init__(self, stat_key):
         if stat_key is None:
             self.stat_key = "full_stats"
-            super(ObserveFromFullStats, self).__init__(
-                handlers=[_FullStatsObservation(statKeys) for statKeys in mc.ALL_STAT_KEYS if len(statKeys) == 2]
-            )
+            self.extractor = FullStatsExtractor([statKeys for statKeys in mc.ALL_STAT_KEYS if len(statKeys) == 2])
+            super(ObserveFromFullStats, self).__init__(handlers=[])
+            self.space = spaces.Box(low=0, high=np.inf, shape=(len(self.extractor),), dtype=np.int64)
         else:
             self.stat_key = stat_key
+            self.extractor = None
             super(ObserveFromFullStats, self).__init__(
                 handlers=[_FullStatsObservation(statKeys) for statKeys in mc.ALL_STAT_KEYS if stat_key in statKeys]
             )
 
+    def from_hero(self, x):
+        if self.extractor is None:
+            return super().from_hero(x)
+        # A new array every call, since the agents of an env are decoded concurrently.
+        return self.extractor(x)
+
+    def from_universal(self, x):
+        if self.extractor is None:
+            return super().from_universal(x)
+        return self.extractor(x)
+
+    def compile_from_hero(self):
+        if self.extractor is None:
+            return super().compile_from_hero()
+        return self.from_hero
+
+
+class FullStatsExtractor(object):
+    """Reads a set of stats out of an observation dict in bulk.
+
+    The column of every stat key path is computed once, and each call fills one
+    int64 array in a single pass over the stat groups present in the observation,
+    rather than walking the dict once per stat. Stats which are missing from the
+    observation are 0.
+
+    Dense extraction may be called from several threads at once. Sparse extraction
+    keeps the previous values, so a sparse extractor must only follow one stream of
+    observations (e.g. of one agent).
+
+    Args:
+        stat_keys (Sequence[Sequence[str]], optional): The (group, name) key paths of the
+            stats, in column order. Defaults to every stat in mc.ALL_STAT_KEYS.
+        sparse (bool, optional): Whether to return only the stats which changed since the
+            previous call (or reset), as a dict from key path to value, instead of the
+            dense array. Defaults to False.
+    """
+
+    def __init__(self, stat_keys: Sequence[Sequence[str]] = None, sparse: bool = False):
+        if stat_keys is None:
+            stat_keys = mc.item_registry().stat_keys
+        self.stat_keys = tuple(tuple(keys) for keys in stat_keys)
+        self.sparse = sparse
+        assert all(len(keys) == 2 for keys in self.stat_keys), "Stats are (group, name) key paths."
+
+        # Unknown stats of a known group are written to a scratch column past the end.
+        self._scratch = len(self.stat_keys)
+        self._columns = {}
+        for column, (group, name) in enumerate(self.stat_keys):
+            self._columns.setdefault(group, {})[name] = column
+        self._cache = {}
+        self._values = np.zeros(len(self.stat_keys) + 1, dtype=np.int64)
+        self._previous = np.zeros_like(self._values)
+
+    def __len__(self):
+        return len(self.stat_keys)
+
+    def column(self, keys) -> int:
+        """Gets the column of a stat key path, raising a KeyError for unknown stats."""
+        group, name = keys
+        return self._columns[group][name]
+
+    def extract(self, stats_dict, out: np.ndarray = None) -> np.ndarray:
+        """Fills the dense stats array.
+
+        Args:
+            stats_dict (dict): The observation, with the stat groups at the top level.
+            out (np.ndarray, optional): The int64 array to fill, of len(self) + 1 so that
+                it has room for the scratch column. Defaults to a new array.
+
+        Returns:
+            np.ndarray: The len(self) stats, a view of out.
+        """
+        if out is None:
+            out = np.zeros(len(self.stat_keys) + 1, dtype=np.int64)
+        else:
+            out.fill(0)
+        for group in self._columns:
+            stats = stats_dict.get(group)
+            if stats:
+                names = tuple(stats)
+                out[self._group_columns(group, names)] = np.fromiter(stats.values(), np.int64, len(names))
+        return out[:self._scratch]
+
+    def _group_columns(self, group, names) -> np.ndarray:
+        # The server sends the same stats in the same order every step, so the
+        # columns of a group are looked up again only when its names change.
+        cached_names, columns = self._cache.get(group, (None, None))
+        if cached_names != names:
+            group_columns = self._columns[group]
+            columns = np.array([group_columns.get(name, self._scratch) for name in names], dtype=np.intp)
+            self._cache[group] = (names, columns)
+        return columns
+
+    def __call__(self, stats_dict):
+        if not self.sparse:
+            return self.extract(stats_dict)
+
+        current = self.extract(stats_dict, out=self._values)
+        changed = np.flatnonzero(current != self._previous[:self._scratch])
+        result = {self.stat_keys[column]: int(current[column]) for column in changed}
+        # The current values become the previous ones of the next call.
+        self._values, self._previous = self._previous, self._values
+        return result
+
+    def reset(self):
+        """Forgets the previous values, so that the next sparse call reports every nonzero stat."""
+        self._previous.fill(0)
+
 
 class _FullStatsObservation(KeymapTranslationHandler):
     def to_hero(self, x) -> int:
@@ -24,39 +24,89 @@ class POVObservation(KeymapTranslationHandler):
         return str("""
             <VideoProducer 
                 want_depth="{{ include_depth | string | lower }}">
-                <Width>{{ video_width }} </Width>
+                <Width>{{ video_width }}</Width>
                 <Height>{{ video_height }}</Height>
             </VideoProducer>""")
 
-    def __init__(self, video_resolution: Tuple[int, int], include_depth: bool = False):
+    def __init__(self, video_resolution: Tuple[int, int], include_depth: bool = False,
+                 layout: str = None, buffer_frames: int = None):
+        """
+        :param video_resolution: The (width, height) of the frames.
+        :param include_depth: Whether the frames have a fourth, depth channel.
+        :param layout: None for a (flipped, read-only) view of the frame as received, or
+            "HWC" / "CHW" for a contiguous copy in that layout. Defaults to "HWC" when
+            buffer_frames is set.
+        :param buffer_frames: If set, every env decodes its frames into its own preallocated
+            POVFrameBuffer, which keeps the last buffer_frames frames as a stack. The "pov"
+            observation is then a view of a slot of that buffer, which is overwritten about
+            buffer_frames steps later; copy it to keep it longer (e.g. in a replay buffer).
+        """
         self.include_depth = include_depth
         self.video_resolution = video_resolution
+        if layout is None and buffer_frames is not None:
+            layout = 'HWC'
+        assert layout in (None, 'HWC', 'CHW'), "layout must be HWC or CHW"
+        self.layout = layout
+        self.buffer_frames = buffer_frames
 
-        space = None
-        if include_depth:
-            space = spaces.Box(0, 255, list(video_resolution)[::-1] + [4], dtype=np.uint8)
-            self.video_depth = 4
-        else:
-            space = spaces.Box(0, 255, list(video_resolution)[::-1] + [3], dtype=np.uint8)
-            self.video_depth = 3
-
+        self.video_depth = 4 if include_depth else 3
         # TODO (R): FIGURE THIS THE FUCK OUT & Document it.
         self.video_height = video_resolution[1]
         self.video_width = video_resolution[0]
 
+        if layout == 'CHW':
+            shape = [self.video_depth, self.video_height, self.video_width]
+        else:
+            shape = [self.video_height, self.video_width, self.video_depth]
+        space = spaces.Box(0, 255, shape, dtype=np.uint8)
+
         super().__init__(
             hero_keys=["pov"],
             univ_keys=["pov"], space=space)
 
-    def from_hero(self, obs):
-        byte_array = super().from_hero(obs)
-        pov = np.frombuffer(byte_array, dtype=np.uint8)
+    def frame_buffer(self) -> 'POVFrameBuffer':
+        """Creates a frame buffer for the frames of one env, or None if they are not buffered."""
+        if self.buffer_frames is None:
+            return None
+        return POVFrameBuffer(self.space.shape, self.buffer_frames)
 
-        if pov is None or len(pov) == 0:
-            pov = np.zeros((self.video_height, self.video_width, self.video_depth), dtype=np.uint8)
+    def _received_frame(self, obs) -> np.ndarray:
+        # The frame is wrapped without copying; it is usually a memoryview into the
+        # connection's payload buffer (see minerl.env.comms.Connection). The connection
+        # does not reuse that buffer for as long as the frame references it, but the
+        # frame is read-only so that it can't be written through; copy it to modify it.
+        byte_array = obs.get('pov')
+        if isinstance(byte_array, np.ndarray):
+            byte_array = np.ascontiguousarray(byte_array)
+        pov = np.frombuffer(byte_array if byte_array is not None else b'', dtype=np.uint8)
+        if len(pov) == 0:
+            return None
+        pov.flags.writeable = False
+        # Frames are sent bottom row first.
+        return pov.reshape((self.video_height, self.video_width, self.video_depth))[::-1, :, :]
+
+    def decode_into(self, obs, out: np.ndarray) -> np.ndarray:
+        """Flips (and transposes for CHW) the received frame into out with a single copy."""
+        pov = self._received_frame(obs)
+        if pov is None:
+            out.fill(0)
+        elif self.layout == 'CHW':
+            np.copyto(out, pov.transpose(2, 0, 1))
         else:
-            pov = pov.reshape((self.video_height, self.video_width, self.video_depth))[::-1, :, :]
+            np.copyto(out, pov)
+        return out
+
+    def from_hero(self, obs):
+        # The env passes the frame buffer of the agent along with the frame (see _MultiAgentEnv).
+        frames = obs.get('pov_frames')
+        if frames is not None:
+            return self.decode_into(obs, frames.next_frame())
+        if self.layout is not None:
+            return self.decode_into(obs, np.empty(self.space.shape, dtype=np.uint8))
 
+        pov = self._received_frame(obs)
+        if pov is None:
+            pov = np.zeros((self.video_height, self.video_width, self.video_depth), dtype=np.uint8)
         return pov
 
     def __or__(self, other):
@@ -65,7 +115,67 @@ class POVObservation(KeymapTranslationHandler):
         otherwise raise an exception.
         """
         if isinstance(other, POVObservation) and self.include_depth == other.include_depth and \
-                self.video_resolution == other.video_resolution:
-            return POVObservation(self.video_resolution, include_depth=self.include_depth)
+                self.video_resolution == other.video_resolution and self.layout == other.layout and \
+                self.buffer_frames == other.buffer_frames:
+            return POVObservation(self.video_resolution, include_depth=self.include_depth,
+                                  layout=self.layout, buffer_frames=self.buffer_frames)
         else:
             raise ValueError("Incompatible observables!")
+
+
+class POVFrameBuffer(object):
+    """A preallocated buffer for the frames of one env which keeps the last stack_size
+    of them as a contiguous stack.
+
+    Frames are written into a window which slides over capacity slots; when it reaches the
+    end, the last stack_size - 1 frames are moved to the front. So a frame returned by
+    next_frame stays valid for at least capacity - stack_size further frames, and memory
+    stays bounded by capacity frames.
+
+    Args:
+        frame_shape (Tuple[int, ...]): The shape of a frame.
+        stack_size (int): The number of frames in a stack.
+        capacity (int, optional): The number of frame slots. Defaults to 2 * stack_size.
+        dtype (optional): The dtype of the frames. Defaults to np.uint8.
+    """
+
+    def __init__(self, frame_shape, stack_size: int, capacity: int = None, dtype=np.uint8):
+        assert stack_size >= 1, "stack_size must be positive"
+        capacity = 2 * stack_size if capacity is None else capacity
+        assert capacity > stack_size, "capacity must be larger than stack_size"
+        self.stack_size = stack_size
+        self.frames = np.zeros((capacity,) + tuple(frame_shape), dtype=dtype)
+        self._end = 0
+        self._count = 0
+
+    def __len__(self):
+        """The number of frames in the stack."""
+        return self._count
+
+    def next_frame(self) -> np.ndarray:
+        """Advances the buffer by one frame and returns the slot to write it into."""
+        if self._end == len(self.frames):
+            kept = self.stack_size - 1
+            self.frames[:kept] = self.frames[self._end - kept:self._end]
+            self._end = kept
+        frame = self.frames[self._end]
+        self._end += 1
+        self._count = min(self._count + 1, self.stack_size)
+        return frame
+
+    def latest(self) -> np.ndarray:
+        assert self._count, "No frames have been written yet."
+        return self.frames[self._end - 1]
+
+    def stack(self, k: int = None) -> np.ndarray:
+        """Gets a view of the last k (by default stack_size) frames, oldest first.
+
+        Fewer frames are returned while fewer than k have been written since clear().
+        """
+        k = self.stack_size if k is None else k
+        assert k <= self.stack_size, "Only the last {} frames are kept.".format(self.stack_size)
+        return self.frames[self._end - min(k, self._count):self._end]
+
+    def clear(self):
+        """Forgets the frames in the stack, e.g. at the start of an episode."""
+        self._count = 0
@@ -37,3 +37,138 @@ def test_merge_flat_inventory_observation():
 
 def test_combine_compass_observations():
     assert CompassObservation() | CompassObservation() == CompassObservation()
+
+
+def test_compiled_from_hero_matches_from_hero():
+    from minerl.herobraine.hero.handlers.agent.observations.lifestats import ObservationFromLifeStats
+    from minerl.herobraine.hero.handlers.agent.observations.location_stats import ObservationFromCurrentLocation
+    from minerl.herobraine.hero.handlers.agent.observations.mc_base_stats import ObserveFromFullStats
+    info = {
+        'life_stats': {'life': 17.5, 'food': 3, 'is_alive': True},
+        'xpos': 10.5, 'ypos': 64.0, 'yaw': -90.0, 'is_raining': True,
+        'mine_block': {'dirt': 4, 'stone': 2},
+    }
+
+    for handler in [ObservationFromLifeStats(), ObservationFromCurrentLocation(), ObserveFromFullStats('mine_block')]:
+        expected = handler.from_hero(info)
+        compiled = handler.compile_from_hero()(info)
+        assert list(compiled) == list(expected)
+        for key in expected:
+            assert compiled[key] == expected[key] and compiled[key].dtype == expected[key].dtype
+
+
+def test_observation_decoder_parses_nested_equipped_items_once():
+    import json
+    from minerl.herobraine.env_spec import ObservationDecoder
+    from minerl.herobraine.hero.handlers.agent.observations.equipped_item import EquippedItemObservation
+    handler = EquippedItemObservation(['air', 'wooden_pickaxe'], offhand=True)
+    raw = {'equipped_items': {
+        'mainhand': json.dumps({'type': 'wooden_pickaxe', 'damage': 3, 'maxDamage': 59}),
+        'offhand': json.dumps({'type': 'air', 'damage': 0, 'maxDamage': 0})}}
+
+    info = ObservationDecoder([handler], []).parse(json.dumps(raw))
+    assert info['equipped_items']['mainhand'] == {'type': 'wooden_pickaxe', 'damage': 3, 'maxDamage': 59}
+
+    expected = handler.from_hero(raw)
+    decoded = handler.compile_from_hero()(info)
+    assert decoded['mainhand']['type'] == expected['mainhand']['type'] == 'wooden_pickaxe'
+    assert decoded['mainhand']['damage'] == expected['mainhand']['damage'] == 3
+    assert decoded['offhand']['type'] == expected['offhand']['type'] == 'air'
+
+
+def test_xml_template_registry_compiles_once_and_reads_only_template_attributes():
+    import jinja2
+    import pytest
+    from minerl.herobraine.hero.handler import Handler, XMLTemplateRegistry
+
+    class TestHandler(Handler):
+        def __init__(self, width):
+            self.width = width
+
+        def to_string(self):
+            return "test"
+
+        @property
+        def expensive(self):
+            raise AssertionError("not read by the template")
+
+        def xml_template(self):
+            return "<Width>{{ width }}</Width><Height>{{ height }}</Height>"
+
+    registry = XMLTemplateRegistry()
+    handlers = [TestHandler(64), TestHandler(8)]
+    handlers[0].height, handlers[1].height = 32, 4
+    assert registry.render_all(handlers) == [
+        "<Width>64</Width><Height>32</Height>", "<Width>8</Width><Height>4</Height>"]
+    assert len(registry._templates) == 1
+    assert registry.compile(handlers[0])[1] == ('height', 'width')
+
+    with pytest.raises(jinja2.UndefinedError):
+        registry.render(TestHandler(8))
+
+
+def test_item_list_index_matches_item_list_scan():
+    import pytest
+    from minerl.herobraine.hero.handlers import util
+
+    pairs = [(t, m) for t in ['log', 'log2', 'planks', 'dirt', 'stone', 'air'] for m in range(4)]
+    for item_list in [['log', 'planks#2', 'dirt'], ['log', 'log2', 'planks'], ['log#1', 'stone#3', 'air']]:
+        index = util.ItemListIndex(item_list)
+        for clobber_logs in [True, False]:
+            assert index.match_many(pairs, clobber_logs) == [
+                util.get_unique_matching_item_list_id(list(item_list), t, m, clobber_logs) for t, m in pairs]
+        for t, m in pairs + [(t, None) for t, _ in pairs]:
+            assert util.item_list_contains(index, t, m) == util.item_list_contains(item_list, t, m)
+
+    with pytest.raises(ValueError):
+        util.ItemListIndex(['planks', 'planks#2']).match('planks', 2)
+
+
+def test_full_stats_extractor_fills_one_array():
+    from minerl.herobraine.hero.handlers.agent.observations.mc_base_stats import (
+        FullStatsExtractor, ObserveFromFullStats)
+    stat_keys = [('mine_block', 'dirt'), ('mine_block', 'stone'), ('pickup', 'dirt'), ('custom', 'jump')]
+    info = {'mine_block': {'stone': 2, 'dirt': 4, 'unknown_block': 7}, 'pickup': {'dirt': 1}}
+
+    extractor = FullStatsExtractor(stat_keys)
+    assert extractor(info).tolist() == [4, 2, 1, 0]
+    assert extractor.column(('pickup', 'dirt')) == 2
+
+    sparse = FullStatsExtractor(stat_keys, sparse=True)
+    assert sparse(info) == {('mine_block', 'dirt'): 4, ('mine_block', 'stone'): 2, ('pickup', 'dirt'): 1}
+    info['pickup']['dirt'] = 3
+    assert sparse(info) == {('pickup', 'dirt'): 3}
+    assert sparse(info) == {}
+    sparse.reset()
+    assert len(sparse(info)) == 3
+
+    full_stats = ObserveFromFullStats(None)
+    observation = full_stats.compile_from_hero()(info)
+    assert observation.dtype == "int64" and observation in full_stats.space
+    assert observation[full_stats.extractor.column(('mine_block', 'dirt'))] == 4
+    assert observation.sum() == 9
+
+
+def test_pov_decodes_into_frame_buffer_in_layout():
+    import numpy
+    from minerl.herobraine.hero.handlers.agent.observations.pov import POVObservation, POVFrameBuffer
+    frames = numpy.random.randint(0, 256, size=(6, 4, 8, 3), dtype=numpy.uint8)
+    raw = [frame[::-1].tobytes() for frame in frames]
+
+    legacy = POVObservation((8, 4))
+    assert numpy.array_equal(legacy.from_hero({'pov': raw[0]}), frames[0])
+
+    chw = POVObservation((8, 4), layout='CHW', buffer_frames=3)
+    assert chw.space.shape == (3, 4, 8)
+    buffer = chw.frame_buffer()
+    assert isinstance(buffer, POVFrameBuffer) and len(buffer.frames) == 6
+    decoded = [chw.from_hero({'pov': r, 'pov_frames': buffer}) for r in raw]
+    for frame, pov in zip(frames[-3:], decoded[-3:]):
+        assert numpy.array_equal(pov, frame.transpose(2, 0, 1)) and pov.flags['C_CONTIGUOUS']
+    stack = buffer.stack()
+    assert stack.shape == (3, 3, 4, 8) and numpy.shares_memory(stack, buffer.frames)
+    assert numpy.array_equal(stack, frames[-3:].transpose(0, 3, 1, 2))
+
+    buffer.clear()
+    assert len(buffer.stack()) == 0
+    assert numpy.array_equal(chw.from_hero({'pov': raw[0], 'pov_frames': buffer}), buffer.stack()[0])
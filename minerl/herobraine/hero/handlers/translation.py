@@ -42,6 +42,27 @@ class TranslationHandler(Handler):
         """
         raise NotImplementedError()
 
+    def compile_to_hero(self) -> typing.Callable[[Any], bytes]:
+        """
+        Returns a function equivalent to to_hero, encoded, which is cheaper to call on
+        every step. Handlers with a fixed command format override this to precompute it.
+        """
+        return lambda x: self.to_hero(x).encode()
+
+    def hero_json_paths(self) -> typing.List[typing.Tuple[str, ...]]:
+        """
+        The paths into the hero dict of values which are themselves JSON documents
+        that from_hero decodes, so that they can be decoded once for all handlers.
+        """
+        return []
+
+    def compile_from_hero(self) -> typing.Callable[[typing.Dict[str, Any]], Any]:
+        """
+        Returns a function equivalent to from_hero which is cheaper to call on every step.
+        Handlers whose from_hero is a plain lookup override this to precompute it.
+        """
+        return self.from_hero
+
 
 # TODO: ONLY WORKS FOR OBSERVATIONS.
 # TODO: Consider moving this to observations.
@@ -94,6 +115,33 @@ class KeymapTranslationHandler(TranslationHandler):
     def to_string(self) -> str:
         return self._to_string
 
+    def is_plain_keymap(self) -> bool:
+        """Whether from_hero is exactly walk_dict over hero_keys."""
+        return (type(self).from_hero is KeymapTranslationHandler.from_hero
+                and type(self).walk_dict is KeymapTranslationHandler.walk_dict)
+
+    def compile_from_hero(self):
+        if not self.is_plain_keymap():
+            return super().compile_from_hero()
+        return self.compile_walk(self.hero_keys)
+
+    def compile_walk(self, keys):
+        """Returns walk_dict with keys and the default bound once."""
+        keys = tuple(keys)
+        default = self.default_if_missing
+
+        def walk(d):
+            for key in keys:
+                if key in d:
+                    d = d[key]
+                elif default is not None:
+                    return np.array(default)
+                else:
+                    raise KeyError()
+            return np.array(d)
+
+        return walk
+
 
 class TranslationHandlerGroup(TranslationHandler):
     """Combines several space handlers into a single handler group.
@@ -124,6 +172,56 @@ class TranslationHandlerGroup(TranslationHandler):
             for h in self.handlers
         }
 
+    def compile_from_hero(self):
+        """Compiles the constituent handlers once. The plain keymaps sharing a key
+        prefix (e.g. every stat of an ObserveFromFullStats group) walk that prefix once
+        and then do a single lookup each.
+        """
+        if type(self).from_hero is not TranslationHandlerGroup.from_hero:
+            return super().compile_from_hero()
+
+        names = [h.to_string() for h in self.handlers]
+        decoders = []
+        prefixes = OrderedDict()
+        for h in self.handlers:
+            if isinstance(h, KeymapTranslationHandler) and h.is_plain_keymap() and len(h.hero_keys) > 0:
+                prefix = tuple(h.hero_keys[:-1])
+                if prefix not in prefixes:
+                    prefixes[prefix] = []
+                    decoders.append((prefix, prefixes[prefix]))
+                prefixes[prefix].append((h.to_string(), h.hero_keys[-1], h.default_if_missing))
+            else:
+                decoders.append((None, (h.to_string(), h.compile_from_hero())))
+
+        def from_hero(x):
+            # Keep the order of self.handlers.
+            out = dict.fromkeys(names)
+            for prefix, leaves in decoders:
+                if prefix is None:
+                    name, decode = leaves
+                    out[name] = decode(x)
+                    continue
+                d = x
+                for key in prefix:
+                    if key in d:
+                        d = d[key]
+                    else:
+                        d = {}
+                        break
+                for name, key, default in leaves:
+                    if key in d:
+                        out[name] = np.array(d[key])
+                    elif default is not None:
+                        out[name] = np.array(default)
+                    else:
+                        raise KeyError()
+            return out
+
+        return from_hero
+
+    def hero_json_paths(self):
+        return sorted(set(path for h in self.handlers for path in h.hero_json_paths()))
+
     def from_universal(self, x: typing.Dict[str, Any]) -> typing.Dict[str, Any]:
         """Performs the same operation as from_hero except with from_universal.
         """
@@ -1,7 +1,9 @@
 import collections
-from typing import Tuple, Optional, Sequence, Dict, Set, List
+import functools
+from typing import Iterable, Tuple, Optional, Sequence, Dict, Set, List, Union
 
 
+@functools.lru_cache(maxsize=4096)
 def decode_item_maybe_with_metadata(s: str) -> Tuple[str, Optional[int]]:
     assert len(s) > 0
     if '#' in s:
@@ -50,12 +52,82 @@ def error_on_malformed_item_list(item_list: Sequence[str], special_items: Sequen
             )
 
 
+class ItemListIndex:
+    """An index over an item list for matching (item_type, metadata) pairs against it.
+
+    Build it once per handler and pass it instead of the item list to item_list_contains
+    and get_unique_matching_item_list_id, which otherwise scan the list on every call.
+
+    Args:
+        item_list: A list of item identifiers. Either just the item type ("wooden_pickaxe")
+            or the item type with a metadata requirement ("planks#2").
+    """
+
+    def __init__(self, item_list: Iterable[str]):
+        self.item_list = tuple(item_list)
+        self._members = frozenset(self.item_list)
+        self._specific: Dict[Tuple[str, int], str] = {}
+        for s in self.item_list:
+            item_type, sep, metadata_str = s.partition('#')
+            if not sep:
+                continue
+            try:
+                metadata = int(metadata_str)
+            except ValueError:
+                continue
+            # Only identifiers which encode_item_with_metadata can produce can be matched.
+            if encode_item_with_metadata(item_type, metadata) == s:
+                self._specific[item_type, metadata] = s
+
+        # The log clobber rule of get_unique_matching_item_list_id: "log2" matches "log" if
+        # that is the only identifier starting with "log".
+        log_start = [x for x in self.item_list if x.startswith("log")]
+        self._log2_matches_log = len(log_start) == 1 and log_start[0] == "log"
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._members
+
+    def contains(self, item_type: str, metadata: Optional[int]) -> bool:
+        """See item_list_contains."""
+        if metadata is None:
+            return item_type in self._members
+        return (item_type, metadata) in self._specific
+
+    def match(self, item_type: str, metadata: int, clobber_logs=True) -> Optional[str]:
+        """See get_unique_matching_item_list_id."""
+        assert metadata is not None
+        if clobber_logs and item_type == "log2" and self._log2_matches_log:
+            item_type = "log"
+
+        specific = self._specific.get((item_type, metadata))
+        if item_type in self._members:
+            if specific is not None:
+                raise ValueError(f"Multiple item identifiers match with {(item_type, metadata)}")
+            return item_type
+        return specific
+
+    def match_many(
+            self,
+            items: Iterable[Tuple[str, int]],
+            clobber_logs=True,
+    ) -> List[Optional[str]]:
+        """Matches a batch of (item_type, metadata) pairs, e.g. every stack of an inventory."""
+        match = self.match
+        return [match(item_type, metadata, clobber_logs) for item_type, metadata in items]
+
+
+def _item_list_index(item_list: Union[Sequence[str], ItemListIndex]) -> ItemListIndex:
+    return item_list if isinstance(item_list, ItemListIndex) else ItemListIndex(item_list)
+
+
 def item_list_contains(
-        item_list: Sequence[str],
+        item_list: Union[Sequence[str], ItemListIndex],
         item_type: str,
         metadata: Optional[str]
 ):
     # log clobber not supported here. (Only used by handlers without log clobber so far).
+    if isinstance(item_list, ItemListIndex):
+        return item_list.contains(item_type, metadata)
     if metadata is None:
         return item_type in item_list
     else:
@@ -63,7 +135,7 @@ def item_list_contains(
 
 
 def get_unique_matching_item_list_id(
-        item_list: Sequence[str],
+        item_list: Union[Sequence[str], ItemListIndex],
         item_type: str,
         metadata: int,
         clobber_logs=True,
@@ -76,7 +148,8 @@ def get_unique_matching_item_list_id(
     not have overlapping item identifiers.
     Args:
         item_list: A list of item identifiers. Either just the item type ("wooden_pickaxe")
-            or the item type with a metadata requirement ("planks#2").
+            or the item type with a metadata requirement ("planks#2"). Pass an ItemListIndex
+            of the list when matching against it repeatedly.
         item_type: The item type to search for.
         metadata: The metadata to search for.
         clobber_logs: If True, and the only ID in `item_list` starting with "log.*" is the
@@ -88,27 +161,7 @@ def get_unique_matching_item_list_id(
             behavior could be adding a special type "log*" type which matches both "log"
             and "log2".
     """
-    assert metadata is not None
-    if clobber_logs and item_type == "log2":
-        log_start = [x for x in item_list if x.startswith("log")]
-        if len(log_start) == 1 and log_start[0] == "log":
-            item_type = "log"
-
-    result = None
-    matches = 0
-    if item_type in item_list:
-        result = item_type
-        matches += 1
-
-    key = encode_item_with_metadata(item_type, metadata)
-    if key in item_list:
-        result = key
-        matches += 1
-
-    if matches > 1:
-        raise ValueError(f"Multiple item identifiers match with {(item_type, metadata)}")
-
-    return result
+    return _item_list_index(item_list).match(item_type, metadata, clobber_logs)
 
 
 def inventory_start_spec_to_item_ids(inv_spec: Sequence[dict]) -> List[str]:
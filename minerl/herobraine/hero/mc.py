@@ -1,8 +1,11 @@
 # Copyright (c) 2020 All Rights Reserved
 # Author: William H. Guss, Brandon Houghton
 
+import hashlib
 import json
 import os
+import tempfile
+import zipfile
 import numpy as np
 
 SIMPLE_KEYBOARD_ACTION = [
@@ -505,6 +508,9 @@ MAX_FOOD_SATURATION = 20.0  # Current max saturation limit as of 1.11.2
 MAX_SCORE = 0x7FFFFF  # Implemented as XP in survival but can change e.g. mini-games
 
 
+_MC_ITEM_ID_INDEX = {item: i for i, item in enumerate(MC_ITEM_IDS)}
+
+
 def get_item_id(item: str) -> int:
     """
     Gets the item ID of an MC item.
@@ -514,7 +520,10 @@ def get_item_id(item: str) -> int:
     if not item.startswith("minecraft:"):
         item = "minecraft:" + item
 
-    return MC_ITEM_IDS.index(item)
+    try:
+        return _MC_ITEM_ID_INDEX[item]
+    except KeyError:
+        raise ValueError("{} is not in list".format(item)) from None
 
 
 def get_key_from_id(id: str) -> str:
@@ -530,38 +539,265 @@ def get_key_from_id(id: str) -> str:
 mc_constants_file = os.path.join(
     os.path.dirname(os.path.abspath(__file__)), "mc_constants.1.16.json"
 )
-all_data = json.load(open(mc_constants_file))
-
-ALL_ITEMS = [item["type"] for item in all_data["items"]]
-ALL_STATS = [stat["statID"] for stat in all_data["stats"]]
-ALL_STAT_KEYS = [stat["minerl_keys"] for stat in all_data["stats"]]
+# A compiled copy of the item and stat tables of mc_constants_file, which loads much faster.
+# It is written when the package is built (see setup.py), or else next to the JSON on first
+# use where the package directory is writable.
+mc_constants_cache_file = os.path.splitext(mc_constants_file)[0] + ".npz"
 
 # We choose these not to be included by default; they are not items.
 NONE = "none"
 INVALID = "invalid"
 
-# TODO remove hack based on ordering in MineRL
-MINERL_ITEM_MAP = sorted(["none"] + ALL_ITEMS)
-
-ITEMS_BY_CATEGORY = {
-    # Items which take 2 seconds to USE
-    'edible': [item['type'] for item in all_data['items'] if item['useAction'] in {'EAT', 'DRINK'}],
-    # Items which have ongoing effect when equipped (includes armor)
-    'tool': [], # [item['type'] for item in all_data['items'] if item['tab'] in {'tools', 'combat'}],
-    # Items which are used for building
-    'building_block': [], # [item['type'] for item in all_data['items'] if item['tab'] in {'buildingBlock'}],
-    # Redstone items (doors, buttons, levers)
-    'redstone': [], # [item['type'] for item in all_data['items'] if item['tab'] in {'redstone'}],
-    # Brewing items
-    'brewing': [], # [item['type'] for item in all_data['items'] if item['tab'] in {'brewing'}],
-    # Decoration items (includes torch)
-    'decoration': [], # [item['type'] for item in all_data['items'] if item['tab'] in {'decoration'}]
+
+class ItemRegistry(object):
+    """An immutable index over a list of item names and a list of stat key paths.
+
+    Maps item names to their dense id (their position in the list) and stat key paths
+    to their column, and looks up whole batches of names at once with numpy.
+
+    Args:
+        items (Sequence[str]): The item names, in id order.
+        stat_keys (Sequence[Sequence[str]], optional): The stat key paths, in column order.
+    """
+
+    __slots__ = ('items', 'stat_keys', '_item_ids', '_stat_columns', '_sorted_items', '_sorted_item_ids')
+
+    def __init__(self, items, stat_keys=()):
+        items = tuple(items)
+        stat_keys = tuple(tuple(keys) for keys in stat_keys)
+        item_ids = {}
+        for i, item in enumerate(items):
+            item_ids.setdefault(item, i)
+        order = np.argsort(np.array(items, dtype=str), kind='stable')
+
+        object.__setattr__(self, 'items', items)
+        object.__setattr__(self, 'stat_keys', stat_keys)
+        object.__setattr__(self, '_item_ids', item_ids)
+        object.__setattr__(self, '_stat_columns', {keys: i for i, keys in enumerate(stat_keys)})
+        object.__setattr__(self, '_sorted_items', np.array(items, dtype=str)[order])
+        object.__setattr__(self, '_sorted_item_ids', order.astype(np.int64))
+        self._sorted_items.flags.writeable = False
+        self._sorted_item_ids.flags.writeable = False
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ItemRegistry is immutable")
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __contains__(self, item):
+        return item in self._item_ids
+
+    def item_id(self, item: str) -> int:
+        """Gets the dense id of an item, raising a KeyError for unknown items."""
+        return self._item_ids[item]
+
+    def get_item_id(self, item: str, default: int = -1) -> int:
+        return self._item_ids.get(item, default)
+
+    def item_ids(self, items, default: int = -1) -> np.ndarray:
+        """Gets the dense ids of a batch of item names.
+
+        Args:
+            items (Sequence[str] or np.ndarray): The item names.
+            default (int, optional): The id of unknown items. Defaults to -1.
+
+        Returns:
+            np.ndarray: An int64 array of ids, shaped like items.
+        """
+        items = np.asarray(items, dtype=str)
+        if not len(self.items):
+            return np.full(items.shape, default, dtype=np.int64)
+        positions = np.searchsorted(self._sorted_items, items)
+        positions = np.minimum(positions, len(self._sorted_items) - 1)
+        found = self._sorted_items[positions] == items
+        return np.where(found, self._sorted_item_ids[positions], default)
+
+    def item_names(self, ids) -> np.ndarray:
+        """Gets the names of a batch of dense item ids."""
+        return np.array(self.items, dtype=str)[np.asarray(ids)]
+
+    def stat_column(self, keys) -> int:
+        """Gets the column of a stat key path, raising a KeyError for unknown stats."""
+        return self._stat_columns[tuple(keys)]
+
+    def get_stat_column(self, keys, default: int = -1) -> int:
+        return self._stat_columns.get(tuple(keys), default)
+
+    def __eq__(self, other):
+        return isinstance(other, ItemRegistry) and (self.items, self.stat_keys) == (other.items, other.stat_keys)
+
+    def __hash__(self):
+        return hash((self.items, self.stat_keys))
+
+    def __reduce__(self):
+        return ItemRegistry, (self.items, self.stat_keys)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return "ItemRegistry({} items, {} stats)".format(len(self.items), len(self.stat_keys))
+
+
+_item_tables = None
+
+
+def _compile_item_tables(source: bytes):
+    data = json.loads(source)
+    return dict(
+        source_sha1=np.array(hashlib.sha1(source).hexdigest()),
+        items=np.array([item["type"] for item in data["items"]], dtype=str),
+        use_actions=np.array([item["useAction"] for item in data["items"]], dtype=str),
+        max_use_durations=np.array([item["maxUseDuration"] for item in data["items"]], dtype=np.int64),
+        best_equipment_slots=np.array([item["bestEquipmentSlot"] for item in data["items"]], dtype=str),
+        stats=np.array([stat["statID"] for stat in data["stats"]], dtype=str),
+        stat_keys=np.array(['\x1f'.join(stat["minerl_keys"]) for stat in data["stats"]], dtype=str),
+    )
+
+
+def write_item_tables_cache(tables=None) -> None:
+    """Writes mc_constants_cache_file, e.g. when the package is built.
+
+    The file is written under a temporary name and then moved into place, so that
+    processes loading it concurrently never see it partially written.
+    """
+    if tables is None:
+        with open(mc_constants_file, 'rb') as fh:
+            tables = _compile_item_tables(fh.read())
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=os.path.basename(mc_constants_cache_file), suffix='.tmp', dir=os.path.dirname(mc_constants_cache_file))
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            np.savez(fh, **tables)
+        # mkstemp makes the file private to its owner.
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, mc_constants_cache_file)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _load_item_tables():
+    """Loads the item and stat tables of mc_constants_file, preferably from its compiled cache."""
+    global _item_tables
+    if _item_tables is not None:
+        return _item_tables
+
+    # The cache is checked against the contents of the JSON, since installers don't keep mtimes.
+    with open(mc_constants_file, 'rb') as fh:
+        source = fh.read()
+    try:
+        with np.load(mc_constants_cache_file) as cache:
+            if str(cache['source_sha1']) == hashlib.sha1(source).hexdigest():
+                _item_tables = {k: cache[k] for k in cache.files}
+    except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile):
+        pass
+
+    if _item_tables is None:
+        _item_tables = _compile_item_tables(source)
+        try:
+            write_item_tables_cache(_item_tables)
+        except OSError:
+            # e.g. a read-only install; the JSON is used every time instead.
+            pass
+    return _item_tables
+
+
+_item_registry = None
+
+
+def item_registry() -> ItemRegistry:
+    """Gets the ItemRegistry of all Minecraft items and stats (ALL_ITEMS and ALL_STAT_KEYS)."""
+    global _item_registry
+    if _item_registry is None:
+        tables = _load_item_tables()
+        _item_registry = ItemRegistry(
+            tables['items'].tolist(), [keys.split('\x1f') for keys in tables['stat_keys'].tolist()])
+    return _item_registry
+
+
+def _load_all_data():
+    with open(mc_constants_file) as fh:
+        return json.load(fh)
+
+
+def _edible(tables):
+    return np.isin(tables['use_actions'], ['EAT', 'DRINK'])
+
+
+def _items_by_category():
+    return {
+        # Items which take 2 seconds to USE
+        'edible': _load_item_tables()['items'][_edible(_load_item_tables())].tolist(),
+        # Items which have ongoing effect when equipped (includes armor)
+        'tool': [],  # [item['type'] for item in all_data['items'] if item['tab'] in {'tools', 'combat'}],
+        # Items which are used for building
+        'building_block': [],  # [item['type'] for item in all_data['items'] if item['tab'] in {'buildingBlock'}],
+        # Redstone items (doors, buttons, levers)
+        'redstone': [],  # [item['type'] for item in all_data['items'] if item['tab'] in {'redstone'}],
+        # Brewing items
+        'brewing': [],  # [item['type'] for item in all_data['items'] if item['tab'] in {'brewing'}],
+        # Decoration items (includes torch)
+        'decoration': [],  # [item['type'] for item in all_data['items'] if item['tab'] in {'decoration'}]
+    }
+
+
+def _use_times():
+    # Check that all edible items have the same maxUseDuration
+    tables = _load_item_tables()
+    return set(tables['max_use_durations'][_edible(tables)].tolist())
+    # assert len(use_times) == 1, "Edible items with multiple different eating times."
+    # EDIBLE_USE_TICKS = use_times.pop()
+
+
+def _best_items_per_equipment_slot():
+    tables = _load_item_tables()
+    return {
+        equip: tables['items'][tables['best_equipment_slots'] == equip].tolist() for equip in EQUIPMENT_SLOTS
+    }
+
+
+def _recipe_items(recipes_by_output, accept):
+    return [
+        "none",  # empty inventory slot (for obs); take no action (for actions).
+        "invalid",  # item not in the list
+    ] + [
+        item for item in item_registry().items
+        if len(recipes_by_output.get(item, [])) > 0 and accept(recipes_by_output[item])
+    ]
+
+
+# The constants derived from mc_constants_file are computed on first access.
+_LAZY_CONSTANTS = {
+    'all_data': _load_all_data,
+    'ALL_ITEMS': lambda: list(item_registry().items),
+    'ALL_STATS': lambda: _load_item_tables()['stats'].tolist(),
+    'ALL_STAT_KEYS': lambda: [list(keys) for keys in item_registry().stat_keys],
+    # TODO remove hack based on ordering in MineRL
+    'MINERL_ITEM_MAP': lambda: sorted(["none"] + list(item_registry().items)),
+    'ITEMS_BY_CATEGORY': _items_by_category,
+    'use_times': _use_times,
+    'BEST_ITEMS_PER_EQUIPMENT_SLOT': _best_items_per_equipment_slot,
+    'ALL_PERSONAL_CRAFTING_ITEMS': lambda: _recipe_items(CRAFTING_RECIPES_BY_OUTPUT, lambda recipes: all(
+        [recipe["recipeSize"] in [0, 1, 2, 4] for recipe in recipes])),  # TODO recipeSize needs to be 2D
+    'ALL_CRAFTING_TABLE_ITEMS': lambda: _recipe_items(CRAFTING_RECIPES_BY_OUTPUT, lambda recipes: any(
+        [recipe["recipeSize"] <= 9 for recipe in recipes])),
+    'ALL_SMELTING_ITEMS': lambda: _recipe_items(SMELTING_RECIPES_BY_OUTPUT, lambda recipes: True),
 }
 
-# Check that all edible items have the same maxUseDuration
-use_times = {item['maxUseDuration'] for item in all_data['items'] if item['useAction'] in {'EAT', 'DRINK'}}
-# assert len(use_times) == 1, "Edible items with multiple different eating times."
-# EDIBLE_USE_TICKS = use_times.pop()
+
+def __getattr__(name):
+    if name in _LAZY_CONSTANTS:
+        value = globals()[name] = _LAZY_CONSTANTS[name]()
+        return value
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 
 def recursive_dict_eq(d1, d2):
@@ -594,7 +830,7 @@ def dedup_list(dicts):
 
 
 def sort_recipes_by_output(json):
-    result = {item: [] for item in ALL_ITEMS}
+    result = {item: [] for item in item_registry().items}
     for recipe in json:
         if len(recipe["ingredients"]) == 0:
             # Empty recipe
@@ -611,48 +847,6 @@ def sort_recipes_by_output(json):
 CRAFTING_RECIPES_BY_OUTPUT = {} # sort_recipes_by_output(all_data["craftingRecipes"])
 SMELTING_RECIPES_BY_OUTPUT = {} # sort_recipes_by_output(all_data["smeltingRecipes"])
 
-ALL_PERSONAL_CRAFTING_ITEMS = [
-                                  "none",  # empty inventory slot (for obs); take no action (for actions).
-                                  "invalid",  # item not in the list
-                              ] + [
-                                  item["type"]
-                                  for item in all_data["items"]
-                                  if item["type"] in CRAFTING_RECIPES_BY_OUTPUT.keys()
-                                     and len(CRAFTING_RECIPES_BY_OUTPUT[item["type"]]) > 0
-                                     and all(
-        [
-            recipe["recipeSize"] in [0, 1, 2, 4]  # TODO recipeSize needs to be 2D
-            for recipe in CRAFTING_RECIPES_BY_OUTPUT[item["type"]]
-        ]
-    )
-                              ]
-
-ALL_CRAFTING_TABLE_ITEMS = [
-                               "none",  # empty inventory slot (for obs); take no action (for actions).
-                               "invalid",  # item not in the list
-                           ] + [
-                               item["type"]
-                               for item in all_data["items"]
-                               if item["type"] in CRAFTING_RECIPES_BY_OUTPUT.keys()
-                                  and len(CRAFTING_RECIPES_BY_OUTPUT[item["type"]]) > 0
-                                  and any(
-        [
-            recipe["recipeSize"] <= 9
-            for recipe in CRAFTING_RECIPES_BY_OUTPUT[item["type"]]
-        ]
-    )
-                           ]
-
-ALL_SMELTING_ITEMS = [
-                         "none",  # empty inventory slot (for obs); take no action (for actions).
-                         "invalid",  # item not in the list
-                     ] + [
-                         item["type"]
-                         for item in all_data["items"]
-                         if item["type"] in SMELTING_RECIPES_BY_OUTPUT.keys()
-                            and len(SMELTING_RECIPES_BY_OUTPUT[item["type"]]) > 0
-                     ]
-
 EQUIPMENT_SLOTS = [
     "mainhand",
     "offhand",
@@ -662,11 +856,6 @@ EQUIPMENT_SLOTS = [
     "head",
 ]
 
-BEST_ITEMS_PER_EQUIPMENT_SLOT = {
-    equip: [item["type"] for item in all_data["items"] if item["bestEquipmentSlot"] == equip] for equip in EQUIPMENT_SLOTS
-}
-
-
 MS_PER_STEP = 50
 STEPS_PER_MS = 1 / 50
 
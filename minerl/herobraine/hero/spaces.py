@@ -20,6 +20,8 @@ import collections
 import warnings
 import abc
 
+from minerl.herobraine.hero.mc import ItemRegistry
+
 
 class MineRLSpace(abc.ABC, gym.Space):
     """
@@ -302,13 +304,23 @@ class Enum(Discrete, MineRLSpace):
         return len(self.values)
 
     def contains(self, x):
-        return x in self.values
+        try:
+            return x in self.value_map
+        except TypeError:
+            # Unhashable, e.g. an array of values.
+            return x in self.values
 
     __contains__ = contains
 
 
 # TODO: Vectorize containment?
 class Dict(gym.spaces.Dict, MineRLSpace):
+    def contains(self, x):
+        # e.g. LazyObservations
+        if isinstance(x, collections.abc.Mapping) and not isinstance(x, dict):
+            x = dict(x)
+        return super().contains(x)
+
     def no_op(self, batch_shape=()):
         return OrderedDict([(k, space.no_op(batch_shape=batch_shape)) for k, space in self.spaces.items()])
 
@@ -552,3 +564,118 @@ class DiscreteRange(Discrete):
 
     def __eq__(self, other):
         return self.n == other.n and self.begin == other.begin
+
+
+class InventoryCounts(collections.abc.Mapping):
+    """A read-only item name -> count mapping backed by a single int32 array.
+
+    This is the value of an Inventory space. Learners and wrappers can take the counts
+    array directly; the mapping interface keeps obs['inventory'][item] working.
+
+    Args:
+        counts (np.ndarray): The counts, shaped batch_shape + (len(item_index),).
+        item_index (ItemRegistry): Maps item names to their position in counts.
+    """
+
+    __slots__ = ('counts', 'item_index')
+
+    def __init__(self, counts: np.ndarray, item_index: ItemRegistry):
+        self.counts = counts
+        self.item_index = item_index
+
+    def __getitem__(self, item):
+        return self.counts[..., self.item_index.item_id(item)]
+
+    def __iter__(self):
+        return iter(self.item_index.items)
+
+    def __len__(self):
+        return len(self.item_index)
+
+    def __contains__(self, item):
+        return item in self.item_index
+
+    def to_dict(self) -> OrderedDict:
+        """Converts to the item -> np.ndarray dict used before inventories were array backed."""
+        return OrderedDict((item, np.array(self.counts[..., i])) for i, item in enumerate(self.item_index.items))
+
+    def __eq__(self, other):
+        if isinstance(other, InventoryCounts):
+            return self.item_index == other.item_index and np.array_equal(self.counts, other.counts)
+        return collections.abc.Mapping.__eq__(self, other)
+
+    __hash__ = None
+
+    def __copy__(self):
+        return InventoryCounts(self.counts, self.item_index)
+
+    def __deepcopy__(self, memo):
+        # The item index is immutable; only the counts need copying.
+        return InventoryCounts(self.counts.copy(), self.item_index)
+
+    def __reduce__(self):
+        return InventoryCounts, (self.counts, self.item_index)
+
+    def __repr__(self):
+        return "InventoryCounts({})".format(
+            {item: self.counts[..., i].tolist() for i, item in enumerate(self.item_index.items)
+             if self.counts[..., i].any()})
+
+
+class Inventory(Dict):
+    """The space of item counts of an inventory.
+
+    It is a Dict of one Box per item, so it can be used wherever the Dict is, but its
+    values are InventoryCounts and it maps, unmaps and samples all items at once.
+
+    Args:
+        items (List[str]): The item names, in the order of the counts array.
+        high (int, optional): The maximum count of an item. Defaults to 2304 (36 stacks of 64).
+    """
+
+    def __init__(self, items: List[str], high: int = 2304):
+        items = list(dict.fromkeys(items))
+        self.item_index = ItemRegistry(items)
+        self.high = high
+        self.max_log = np.log(1 + high)
+        # All items share one (immutable) Box.
+        self._box = Box(low=0, high=high, shape=(), dtype=np.int32, normalizer_scale='log')
+        super().__init__(spaces=OrderedDict((item, self._box) for item in items))
+
+    def no_op(self, batch_shape=()):
+        return InventoryCounts(
+            np.zeros(tuple(batch_shape) + (len(self.item_index),), dtype=np.int32), self.item_index)
+
+    def sample(self, bs=None):
+        bdim = () if bs is None else (bs,)
+        # Sampled like the Boxes, whose shared generator is the one Dict.seed seeds.
+        counts = self._box.np_random.uniform(low=0, high=self.high + 1, size=bdim + (len(self.item_index),))
+        return InventoryCounts(counts.astype(np.int32), self.item_index)
+
+    def contains(self, x):
+        if isinstance(x, InventoryCounts):
+            return (
+                x.item_index == self.item_index
+                and x.counts.shape == (len(self.item_index),)
+                and np.issubdtype(x.counts.dtype, np.integer)
+                and bool(np.all((x.counts >= 0) & (x.counts <= self.high)))
+            )
+        return super().contains(x)
+
+    __contains__ = contains
+
+    def flat_map(self, x):
+        if not isinstance(x, InventoryCounts):
+            return super().flat_map(x)
+        # The same log normalization as each of the Boxes, for all items at once.
+        return np.log(x.counts.astype(np.float64) + 1) / self.max_log - Box.CENTER
+
+    def unmap(self, x, skip=False):
+        counts = np.exp((x + Box.CENTER) * self.max_log) - 1
+        return InventoryCounts(np.round(counts).astype(np.int32), self.item_index)
+
+    def unmap_mixed(self, x, aux):
+        return self.unmap(x)
+
+    def __repr__(self):
+        return "Inventory({} items, high={})".format(len(self.item_index), self.high)
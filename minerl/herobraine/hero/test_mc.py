@@ -0,0 +1,56 @@
+import copy
+import json
+
+import numpy as np
+import pytest
+
+import minerl.herobraine.hero.mc as mc
+
+
+def test_item_registry_matches_the_constants_json():
+    with open(mc.mc_constants_file) as fh:
+        data = json.load(fh)
+    registry = mc.item_registry()
+
+    assert list(registry.items) == [item["type"] for item in data["items"]] == mc.ALL_ITEMS
+    assert [list(keys) for keys in registry.stat_keys] == [stat["minerl_keys"] for stat in data["stats"]]
+    assert mc.ALL_STAT_KEYS == [stat["minerl_keys"] for stat in data["stats"]]
+    assert registry.item_id('diamond') == mc.ALL_ITEMS.index('diamond')
+    assert registry.stat_column(['mine_block', 'dirt']) == mc.ALL_STATS.index('mine_block.dirt')
+    assert 'diamond' in registry and 'other' not in registry
+
+
+def test_item_registry_batch_lookup():
+    registry = mc.ItemRegistry(['none', 'log', 'dirt', 'other', 'log'])
+    names = np.array([['dirt', 'unknown'], ['log', 'none']])
+
+    np.testing.assert_array_equal(registry.item_ids(names), [[2, -1], [1, 0]])
+    np.testing.assert_array_equal(registry.item_ids([], default=7), np.zeros(0))
+    np.testing.assert_array_equal(registry.item_names([3, 2]), ['other', 'dirt'])
+    assert registry.get_item_id('unknown', default=-2) == -2
+    with pytest.raises(AttributeError):
+        registry.items = ()
+    assert copy.deepcopy(registry) == registry
+
+
+def test_get_item_id():
+    assert mc.get_item_id('acacia_boat') == mc.get_item_id('minecraft:acacia_boat') == 0
+    with pytest.raises(ValueError):
+        mc.get_item_id('not_an_item')
+
+
+def test_item_tables_cache_is_rebuilt_when_unreadable(tmp_path, monkeypatch):
+    cache_file = str(tmp_path / "mc_constants.1.16.npz")
+    monkeypatch.setattr(mc, 'mc_constants_cache_file', cache_file)
+    with open(cache_file, 'wb') as fh:
+        fh.write(b'PK\x03\x04 partially written')
+
+    monkeypatch.setattr(mc, '_item_tables', None)
+    items = mc._load_item_tables()['items']
+    assert list(items) == list(mc.item_registry().items)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["mc_constants.1.16.npz"]
+
+    monkeypatch.setattr(mc, '_item_tables', None)
+    with np.load(cache_file) as cache:
+        assert list(cache['items']) == list(items)
+    assert list(mc._load_item_tables()['items']) == list(items)
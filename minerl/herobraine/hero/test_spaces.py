@@ -6,7 +6,7 @@
 
 
 # Test that unmap composed with flat_map returns the original value
-from minerl.herobraine.hero.spaces import Box, Dict, Discrete, MultiDiscrete, Enum
+from minerl.herobraine.hero.spaces import Box, Dict, Discrete, MultiDiscrete, Enum, Inventory, InventoryCounts
 import collections
 import numpy as np
 
@@ -154,3 +154,23 @@ def test_all_flat_map_nested_dict():
     })
     x = all_spaces.sample()
     assert_equal_recursive(all_spaces.unmap(all_spaces.flat_map(x)), x)
+
+
+# Tests that the array backed Inventory maps like the Dict of per item Boxes it replaces
+def test_inventory_matches_dict_of_boxes():
+    items = ['air', 'dirt', 'log', 'stone']
+    inventory = Inventory(items)
+    boxes = Dict(collections.OrderedDict(
+        (item, Box(low=0, high=2304, shape=(), dtype=np.int32, normalizer_scale='log')) for item in items))
+
+    x = inventory.sample(bs=8)
+    assert isinstance(x, InventoryCounts) and x.counts.shape == (8, 4)
+    assert x['dirt'].shape == (8,) and list(x) == items
+    assert np.allclose(inventory.flat_map(x), boxes.flat_map(x.to_dict()))
+    assert np.allclose(inventory.flat_map(x.to_dict()), boxes.flat_map(x.to_dict()))
+    assert inventory.unmap(inventory.flat_map(x)) == x
+
+    single = inventory.no_op()
+    assert single in inventory and single.to_dict() in inventory
+    assert single == {item: 0 for item in items}
+    assert Dict({'inventory': inventory}).flat_map({'inventory': single}).shape == (4,)
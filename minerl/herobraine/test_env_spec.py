@@ -38,3 +38,65 @@ class TestSpec(EnvSpec):
 #     Tests the env_spec to xml.
 #     """
 #     assert False, "test not written yet." # TODO: (@wguss)
+
+
+def test_action_encoder_matches_to_hero():
+    import numpy as np
+    from minerl.herobraine.env_specs.human_survival_specs import HumanSurvival
+    spec = HumanSurvival()
+    encoder = spec.compile_action_encoder()
+
+    for action in [spec.action_space.no_op(), spec.action_space.sample()]:
+        action['camera'] = np.array([1.5, -2.0], dtype=np.float32)
+        expected = "\n".join([h.to_hero(action[h.to_string()]) for h in spec.actionables])
+        assert encoder(action) == expected.encode()
+
+    array = np.zeros(encoder.array_size)
+    array[-2:] = [1.5, -2.0]
+    assert encoder.encode_array(array) == encoder(encoder.array_to_action(array))
+    assert b"camera 1.5 -2.0" in encoder.encode_array(array)
+
+
+def test_mission_xml_without_mutator_matches_xmltodict_round_trip():
+    from lxml import etree
+    from minerl.herobraine.env_specs.navigate_specs import Navigate
+    env = Navigate(dense=True, extreme=False, agent_count=2).make(fake=True)
+    env.task.reset()
+    cached = env._setup_agent_xmls('episode')
+    env._xml_mutator_to_be_deprecated = lambda xml_dict: xml_dict
+    round_tripped = env._setup_agent_xmls('episode')
+
+    parser = etree.XMLParser(remove_blank_text=True, remove_comments=True)
+
+    def normalize(tree):
+        tree = etree.fromstring(etree.tostring(tree), parser)
+        for element in tree.iter():
+            element.text = element.text.strip() if element.text else element.text
+            element.tail = None
+        return etree.tostring(tree, method='c14n')
+
+    assert [normalize(t) for t in cached] == [normalize(t) for t in round_tripped]
+    assert env.task.to_xml() == etree.tostring(env.task.to_xml_etree(), pretty_print=True).decode()
+
+
+def test_reset_only_rebuilds_episodic_handlers():
+    from minerl.herobraine.env_specs.human_survival_specs import HumanSurvival
+    from minerl.herobraine.env_specs.navigate_specs import Navigate
+    spec = HumanSurvival()
+    observables, observation_space = spec.observables, spec.observation_space
+    agent_start = spec.agent_start
+    spec.reset()
+
+    assert spec.observables is observables and spec.observation_space is observation_space
+    assert spec.agent_start is not agent_start
+    env = spec.make(fake=True)
+    decoder = env._observation_decoder
+    env.task.reset()
+    env._setup_spaces()
+    assert env._observation_decoder is decoder
+
+    spec = Navigate(dense=True, extreme=False)
+    reward = next(r for r in spec.rewardables if hasattr(r, 'fired'))
+    reward.fired = {block: True for block in reward.fired}
+    spec.reset()
+    assert any(r is reward for r in spec.rewardables) and not any(reward.fired.values())
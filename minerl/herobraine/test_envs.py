@@ -0,0 +1,36 @@
+import subprocess
+import sys
+
+import gym
+
+# Importing minerl should only register the envs; the specs and heavy dependencies are
+# loaded on first use.
+DEFERRED_MODULES = [
+    'minerl.herobraine.env_spec', 'minerl.herobraine.hero.mc', 'minerl.env._multiagent',
+    'lxml', 'jinja2', 'xmltodict', 'Pyro4', 'psutil',
+]
+
+IMPORT_BENCHMARK = """
+import sys, time
+import gym
+start = time.perf_counter()
+import minerl
+print(time.perf_counter() - start)
+print(' '.join(m for m in {} if m in sys.modules))
+""".format(DEFERRED_MODULES)
+
+
+def test_import_minerl_defers_specs_and_heavy_dependencies():
+    output = subprocess.check_output([sys.executable, '-c', IMPORT_BENCHMARK], stderr=subprocess.DEVNULL)
+    seconds, loaded = output.decode().split('\n')[:2]
+    assert loaded == ''
+    # Constructing the env specs at import used to take well over a second on its own.
+    assert float(seconds) < 0.5
+
+
+def test_env_spec_is_constructed_on_first_make():
+    import minerl.herobraine.envs as envs
+    env = gym.make('MineRLNavigateDense-v0')
+    assert env.unwrapped.task is envs.MINERL_NAVIGATE_DENSE_V0
+    assert env.spec.max_episode_steps == 6000 == gym.spec('MineRLNavigateDense-v0').max_episode_steps
+    assert [spec.name for spec in envs.ENVS][0] == 'MineRLTreechop-v0'
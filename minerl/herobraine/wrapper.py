@@ -5,7 +5,7 @@ import abc
 import copy
 from collections import OrderedDict
 
-from minerl.herobraine.env_spec import EnvSpec
+from minerl.herobraine.env_spec import ActionEncoder, EnvSpec, ObservationDecoder
 import minerl
 
 
@@ -24,6 +24,10 @@ class EnvWrapper(EnvSpec):
                          max_episode_steps=env_to_wrap.max_episode_steps,
                          reward_threshold=env_to_wrap.reward_threshold)
 
+    @property
+    def EPISODIC_FACTORIES(self):
+        return self.env_to_wrap.EPISODIC_FACTORIES
+
     @abc.abstractmethod
     def _update_name(self, name: str) -> str:
         pass
@@ -93,6 +97,18 @@ class EnvWrapper(EnvSpec):
 
         return act
 
+    def compile_observation_decoder(self) -> ObservationDecoder:
+        bottom_env_spec = self.env_to_wrap
+        while isinstance(bottom_env_spec, EnvWrapper):
+            bottom_env_spec = bottom_env_spec.env_to_wrap
+        return ObservationDecoder(bottom_env_spec.observables, self.monitors, self.wrap_observation)
+
+    def compile_action_encoder(self) -> ActionEncoder:
+        bottom_env_spec = self.env_to_wrap
+        while isinstance(bottom_env_spec, EnvWrapper):
+            bottom_env_spec = bottom_env_spec.env_to_wrap
+        return ActionEncoder(bottom_env_spec.actionables, self.unwrap_action)
+
     def determine_success_from_rewards(self, rewards: list) -> bool:
         return self.env_to_wrap.determine_success_from_rewards(rewards)
 
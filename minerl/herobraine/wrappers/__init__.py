@@ -3,3 +3,4 @@
 
 from minerl.herobraine.wrappers.obfuscation_wrapper import Obfuscated
 from minerl.herobraine.wrappers.vector_wrapper import Vectorized
+from minerl.herobraine.wrappers.preprocessing import Preprocessed
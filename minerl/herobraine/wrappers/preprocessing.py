@@ -0,0 +1,192 @@
+# Copyright (c) 2020 All Rights Reserved
+# Author: William H. Guss, Brandon Houghton
+
+import copy
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from minerl.herobraine.env_spec import EnvSpec
+from minerl.herobraine.hero import spaces
+from minerl.herobraine.wrapper import EnvWrapper
+
+
+class PreprocessingStage(object):
+    """A step of a Preprocessing pipeline, mapping a frame to a frame.
+
+    Stages take (height, width, channels) frames unless they follow ChannelsFirst.
+    """
+
+    def output_space(self, space: spaces.Box) -> spaces.Box:
+        """The space of the frames this stage outputs for frames in space."""
+        raise NotImplementedError()
+
+    def __call__(self, frame: np.ndarray) -> np.ndarray:
+        raise NotImplementedError()
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, ", ".join(
+            "{}={!r}".format(k, v) for k, v in self.__dict__.items()))
+
+
+def _box(space: spaces.Box, shape, low=None, high=None, dtype=None) -> spaces.Box:
+    low = np.min(space.low) if low is None else low
+    high = np.max(space.high) if high is None else high
+    return spaces.Box(low=low, high=high, shape=tuple(shape), dtype=space.dtype if dtype is None else dtype)
+
+
+class Crop(PreprocessingStage):
+    """Crops height x width pixels starting at (top, left)."""
+
+    def __init__(self, top: int, left: int, height: int, width: int):
+        self.top, self.left, self.height, self.width = top, left, height, width
+
+    def output_space(self, space):
+        assert self.top + self.height <= space.shape[0] and self.left + self.width <= space.shape[1], \
+            "{} is out of the bounds of {} frames".format(self, space.shape)
+        return _box(space, (self.height, self.width) + space.shape[2:])
+
+    def __call__(self, frame):
+        return frame[self.top:self.top + self.height, self.left:self.left + self.width]
+
+
+class Resize(PreprocessingStage):
+    """Resizes to width x height, by default with area interpolation (averaging the
+    pixels covered by each output pixel when downscaling)."""
+
+    def __init__(self, width: int, height: int, interpolation=cv2.INTER_AREA):
+        self.width, self.height, self.interpolation = width, height, interpolation
+
+    def output_space(self, space):
+        return _box(space, (self.height, self.width) + space.shape[2:])
+
+    def __call__(self, frame):
+        resized = cv2.resize(frame, (self.width, self.height), interpolation=self.interpolation)
+        # cv2 drops a single channel axis.
+        return resized.reshape((self.height, self.width) + frame.shape[2:])
+
+
+class Grayscale(PreprocessingStage):
+    """Converts RGB frames to a single luminance channel."""
+
+    def output_space(self, space):
+        assert space.shape[2:] == (3,), "Grayscale takes RGB frames, not {}".format(space.shape)
+        return _box(space, space.shape[:2] + (1,))
+
+    def __call__(self, frame):
+        return cv2.cvtColor(np.ascontiguousarray(frame), cv2.COLOR_RGB2GRAY)[:, :, None]
+
+
+class ChannelsFirst(PreprocessingStage):
+    """Reorders frames to (channels, height, width). Only AsType can follow it."""
+
+    def output_space(self, space):
+        return _box(space, (space.shape[2],) + space.shape[:2])
+
+    def __call__(self, frame):
+        return np.ascontiguousarray(frame.transpose(2, 0, 1))
+
+
+class AsType(PreprocessingStage):
+    """Converts to dtype, multiplying by scale on the way (e.g. 1 / 255 for [0, 1] floats)."""
+
+    def __init__(self, dtype=np.float32, scale: float = 1.0):
+        self.dtype, self.scale = np.dtype(dtype), scale
+
+    def output_space(self, space):
+        return _box(space, space.shape, low=np.min(space.low) * self.scale, high=np.max(space.high) * self.scale,
+                    dtype=self.dtype)
+
+    def __call__(self, frame):
+        if self.scale == 1.0:
+            return frame.astype(self.dtype)
+        return np.multiply(frame, self.scale, dtype=self.dtype, casting='unsafe')
+
+
+class Preprocessing(object):
+    """A pipeline of PreprocessingStages applied to one observation.
+
+    Args:
+        stages (PreprocessingStage): The stages, in the order they are applied.
+    """
+
+    def __init__(self, *stages: PreprocessingStage):
+        self.stages = stages
+        channels_first = False
+        for stage in stages:
+            assert not channels_first or isinstance(stage, AsType), \
+                "{} takes channels last frames, but follows ChannelsFirst".format(stage)
+            channels_first = channels_first or isinstance(stage, ChannelsFirst)
+
+    def output_space(self, space: spaces.Box) -> spaces.Box:
+        for stage in self.stages:
+            space = stage.output_space(space)
+        return space
+
+    def __call__(self, frame: np.ndarray) -> np.ndarray:
+        for stage in self.stages:
+            frame = stage(frame)
+        return frame
+
+    def __repr__(self):
+        return "Preprocessing({})".format(", ".join(map(repr, self.stages)))
+
+
+class Preprocessed(EnvWrapper):
+    """
+    Preprocesses observations (by default the POV) once, as they are decoded, e.g. to
+    train at 64x64 on an env spec whose frames are 640x360:
+
+        Preprocessed(ObtainDiamondShovelEnvSpec(), Resize(64, 64), AsType(np.float32, 1 / 255))
+
+    The observation space describes the preprocessed observations. Preprocessing can not
+    be undone, so observations can not be unwrapped.
+    """
+
+    def _update_name(self, name: str) -> str:
+        return name.split('-')[0] + 'Preprocessed-' + name.split('-')[-1]
+
+    def __init__(self, env_to_wrap: EnvSpec, *stages: PreprocessingStage, key: str = 'pov'):
+        assert env_to_wrap.is_single_agent, \
+            "Preprocessed (currently) only supports single agents environments."
+        self.env_to_wrap = env_to_wrap
+        self.key = key
+        self.preprocessing = Preprocessing(*stages)
+        super().__init__(env_to_wrap)
+
+    def create_observation_space(self):
+        observation_space = self.env_to_wrap.observation_space
+        assert self.key in observation_space.spaces, "{} has no {} observation".format(self.env_to_wrap, self.key)
+        return spaces.Dict(OrderedDict(
+            (k, self.preprocessing.output_space(v) if k == self.key else v)
+            for k, v in observation_space.spaces.items()))
+
+    def wrap_observation(self, obs: OrderedDict):
+        # Only the preprocessed observation is replaced, so the rest needn't be deep copied.
+        if self._wrap_obs_fn is not None:
+            obs = self._wrap_obs_fn(obs)
+        return self._wrap_observation(copy.copy(obs))
+
+    def _wrap_observation(self, obs: OrderedDict) -> OrderedDict:
+        obs[self.key] = self.preprocessing(obs[self.key])
+        return obs
+
+    def _unwrap_observation(self, obs: OrderedDict) -> OrderedDict:
+        raise NotImplementedError("Preprocessed observations can not be unwrapped.")
+
+    def _wrap_action(self, act: OrderedDict) -> OrderedDict:
+        return act
+
+    def wrap_action(self, act: OrderedDict):
+        # Actions are passed through as they are.
+        return act if self._wrap_act_fn is None else self._wrap_act_fn(act)
+
+    def _unwrap_action(self, act: OrderedDict) -> OrderedDict:
+        return act
+
+    def unwrap_action(self, act: OrderedDict) -> OrderedDict:
+        return act if self._unwrap_act_fn is None else self._unwrap_act_fn(act)
+
+    def get_docstring(self):
+        return self.env_to_wrap.get_docstring()
@@ -0,0 +1,45 @@
+# Copyright (c) 2020 All Rights Reserved
+# Author: William H. Guss, Brandon Houghton
+
+import socket
+import types
+
+import numpy as np
+
+from minerl.env import comms
+from minerl.env.test_stepping import FakeMalmoPeer
+from minerl.herobraine.env_specs.navigate_specs import Navigate
+from minerl.herobraine.wrappers.preprocessing import (
+    AsType, ChannelsFirst, Crop, Grayscale, Preprocessed, Preprocessing, Resize)
+
+
+def test_preprocessing_stages_match_their_output_space():
+    frame = np.random.randint(0, 256, size=(64, 64, 3), dtype=np.uint8)
+    env_spec = Navigate(dense=True, extreme=False)
+    pov_space = env_spec.observation_space['pov']
+
+    resize = Preprocessing(Resize(32, 32))
+    assert np.allclose(resize(frame), frame.reshape(32, 2, 32, 2, 3).mean(axis=(1, 3)), atol=1)
+
+    pipeline = Preprocessing(Crop(8, 0, 48, 64), Resize(32, 24), Grayscale(), ChannelsFirst(),
+                             AsType(np.float32, 1 / 255))
+    out = pipeline(frame)
+    space = pipeline.output_space(pov_space)
+    assert out.shape == space.shape == (1, 24, 32) and out.dtype == space.dtype == np.float32
+    assert out in space
+
+
+def test_preprocessed_env_spec_describes_and_decodes_preprocessed_observations():
+    env_spec = Preprocessed(Navigate(dense=True, extreme=False), Resize(32, 32), ChannelsFirst())
+    assert env_spec.observation_space['pov'].shape == (3, 32, 32)
+    assert env_spec.observation_space['compass'] is env_spec.env_to_wrap.observation_space['compass']
+
+    env = env_spec.make()
+    ours, theirs = socket.socketpair()
+    env.instances = [types.SimpleNamespace(client_socket=comms.Connection(ours))]
+    env.done = False
+    env.has_finished = {agent: False for agent in env.task.agent_names}
+    FakeMalmoPeer(theirs).start()
+
+    obs, _, _, _ = env.step(env.action_space.no_op())
+    assert obs['pov'].shape == (3, 32, 32) and obs['pov'] in env.observation_space['pov']
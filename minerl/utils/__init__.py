@@ -1,5 +1,14 @@
 # Copyright (c) 2020 All Rights Reserved
 # Author: William H. Guss, Brandon Houghton
 
+import importlib
+
 import minerl.utils.test
-import minerl.utils.process_watcher
+
+
+def __getattr__(name):
+    # process_watcher pulls in psutil, coloredlogs and daemoniker, which are only
+    # needed to launch Minecraft instances, so it is imported on first use.
+    if name == 'process_watcher':
+        return importlib.import_module('minerl.utils.process_watcher')
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -8,8 +8,10 @@ from os.path import isdir
 
 import subprocess
 import pathlib
+import importlib.util
 import setuptools
 from setuptools import Command
+from setuptools.command.build_py import build_py
 from setuptools.command.develop import develop
 from setuptools.command.install import install
 from setuptools.command.install_lib import install_lib
@@ -104,6 +106,27 @@ class InstallWithMinecraftLib(install_lib):
     def build(self):
         super().build()
 
+class BuildPyWithItemTables(build_py):
+    """Also compiles the item and stat tables of the built package's mc_constants.1.16.json
+    (see minerl.herobraine.hero.mc), so that installed packages don't write them on import.
+    """
+
+    def run(self):
+        super().run()
+        mc_file = os.path.join(self.build_lib, 'minerl', 'herobraine', 'hero', 'mc.py')
+        if self.dry_run or not os.path.exists(mc_file):
+            return
+        try:
+            # Loaded on its own, since importing minerl needs its dependencies installed.
+            spec = importlib.util.spec_from_file_location('_minerl_mc', mc_file)
+            mc = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(mc)
+        except ImportError as e:
+            print("Not compiling the item tables ({}); they are compiled on first import instead.".format(e))
+            return
+        mc.write_item_tables_cache()
+
+
 class CustomBuild(build):
     def run(self):
         super().run()
@@ -205,6 +228,7 @@ if os.environ.get("READTHEDOCS"):
     cmdclass = {}
 else:
     cmdclass = {
+        'build_py': BuildPyWithItemTables,
         'bdist_wheel': bdist_wheel,
         'install': InstallPlatlib,
         'install_lib': InstallWithMinecraftLib,